@@ -0,0 +1,272 @@
+# assistant_load.py
+# Measures time to first token, end-to-end latency and throughput of the
+# assistant scripts (send_message.py, get_messages.py, create_and_save_thread.py)
+# under concurrent load, against the local stand-in of fake_assistants_server.py.
+#
+#   python benchmarks/assistant_load.py -n 40 -c 8 --first-token 300 --tokens-per-second 100
+#   python benchmarks/assistant_load.py --via worker --base-url http://127.0.0.1:8765/v1
+#
+# "spawn" runs one script process per request, as the extension used to;
+# "worker" sends the same requests to one assistant_worker.py process.
+# The scripts find the server through OPENAI_BASE_URL and keep their local
+# message store in a temporary directory.
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_assistants_server import add_service_arguments, service_options, start_server
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), "src")
+
+OPERATIONS = ("send_message", "get_messages", "create_thread")
+MODES = ("spawn", "worker")
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))
+    return values[index]
+
+
+def summarize(samples, elapsed):
+    ok = [sample for sample in samples if sample["ok"]]
+    latency = [sample["latency"] * 1000 for sample in ok]
+    ttft = [sample["ttft"] * 1000 for sample in ok if sample.get("ttft") is not None]
+    result = {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {"p50": percentile(latency, 50), "p95": percentile(latency, 95),
+                       "max": max(latency) if latency else None},
+    }
+    if ttft:
+        result["ttft_ms"] = {"p50": percentile(ttft, 50), "p95": percentile(ttft, 95)}
+    errors = [sample["error"] for sample in samples if not sample["ok"]]
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+def post_json(url, payload, attempts=10):
+    """POST for the setup; retried, as the stand-in may be injecting errors."""
+    request = urllib.request.Request(url, json.dumps(payload).encode("utf-8"),
+                                     {"Content-Type": "application/json", "Authorization": "Bearer sk-fake"})
+    for attempt in range(attempts):
+        try:
+            with urllib.request.urlopen(request) as response:
+                return json.load(response)
+        except urllib.error.HTTPError as e:
+            if e.code < 429 or attempt == attempts - 1:
+                raise
+
+
+def seed_threads(base_url, count, history):
+    """Threads for the benchmark, each with `history` messages already in it."""
+    thread_ids = []
+    for _ in range(count):
+        thread_id = post_json(f"{base_url}/threads", {})["id"]
+        for i in range(history):
+            post_json(f"{base_url}/threads/{thread_id}/messages",
+                      {"role": "user" if i % 2 == 0 else "assistant", "content": f"Earlier message {i}"})
+        thread_ids.append(thread_id)
+    return thread_ids
+
+
+def request_params(operation, index, thread_ids, workspace, prompt):
+    thread_id = thread_ids[index % len(thread_ids)]
+    if operation == "send_message":
+        return {"prompt": f"{prompt} #{index}", "thread_id": thread_id}
+    if operation == "get_messages":
+        return {"thread_id": thread_id}
+    return {"classname": f"BenchClass{index}", "filepath": os.path.join(workspace, f"bench_{index}.py"),
+            "workspace_folder": workspace}
+
+
+def spawn_request(operation, params, env):
+    """One script process; the first NDJSON delta frame marks the first token."""
+    if operation == "send_message":
+        command = ["send_message.py", params["prompt"], params["thread_id"], "--ndjson"]
+    elif operation == "get_messages":
+        command = ["get_messages.py", params["thread_id"]]
+    else:
+        command = ["create_and_save_thread.py", params["classname"], params["filepath"], params["workspace_folder"]]
+    start = time.perf_counter()
+    ttft = None
+    error = None
+    process = subprocess.Popen([sys.executable] + command, cwd=SRC_DIR, env=env, text=True, encoding="utf-8",
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    output = []
+    for line in process.stdout:
+        output.append(line)
+        if operation != "send_message" or not line.startswith("{"):
+            continue
+        frame = json.loads(line)
+        if frame["type"] == "delta" and ttft is None:
+            ttft = time.perf_counter() - start
+        elif frame["type"] == "error":
+            error = frame["message"]
+    stderr = process.stderr.read()
+    process.wait()
+    latency = time.perf_counter() - start
+    text = "".join(output).strip()
+    if error is None and process.returncode != 0:
+        error = stderr.strip().splitlines()[-1] if stderr.strip() else f"exit code {process.returncode}"
+    elif error is None and (text.startswith("Error") or text.startswith('{"error"')):
+        error = text.splitlines()[-1]
+    return {"ok": error is None, "ttft": ttft, "latency": latency, "error": error}
+
+
+class WorkerClient:
+    """JSON-RPC client of one assistant_worker.py process."""
+
+    def __init__(self, env, jobs):
+        sys.path.insert(0, SRC_DIR)
+        from assistant_worker import read_message
+        self.read_message = read_message
+        self.process = subprocess.Popen([sys.executable, "assistant_worker.py", "-j", str(jobs)], cwd=SRC_DIR,
+                                        env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL)
+        self.pending = {}
+        self.next_id = 0
+        self.lock = threading.Lock()
+        self.reader = threading.Thread(target=self.read, daemon=True)
+        self.reader.start()
+
+    def read(self):
+        while True:
+            body = self.read_message(self.process.stdout)
+            if body is None:
+                break
+            message = json.loads(body)
+            if message.get("method") == "event":
+                call = self.pending.get(message["params"]["id"])
+                if call is not None and message["params"]["type"] == "delta" and call["ttft"] is None:
+                    call["ttft"] = time.perf_counter() - call["start"]
+                continue
+            call = self.pending.get(message.get("id"))
+            if call is not None:
+                call["latency"] = time.perf_counter() - call["start"]
+                call["error"] = message["error"]["message"] if "error" in message else None
+                call["done"].set()
+        for call in list(self.pending.values()):
+            call.setdefault("error", "worker exited")
+            call["done"].set()
+
+    def request(self, operation, params):
+        with self.lock:
+            self.next_id += 1
+            request_id = self.next_id
+            call = {"start": time.perf_counter(), "ttft": None, "done": threading.Event()}
+            self.pending[request_id] = call
+            body = json.dumps({"jsonrpc": "2.0", "id": request_id, "method": operation, "params": params}).encode()
+            self.process.stdin.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+            self.process.stdin.flush()
+        call["done"].wait()
+        del self.pending[request_id]
+        error = call.get("error")
+        return {"ok": error is None, "ttft": call["ttft"],
+                "latency": call.get("latency", time.perf_counter() - call["start"]), "error": error}
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait(timeout=10)
+
+
+def run_load(submit, operation, args, thread_ids, workspace):
+    params = [request_params(operation, i, thread_ids, workspace, args.prompt) for i in range(args.requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        samples = list(executor.map(lambda p: submit(operation, p), params))
+    return summarize(samples, time.perf_counter() - start)
+
+
+def print_report(report):
+    print(f"{'target':<26}{'reqs':>6}{'errors':>8}{'req/s':>9}{'ttft p50':>10}{'ttft p95':>10}"
+          f"{'lat p50':>10}{'lat p95':>10}{'lat max':>10}  (ms)")
+
+    def ms(value):
+        return f"{value:>10.1f}" if value is not None else f"{'-':>10}"
+
+    for target, result in report["results"].items():
+        ttft = result.get("ttft_ms", {})
+        latency = result["latency_ms"]
+        print(f"{target:<26}{result['requests']:>6}{result['errors']:>8}{result['throughput_rps']:>9.2f}"
+              f"{ms(ttft.get('p50'))}{ms(ttft.get('p95'))}{ms(latency['p50'])}{ms(latency['p95'])}{ms(latency['max'])}")
+        if "first_error" in result:
+            print(f"{'':<26}first error: {result['first_error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the assistant scripts against a local Assistants API stand-in.")
+    parser.add_argument("-n", "--requests", type=int, default=20, help="Requests per operation (default: 20).")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Requests in flight (default: 4).")
+    parser.add_argument("--ops", nargs="+", choices=OPERATIONS, default=list(OPERATIONS),
+                        help="Operations to measure (default: all).")
+    parser.add_argument("--via", nargs="+", choices=MODES, default=list(MODES),
+                        help="Script processes per request and/or the persistent worker (default: both).")
+    parser.add_argument("--threads", type=int, default=8, help="Threads the requests are spread over (default: 8).")
+    parser.add_argument("--history", type=int, default=20, help="Messages already in each thread (default: 20).")
+    parser.add_argument("--prompt", type=str, default="Explain what this class does", help="Prompt sent.")
+    parser.add_argument("--base-url", type=str, default=None,
+                        help="Use an already running stand-in (e.g. http://127.0.0.1:8765/v1); "
+                             "the service options below are then ignored.")
+    add_service_arguments(parser)
+    parser.add_argument("-o", "--output", type=str, help="Write the report as JSON to this file.")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = start_server(**service_options(args))
+        base_url = server.base_url
+
+    work_dir = tempfile.mkdtemp(prefix="assistant_load_")
+    env = dict(os.environ, OPENAI_BASE_URL=base_url, OPENAI_API_KEY="sk-fake",
+               ASSISTANT_MESSAGE_STORE=os.path.join(work_dir, "message_store.sqlite3"), PYTHONIOENCODING="utf-8")
+    results = {}
+    try:
+        thread_ids = seed_threads(base_url, max(1, args.threads), args.history)
+        for mode in args.via:
+            workspace = os.path.join(work_dir, mode)
+            os.makedirs(workspace)
+            if mode == "spawn":
+                for operation in args.ops:
+                    results[f"spawn.{operation}"] = run_load(
+                        lambda op, params: spawn_request(op, params, env), operation, args, thread_ids, workspace)
+            else:
+                worker = WorkerClient(env, args.concurrency)
+                try:
+                    for operation in args.ops:
+                        results[f"worker.{operation}"] = run_load(worker.request, operation, args, thread_ids, workspace)
+                finally:
+                    worker.close()
+    finally:
+        if server is not None:
+            server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    params = {key: getattr(args, key) for key in ("requests", "concurrency", "threads", "history")}
+    if server is not None:
+        params.update(service_options(args))
+    report = {"params": params, "base_url": base_url, "python": sys.version.split()[0], "results": results}
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
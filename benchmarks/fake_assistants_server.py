@@ -0,0 +1,327 @@
+# fake_assistants_server.py
+# Local stand-in for the part of the OpenAI Assistants API the assistant
+# scripts use: thread creation, message create/list (with cursor pagination)
+# and streamed runs. Latency, token rate and injected errors are configurable,
+# so the assistant path can be benchmarked without network access.
+#
+#   python benchmarks/fake_assistants_server.py --port 8765 --tokens-per-second 200
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=sk-fake python src/send_message.py hi THREAD
+#
+# Everything is kept in memory; GET /stats returns request counters.
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+THREAD_PATH = re.compile(r"^/v1/threads/([^/]+)(/messages|/runs)?$")
+
+
+def new_id(prefix):
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+
+class FakeAssistants:
+    """In-memory threads and the knobs of the simulated service."""
+
+    def __init__(self, latency=0.0, first_token=0.0, tokens_per_second=0.0, answer_tokens=50,
+                 error_rate=0.0, error_status=500, retry_after=1.0, seed=None):
+        self.latency = latency
+        self.first_token = first_token
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after  # seconds, sent with injected 429s
+        self.random = random.Random(seed)
+        self.threads = {}  # thread_id -> [message, ...] oldest first
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def inject_error(self):
+        with self.lock:
+            return self.error_rate > 0 and self.random.random() < self.error_rate
+
+    def create_thread(self):
+        thread_id = new_id("thread")
+        with self.lock:
+            self.threads[thread_id] = []
+        return {"id": thread_id, "object": "thread", "created_at": int(time.time()),
+                "metadata": {}, "tool_resources": None}
+
+    def message(self, thread_id, role, text, run_id=None, status="completed"):
+        content = [{"type": "text", "text": {"value": text, "annotations": []}}] if text is not None else []
+        return {
+            "id": new_id("msg"), "object": "thread.message", "created_at": int(time.time()),
+            "thread_id": thread_id, "role": role, "content": content, "status": status,
+            "assistant_id": None, "run_id": run_id, "attachments": [], "metadata": {},
+            "completed_at": None, "incomplete_at": None, "incomplete_details": None,
+        }
+
+    def add_message(self, thread_id, message):
+        with self.lock:
+            messages = self.threads.get(thread_id)
+            if messages is None:
+                return None
+            messages.append(message)
+        return message
+
+    def list_messages(self, thread_id, limit=20, order="desc", after=None, before=None):
+        with self.lock:
+            messages = self.threads.get(thread_id)
+            if messages is None:
+                return None
+            messages = list(messages)
+        if order == "desc":
+            messages.reverse()
+        ids = [message["id"] for message in messages]
+        if after in ids:
+            messages = messages[ids.index(after) + 1:]
+        elif before in ids:
+            messages = messages[:ids.index(before)]
+        page = messages[:limit]
+        return {
+            "object": "list", "data": page,
+            "first_id": page[0]["id"] if page else None,
+            "last_id": page[-1]["id"] if page else None,
+            "has_more": len(messages) > limit,
+        }
+
+    def answer_tokens_for(self, prompt):
+        words = " ".join(prompt.split()[:8])
+        tokens = [f"You said: {words}."] if words else ["Hello."]
+        tokens.extend(f" token{i}" for i in range(max(0, self.answer_tokens - 1)))
+        return tokens
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, as against the real service
+    service = None  # FakeAssistants, set by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        return json.loads(body) if body else {}
+
+    def send_json(self, status, payload, headers=()):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message, error_type="invalid_request_error", headers=()):
+        self.send_json(status, {"error": {"message": message, "type": error_type, "param": None, "code": None}},
+                       headers)
+
+    def begin(self, route):
+        """Common start of a request: counters, latency and error injection."""
+        service = self.service
+        service.count(route)
+        if service.latency:
+            time.sleep(service.latency)
+        if service.inject_error():
+            service.count("injected_errors")
+            self.read_json()
+            if service.error_status == 429:
+                self.send_error_json(429, "Rate limit reached", "requests", [("Retry-After", f"{service.retry_after:g}")])
+            else:
+                self.send_error_json(service.error_status, "Injected error", "server_error")
+            return False
+        return True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            with self.service.lock:
+                self.send_json(200, dict(self.service.counters))
+            return
+        match = THREAD_PATH.match(url.path)
+        if not match or match.group(2) != "/messages":
+            self.send_error_json(404, f"Unknown route GET {url.path}")
+            return
+        if not self.begin("list_messages"):
+            return
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        page = self.service.list_messages(match.group(1), limit=min(int(query.get("limit", 20)), 100),
+                                          order=query.get("order", "desc"), after=query.get("after"),
+                                          before=query.get("before"))
+        if page is None:
+            self.send_error_json(404, f"No thread found with id '{match.group(1)}'.")
+        else:
+            self.send_json(200, page)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == "/v1/threads":
+            if self.begin("create_thread"):
+                self.read_json()
+                self.send_json(200, self.service.create_thread())
+            return
+        match = THREAD_PATH.match(url.path)
+        if not match or match.group(2) is None:
+            self.send_error_json(404, f"Unknown route POST {url.path}")
+            return
+        thread_id, route = match.groups()
+        if route == "/messages":
+            if not self.begin("create_message"):
+                return
+            body = self.read_json()
+            content = body.get("content", "")
+            if isinstance(content, list):
+                content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+            message = self.service.add_message(
+                thread_id, self.service.message(thread_id, body.get("role", "user"), content))
+            if message is None:
+                self.send_error_json(404, f"No thread found with id '{thread_id}'.")
+            else:
+                self.send_json(200, message)
+            return
+        if not self.begin("create_run"):
+            return
+        self.stream_run(thread_id, self.read_json())
+
+    def write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def event(self, name, data):
+        payload = data if isinstance(data, str) else json.dumps(data)
+        self.write_chunk(f"event: {name}\ndata: {payload}\n\n".encode("utf-8"))
+
+    def stream_run(self, thread_id, body):
+        service = self.service
+        with service.lock:
+            messages = service.threads.get(thread_id)
+            prompt = ""
+            if messages:
+                user = [m for m in messages if m["role"] == "user"]
+                if user and user[-1]["content"]:
+                    prompt = user[-1]["content"][0]["text"]["value"]
+        if messages is None:
+            self.send_error_json(404, f"No thread found with id '{thread_id}'.")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        now = int(time.time())
+        run = {
+            "id": new_id("run"), "object": "thread.run", "created_at": now, "thread_id": thread_id,
+            "assistant_id": body.get("assistant_id"), "status": "queued",
+            "instructions": body.get("instructions") or "", "model": "fake-model", "tools": [],
+            "metadata": {}, "parallel_tool_calls": True, "response_format": "auto", "tool_choice": "auto",
+            "truncation_strategy": {"type": "auto", "last_messages": None}, "usage": None,
+            "started_at": None, "completed_at": None, "expires_at": None, "cancelled_at": None,
+            "failed_at": None, "last_error": None, "incomplete_details": None, "required_action": None,
+            "max_completion_tokens": None, "max_prompt_tokens": None, "temperature": 1.0, "top_p": 1.0,
+        }
+        self.event("thread.run.created", run)
+        self.event("thread.run.queued", run)
+        run = dict(run, status="in_progress", started_at=now)
+        self.event("thread.run.in_progress", run)
+
+        message = service.message(thread_id, "assistant", None, run_id=run["id"], status="in_progress")
+        message["assistant_id"] = run["assistant_id"]
+        self.event("thread.message.created", message)
+        self.event("thread.message.in_progress", message)
+
+        if service.first_token:
+            time.sleep(service.first_token)
+        interval = 1.0 / service.tokens_per_second if service.tokens_per_second else 0.0
+        tokens = service.answer_tokens_for(prompt)
+        for token in tokens:
+            self.event("thread.message.delta", {
+                "id": message["id"], "object": "thread.message.delta",
+                "delta": {"content": [{"index": 0, "type": "text", "text": {"value": token, "annotations": []}}]},
+            })
+            if interval:
+                time.sleep(interval)
+
+        completed = dict(message, status="completed", completed_at=int(time.time()),
+                         content=[{"type": "text", "text": {"value": "".join(tokens), "annotations": []}}])
+        service.add_message(thread_id, completed)
+        self.event("thread.message.completed", completed)
+        usage = {"prompt_tokens": len(prompt.split()), "completion_tokens": len(tokens),
+                 "total_tokens": len(prompt.split()) + len(tokens)}
+        self.event("thread.run.completed", dict(run, status="completed", completed_at=int(time.time()), usage=usage))
+        self.event("done", "[DONE]")
+        self.write_chunk(b"")
+
+
+def make_server(port=0, host="127.0.0.1", **options):
+    """Server bound to host:port (0 picks a free port); its base URL is server.base_url."""
+    service = FakeAssistants(**options)
+    handler = type("FakeAssistantsHandler", (Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.service = service
+    server.base_url = f"http://{host}:{server.server_address[1]}/v1"
+    return server
+
+
+def start_server(port=0, **options):
+    """Serve from a daemon thread; stop with server.shutdown()."""
+    server = make_server(port, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_service_arguments(parser):
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Milliseconds added to every request (default: 0).")
+    parser.add_argument("--first-token", type=float, default=0.0,
+                        help="Milliseconds before the first token of a run (default: 0).")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0,
+                        help="Streaming rate of answers; 0 streams as fast as possible (default: 0).")
+    parser.add_argument("--answer-tokens", type=int, default=50, help="Tokens per answer (default: 50).")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with --error-status (default: 0).")
+    parser.add_argument("--error-status", type=int, default=500, help="Status of injected errors (default: 500).")
+    parser.add_argument("--retry-after", type=float, default=1.0,
+                        help="Retry-After seconds of injected 429 errors (default: 1).")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the error injection.")
+
+
+def service_options(args):
+    return {
+        "latency": args.latency / 1000, "first_token": args.first_token / 1000,
+        "tokens_per_second": args.tokens_per_second, "answer_tokens": args.answer_tokens,
+        "error_rate": args.error_rate, "error_status": args.error_status,
+        "retry_after": args.retry_after, "seed": args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in of the OpenAI Assistants API.")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="Port (default: 8765, 0 picks a free one).")
+    add_service_arguments(parser)
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.host, **service_options(args))
+    print(f"Fake Assistants API listening on {server.base_url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# generate_project.py
+# Builds synthetic Python projects for benchmarking the analyzer and the AST
+# extractors. Output is fully determined by the parameters and the seed.
+import argparse
+import os
+import random
+import shutil
+
+
+def generate_project(output_dir, files=100, classes_per_file=5, methods_per_class=8,
+                     inheritance=0.3, composition=0.3, files_per_package=20, seed=0):
+    """Write a synthetic project to `output_dir` and return the number of files.
+
+    `inheritance` and `composition` are the probabilities that a class
+    derives from, or holds an instance of, a previously generated class.
+    """
+    rng = random.Random(seed)
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+
+    known_classes = []
+    for file_index in range(files):
+        package = f"pkg_{file_index // files_per_package:03d}"
+        package_dir = os.path.join(output_dir, package)
+        if not os.path.isdir(package_dir):
+            os.makedirs(package_dir)
+            with open(os.path.join(package_dir, "__init__.py"), "w", encoding="utf-8") as f:
+                f.write(f'"""Synthetic package {package}."""\n')
+
+        lines = ["import os", "import json", "from typing import List, Optional", ""]
+        for class_index in range(classes_per_file):
+            class_name = f"Class{file_index:05d}_{class_index:02d}"
+            base = ""
+            if known_classes and rng.random() < inheritance:
+                base = f"({rng.choice(known_classes)})"
+            lines.append(f"class {class_name}{base}:")
+            lines.append(f"    counter = {class_index}")
+            lines.append(f"    label = \"{class_name.lower()}\"")
+            lines.append("")
+            lines.append("    def __init__(self, name: str, size: int = 0):")
+            lines.append("        self.name = name")
+            lines.append("        self.size = size")
+            lines.append("        self.items = []")
+            if known_classes and rng.random() < composition:
+                lines.append(f"        self.part = {rng.choice(known_classes)}(name)")
+            lines.append("")
+            for method_index in range(methods_per_class):
+                lines.append(f"    def method_{method_index}(self, value: int) -> Optional[int]:")
+                lines.append(f"        result = value * {method_index + 1} + self.size")
+                if known_classes and rng.random() < composition:
+                    lines.append(f"        helper = {rng.choice(known_classes)}(self.name)")
+                    lines.append("        helper.method_0(result)")
+                lines.append("        if result > 100:")
+                lines.append("            self.items.append(result)")
+                lines.append("            return None")
+                lines.append("        print(json.dumps({\"value\": result, \"path\": os.sep}))")
+                lines.append("        return result")
+                lines.append("")
+            known_classes.append(class_name)
+
+        lines.append(f"def module_function_{file_index}(values: List[int]) -> int:")
+        lines.append("    return sum(v for v in values if v % 2 == 0)")
+        lines.append("")
+        with open(os.path.join(package_dir, f"module_{file_index:05d}.py"), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Python project for benchmarks.")
+    parser.add_argument("output_dir", type=str, help="Directory to create (replaced if it exists).")
+    parser.add_argument("--files", type=int, default=100, help="Number of modules (default: 100).")
+    parser.add_argument("--classes-per-file", type=int, default=5, help="Classes per module (default: 5).")
+    parser.add_argument("--methods-per-class", type=int, default=8, help="Methods per class (default: 8).")
+    parser.add_argument("--inheritance", type=float, default=0.3,
+                        help="Probability that a class has a base class (default: 0.3).")
+    parser.add_argument("--composition", type=float, default=0.3,
+                        help="Probability of composition/usage links (default: 0.3).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+    args = parser.parse_args()
+
+    count = generate_project(args.output_dir, files=args.files, classes_per_file=args.classes_per_file,
+                             methods_per_class=args.methods_per_class, inheritance=args.inheritance,
+                             composition=args.composition, seed=args.seed)
+    print(f"Generated {count} modules in {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+# run_benchmarks.py
+# Measures throughput, peak memory, per-phase time and output size of the
+# project analyzer and the AST extractors on a synthetic project, and
+# compares the numbers against a saved baseline.
+#
+#   python benchmarks/run_benchmarks.py --scale medium --save-baseline main
+#   python benchmarks/run_benchmarks.py --scale medium --compare main
+#
+# Every target runs in a fresh child process so peak RSS is not shared
+# between measurements. Nothing here needs network access; targets whose
+# dependencies (graphviz, astroid) are missing are reported as skipped.
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from generate_project import generate_project
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(os.path.dirname(BENCH_DIR), "src")
+BASELINE_DIR = os.path.join(BENCH_DIR, "baselines")
+
+SCALES = {
+    "small": {"files": 50, "classes_per_file": 4, "methods_per_class": 6},
+    "medium": {"files": 500, "classes_per_file": 5, "methods_per_class": 8},
+    "large": {"files": 3000, "classes_per_file": 6, "methods_per_class": 10},
+}
+
+# target -> ast_engine outputs; "ast_engine" writes all ast outputs in one pass
+EXTRACTORS = {
+    "basic_ast": ["basic"],
+    "vars_consts_ast": ["vars_consts"],
+    "detailed_ast": ["detailed"],
+    "ast_engine": ["basic", "vars_consts", "detailed"],
+    "basic_astroid": ["basic_astroid"],
+    "detailed_astroid": ["detailed_astroid"],
+}
+TARGETS = ("analyzer",) + tuple(EXTRACTORS)
+
+# metric -> True when higher is better
+COMPARED_METRICS = {"files_per_sec": True, "peak_rss_kb": False, "output_bytes": False}
+
+
+def peak_rss_kb():
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children)
+
+
+@contextlib.contextmanager
+def timed(phases, name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases[name] = phases.get(name, 0.0) + time.perf_counter() - start
+
+
+def project_files(project_dir, limit=None):
+    files = []
+    for root, dirs, names in os.walk(project_dir):
+        dirs.sort()
+        files.extend(os.path.join(root, name) for name in sorted(names)
+                     if name.endswith(".py") and name != "__init__.py")
+    return files[:limit] if limit else files
+
+
+def bench_analyzer(project_dir, work_dir, jobs):
+    import diagramGenerator
+
+    phases = {}
+    output_file = os.path.join(work_dir, "diagram.json")
+    with contextlib.redirect_stdout(io.StringIO()):
+        with timed(phases, "discover"):
+            tasks = diagramGenerator.discover_files(project_dir)
+        with timed(phases, "analyze"):
+            results = diagramGenerator.analyze_files(tasks, jobs=jobs)
+        analyzer = diagramGenerator.ProjectAnalyzer()
+        with timed(phases, "merge"):
+            for result in results:
+                analyzer.merge(result)
+        with timed(phases, "to_json"):
+            analyzer.to_json(output_file)
+    return {"files": len(tasks), "phases": phases, "output_bytes": os.path.getsize(output_file)}
+
+
+def bench_extractor(target, project_dir, work_dir, limit):
+    import graphviz
+    import ast_engine
+    from profiling import Profiler
+    outputs = EXTRACTORS[target]
+    # Rendering needs the Graphviz binaries and is not what is being measured
+    graphviz.Digraph.render = lambda self, *args, **kwargs: None
+
+    # The extractors write next to their input, so work on a copy
+    copy_dir = os.path.join(work_dir, "project")
+    shutil.copytree(project_dir, copy_dir)
+    profiler = Profiler(target)
+    output_bytes = 0
+    files = project_files(copy_dir, limit)
+    with contextlib.redirect_stdout(io.StringIO()):
+        ast_engine.extract_files(files, outputs, profiler)
+    for file_path in files:
+        for output in outputs:
+            suffix = ast_engine.OUTPUTS[output][1]
+            output_bytes += os.path.getsize(os.path.splitext(file_path)[0] + suffix + ".json")
+    phases = {name: wall for name, (wall, _, _) in profiler.phases.items()}
+    return {"files": len(files), "phases": phases, "output_bytes": output_bytes}
+
+
+def run_child(args):
+    sys.path.insert(0, SRC_DIR)
+    work_dir = tempfile.mkdtemp(prefix="bench_work_")
+    try:
+        start = time.perf_counter()
+        if args.child == "analyzer":
+            result = bench_analyzer(args.project, work_dir, args.jobs)
+        else:
+            result = bench_extractor(args.child, args.project, work_dir, args.extractor_files)
+        elapsed = time.perf_counter() - start
+        result["seconds"] = elapsed
+        result["files_per_sec"] = result["files"] / elapsed if elapsed else 0.0
+        result["peak_rss_kb"] = peak_rss_kb()
+    except ImportError as e:
+        result = {"skipped": f"missing dependency: {e.name}"}
+    except Exception as e:
+        result = {"error": f"{type(e).__name__}: {e}"}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print(json.dumps(result))
+
+
+def run_target(target, project_dir, args):
+    command = [sys.executable, os.path.abspath(__file__), "--child", target, "--project", project_dir,
+               "--jobs", str(args.jobs), "--extractor-files", str(args.extractor_files)]
+    completed = subprocess.run(command, capture_output=True, text=True)
+    lines = completed.stdout.strip().splitlines()
+    if completed.returncode != 0 or not lines:
+        return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else
+                f"exit code {completed.returncode}"}
+    return json.loads(lines[-1])
+
+
+def best_of(runs):
+    measured = [run for run in runs if "seconds" in run]
+    if not measured:
+        return runs[0]
+    best = min(measured, key=lambda run: run["seconds"])
+    best = dict(best)
+    # Memory can vary between runs, keep the worst observation
+    best["peak_rss_kb"] = max(run["peak_rss_kb"] for run in measured)
+    return best
+
+
+def compare(report, baseline, threshold):
+    """Return a list of human-readable regressions of `report` against `baseline`."""
+    regressions = []
+    if report["params"] != baseline.get("params"):
+        print("Warning: baseline was recorded with different project parameters.")
+    for target, result in report["results"].items():
+        base = baseline.get("results", {}).get(target)
+        if not base or "seconds" not in base or "seconds" not in result:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = base.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (change < -threshold) if higher_is_better else (change > threshold):
+                regressions.append(f"{target}.{metric}: {old:.6g} -> {new:.6g} ({change:+.1%})")
+    return regressions
+
+
+def print_report(report):
+    print(f"{'target':<18}{'files':>7}{'files/s':>11}{'peak MB':>9}{'output KB':>11}  phases (s)")
+    for target, result in report["results"].items():
+        if "seconds" not in result:
+            print(f"{target:<18}  {result.get('skipped') or result.get('error')}")
+            continue
+        phases = " ".join(f"{name}={seconds:.3f}" for name, seconds in result["phases"].items())
+        print(f"{target:<18}{result['files']:>7}{result['files_per_sec']:>11.1f}"
+              f"{result['peak_rss_kb'] / 1024:>9.1f}{result['output_bytes'] / 1024:>11.1f}  {phases}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analyzer and AST extractors.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="Project size preset (default: small).")
+    parser.add_argument("--files", type=int, help="Override the number of generated modules.")
+    parser.add_argument("--classes-per-file", type=int, help="Override classes per module.")
+    parser.add_argument("--methods-per-class", type=int, help="Override methods per class.")
+    parser.add_argument("--inheritance", type=float, default=0.3, help="Inheritance density (default: 0.3).")
+    parser.add_argument("--composition", type=float, default=0.3, help="Composition density (default: 0.3).")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed (default: 0).")
+    parser.add_argument("--project", type=str, help="Benchmark an existing project instead of generating one.")
+    parser.add_argument("-t", "--targets", nargs="+", choices=TARGETS, default=list(TARGETS),
+                        help="Targets to run (default: all).")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="--jobs passed to the analyzer (default: 1).")
+    parser.add_argument("--extractor-files", type=int, default=50,
+                        help="Number of modules fed to each extractor (default: 50, 0 = all).")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="Runs per target, best is kept (default: 3).")
+    parser.add_argument("-o", "--output", type=str, help="Write the report as JSON to this file.")
+    parser.add_argument("--save-baseline", type=str, metavar="NAME", help="Save the report as baselines/NAME.json.")
+    parser.add_argument("--compare", type=str, metavar="NAME", help="Compare against baselines/NAME.json.")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Relative change counted as a regression (default: 0.10).")
+    parser.add_argument("--child", choices=TARGETS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    params = dict(SCALES[args.scale])
+    for key in ("files", "classes_per_file", "methods_per_class"):
+        if getattr(args, key) is not None:
+            params[key] = getattr(args, key)
+    params.update(inheritance=args.inheritance, composition=args.composition, seed=args.seed)
+
+    temp_dir = None
+    project_dir = args.project
+    if project_dir is None:
+        temp_dir = tempfile.mkdtemp(prefix="bench_project_")
+        project_dir = os.path.join(temp_dir, "project")
+        generate_project(project_dir, **params)
+    else:
+        params = {"project": os.path.abspath(project_dir)}
+    params.update(jobs=args.jobs, extractor_files=args.extractor_files)
+
+    try:
+        results = {}
+        for target in args.targets:
+            runs = [run_target(target, project_dir, args) for _ in range(max(1, args.repeat))]
+            results[target] = best_of(runs)
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    report = {"params": params, "python": sys.version.split()[0], "results": results}
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        baseline_path = os.path.join(BASELINE_DIR, f"{args.save_baseline}.json")
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=4)
+        print(f"Baseline saved to {baseline_path}")
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json"), "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"Regressions over {args.threshold:.0%} against baseline '{args.compare}':")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions over {args.threshold:.0%} against baseline '{args.compare}'.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# analysis_cache.py
+import hashlib
+import marshal
+import os
+import sys
+
+CACHE_DIR = ".diagram-cache"  # Inside the analyzed project, ignores itself like .pytest_cache
+
+
+def default_cache_path(project_dir):
+    directory = os.path.join(project_dir, CACHE_DIR)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        ignore = os.path.join(directory, ".gitignore")
+        if not os.path.exists(ignore):
+            with open(ignore, "w") as f:
+                f.write("# Created by diagramGenerator.py, safe to delete\n*\n")
+    except OSError as e:
+        print(f"Could not create cache directory {directory}: {e}")
+    return os.path.join(directory, "analysis.cache")
+
+
+def file_digest(file_path):
+    with open(file_path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).digest()
+
+
+class AnalysisCache:
+    """On-disk cache of per-file ProjectAnalyzer results.
+
+    Entries are keyed by file path and validated by package, mtime and size;
+    when only the mtime changed the content hash decides. The cache is
+    versioned by analyzer and interpreter version, and only entries seen
+    during the current run are written back, so deleted files are evicted.
+    Stored with marshal rather than pickle, so loading a cache file found in
+    a workspace never executes code.
+    """
+
+    def __init__(self, path, version, encode=None, decode=None):
+        self.path = path
+        # Convert results to and from marshal-friendly builtins
+        self.encode = encode or (lambda result: result)
+        self.decode = decode or (lambda data: data)
+        self.version = f"{version}:{sys.version_info[0]}.{sys.version_info[1]}"
+        self.entries = {}  # file_path -> (package, mtime_ns, size, digest, encoded result)
+        self.fresh = {}  # Entries confirmed or created during this run
+        self.pending = {}  # file_path -> stat taken on a miss
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                data = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return
+        if isinstance(data, dict) and data.get("version") == self.version:
+            self.entries = data.get("entries", {})
+
+    def lookup(self, file_path, package):
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            self.misses += 1
+            return None
+
+        entry = self.entries.get(file_path)
+        if entry is not None and entry[0] == package and entry[2] == st.st_size:
+            _, mtime_ns, size, digest, data = entry
+            if mtime_ns == st.st_mtime_ns:
+                self.hits += 1
+                self.fresh[file_path] = entry
+                return self.decode(data)
+            # Touched but possibly unchanged (checkout, formatter no-op)
+            try:
+                if file_digest(file_path) == digest:
+                    self.hits += 1
+                    self.fresh[file_path] = (package, st.st_mtime_ns, size, digest, data)
+                    return self.decode(data)
+            except OSError:
+                pass
+
+        self.misses += 1
+        self.pending[file_path] = st
+        return None
+
+    def store(self, file_path, package, result):
+        before = self.pending.pop(file_path, None)
+        try:
+            st = os.stat(file_path)
+            digest = file_digest(file_path)
+        except OSError:
+            return
+        # Don't cache a result for content that changed while it was parsed
+        if before is None or (before.st_mtime_ns, before.st_size) != (st.st_mtime_ns, st.st_size):
+            return
+        self.fresh[file_path] = (package, st.st_mtime_ns, st.st_size, digest, self.encode(result))
+
+    def save(self):
+        data = {"version": self.version, "entries": self.fresh}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                marshal.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Could not write analysis cache {self.path}: {e}")
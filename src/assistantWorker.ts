@@ -0,0 +1,157 @@
+import * as child_process from "child_process";
+import * as path from "path";
+
+// Frame of a streamed answer (see ResponseStream in assistant_client.py)
+export interface StreamEvent {
+    id: number;
+    seq: number;
+    type: "delta" | "tool_call" | "done" | "error";
+    text?: string;
+    tool?: string;
+    input?: string;
+    output?: string;
+    message?: string;
+}
+
+type EventHandler = (event: StreamEvent) => void;
+
+interface PendingRequest {
+    resolve: (result: any) => void;
+    reject: (error: Error) => void;
+    onEvent?: EventHandler;
+}
+
+// Client of assistant_worker.py: one long-lived Python process serving all chat
+// requests. Messages are JSON-RPC framed with a Content-Length header (as in
+// the Language Server Protocol); streamed answers arrive as "event"
+// notifications tagged with the request id, with text coalesced into batches.
+// The process is started on the first request and again after it exits.
+export class AssistantWorker {
+    private process: child_process.ChildProcess | null = null;
+    private nextId = 1;
+    private pending = new Map<number, PendingRequest>();
+
+    constructor(
+        private readonly scriptPath: string,
+        private readonly pythonCommand: string,
+        private readonly args: string[] = []
+    ) {}
+
+    public request<T = any>(method: string, params: object, onEvent?: EventHandler): Promise<T> {
+        let worker: child_process.ChildProcess;
+        try {
+            worker = this.ensureStarted();
+        } catch (error) {
+            return Promise.reject(error);
+        }
+
+        const id = this.nextId++;
+        return new Promise<T>((resolve, reject) => {
+            this.pending.set(id, { resolve, reject, onEvent });
+            const body = Buffer.from(JSON.stringify({ jsonrpc: "2.0", id, method, params }), "utf8");
+            worker.stdin!.write(Buffer.concat([Buffer.from(`Content-Length: ${body.length}\r\n\r\n`, "ascii"), body]));
+        });
+    }
+
+    // Starts the worker ahead of the first request, so it doesn't wait for the imports
+    public start() {
+        this.ensureStarted();
+    }
+
+    public dispose() {
+        if (this.process) {
+            // Closing stdin lets the worker finish requests in flight and exit
+            this.process.stdin?.end();
+            this.process = null;
+        }
+    }
+
+    private ensureStarted(): child_process.ChildProcess {
+        if (this.process) {
+            return this.process;
+        }
+
+        const worker = child_process.spawn(this.pythonCommand, [this.scriptPath, ...this.args], {
+            cwd: path.dirname(this.scriptPath)
+        });
+        let buffer = Buffer.alloc(0);
+
+        worker.stdout!.on("data", (data: Buffer) => {
+            buffer = this.readFrames(buffer.length ? Buffer.concat([buffer, data]) : data);
+        });
+        worker.stderr!.on("data", (data: Buffer) => {
+            console.error(`[Assistant worker]: ${data.toString()}`);
+        });
+        worker.on("exit", (code) => {
+            if (this.process === worker) {
+                this.process = null;
+            } else if (this.process) {
+                // A disposed worker finished its requests; the pending ones belong to its successor
+                return;
+            }
+            this.failPending(new Error(`Assistant worker exited with code ${code}`));
+        });
+        worker.on("error", (err) => {
+            if (this.process === worker) {
+                this.process = null;
+            }
+            this.failPending(new Error(`Failed to start assistant worker: ${err.message}`));
+        });
+
+        this.process = worker;
+        return worker;
+    }
+
+    // Dispatches the complete messages in `buffer` and returns the unread rest
+    private readFrames(buffer: Buffer): Buffer {
+        while (true) {
+            const headerEnd = buffer.indexOf("\r\n\r\n");
+            if (headerEnd < 0) {
+                return buffer;
+            }
+            const header = buffer.subarray(0, headerEnd).toString("ascii");
+            const match = /Content-Length:\s*(\d+)/i.exec(header);
+            const start = headerEnd + 4;
+            if (!match) {
+                buffer = buffer.subarray(start);
+                continue;
+            }
+            const end = start + parseInt(match[1], 10);
+            if (buffer.length < end) {
+                return buffer;
+            }
+            const body = buffer.subarray(start, end).toString("utf8");
+            buffer = buffer.subarray(end);
+
+            try {
+                this.dispatch(JSON.parse(body));
+            } catch (error) {
+                console.error(`Error handling assistant worker message: ${error}`);
+            }
+        }
+    }
+
+    private dispatch(message: any) {
+        if (message.method === "event") {
+            this.pending.get(message.params.id)?.onEvent?.(message.params);
+            return;
+        }
+
+        const request = this.pending.get(message.id);
+        if (!request) {
+            return;
+        }
+        this.pending.delete(message.id);
+        if (message.error) {
+            request.reject(new Error(message.error.message));
+        } else {
+            request.resolve(message.result);
+        }
+    }
+
+    private failPending(error: Error) {
+        const requests = [...this.pending.values()];
+        this.pending.clear();
+        requests.forEach((request) => request.reject(error));
+    }
+}
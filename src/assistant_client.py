@@ -0,0 +1,182 @@
+# assistant_client.py
+# OpenAI client and streaming event handler shared by the assistant scripts
+# and assistant_worker.py.
+import json
+import os
+import threading
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, OpenAI, AssistantEventHandler
+from typing_extensions import override
+
+ASSISTANT_ID = "asst_9UCU9sdFMl9VAnHl4SBPuUA0"
+INSTRUCTIONS = "Please address the user as friend."
+
+def client_options():
+    load_dotenv()
+    return dict(
+        organization='org-xL8A4RIl6oUOCBUzdOlNFUJ1',
+        project='proj_ZuIi9ZcuFNiWauexpYg7e14r',
+        api_key=os.getenv("OPENAI_API_KEY"),
+        # e.g. the local stand-in of benchmarks/fake_assistants_server.py
+        base_url=os.getenv("OPENAI_BASE_URL") or None
+    )
+
+def create_client():
+    return OpenAI(**client_options())
+
+def create_async_client():
+    # Bound to the event loop it is first used in; close it with `await client.close()`
+    return AsyncOpenAI(**client_options())
+
+FLUSH_INTERVAL = 0.03  # seconds
+FLUSH_SIZE = 256  # characters
+
+class ResponseStream:
+    """Turns an assistant run into numbered frames for `send`.
+
+    Frames are {"seq": n, "type": ...} with type "delta" (text), "tool_call"
+    (tool, optional input or output), "done" or "error" (message). Text deltas
+    are coalesced until FLUSH_SIZE characters are pending or FLUSH_INTERVAL has
+    passed since the first of them; any other frame flushes them first.
+    """
+
+    def __init__(self, send, interval=FLUSH_INTERVAL, size=FLUSH_SIZE):
+        self.send = send
+        self.interval = interval
+        self.size = size
+        self.seq = 0
+        self.pending = []
+        self.pending_size = 0
+        self.timer = None
+        # The timer thread flushes too; frames go out under the lock, in order
+        self.lock = threading.Lock()
+
+    def _frame(self, frame_type, **fields):
+        self.seq += 1
+        self.send({"seq": self.seq, "type": frame_type, **fields})
+
+    def _flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.pending:
+            text = "".join(self.pending)
+            self.pending = []
+            self.pending_size = 0
+            self._frame("delta", text=text)
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def delta(self, text):
+        with self.lock:
+            self.pending.append(text)
+            self.pending_size += len(text)
+            if self.pending_size >= self.size:
+                self._flush()
+            elif self.timer is None:
+                self.timer = threading.Timer(self.interval, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def tool_call(self, tool, **fields):
+        with self.lock:
+            self._flush()
+            self._frame("tool_call", tool=tool, **fields)
+
+    def done(self):
+        with self.lock:
+            self._flush()
+            self._frame("done")
+
+    def error(self, message):
+        with self.lock:
+            self._flush()
+            self._frame("error", message=message)
+
+def frame_text(frame):
+    """Plain-text rendering of a frame, as the scripts used to print it."""
+    frame_type = frame["type"]
+    if frame_type == "delta":
+        return frame["text"]
+    if frame_type == "tool_call":
+        if "input" in frame:
+            return frame["input"]
+        if "output" in frame:
+            return f"\n\noutput >\n\n{frame['output']}\n"
+        return f"\n{frame['tool']}\n\n"
+    return ""
+
+def print_frame(frame):
+    text = frame_text(frame)
+    if text:
+        print(text, end="", flush=True)
+
+def print_ndjson(frame):
+    print(json.dumps(frame, ensure_ascii=False), flush=True)
+
+class EventHandler(AssistantEventHandler):
+    """Feeds the streamed answer to a ResponseStream and collects its text."""
+
+    def __init__(self, prompt, stream):
+        super().__init__()
+        self.parts = []
+        self.prompt = prompt
+        self.stream = stream
+
+    @property
+    def full_response(self):
+        return "".join(self.parts)
+
+    @override
+    def on_text_created(self, text) -> None:
+        self.stream.delta("\n")
+
+    @override
+    def on_text_delta(self, delta, snapshot):
+        self.stream.delta(delta.value)
+        self.parts.append(delta.value)
+
+    def on_tool_call_created(self, tool_call):
+        self.stream.tool_call(tool_call.type)
+
+    def on_tool_call_delta(self, delta, snapshot):
+        if delta.type == 'code_interpreter':
+            if delta.code_interpreter.input:
+                self.stream.tool_call(delta.type, input=delta.code_interpreter.input)
+            if delta.code_interpreter.outputs:
+                for output in delta.code_interpreter.outputs:
+                    if output.type == "logs":
+                        self.stream.tool_call(delta.type, output=output.logs)
+
+def stream_run(client, thread_id, prompt, send=print_frame, store=None):
+    """Add `prompt` to the thread, stream the assistant's answer as frames and return it.
+
+    The new messages are written through to `store`, a MessageStore.
+    """
+    stream = ResponseStream(send)
+    try:
+        message = client.beta.threads.messages.create(
+            thread_id=thread_id,
+            role="user",
+            content=prompt
+        )
+
+        event_handler = EventHandler(prompt, stream)
+
+        with client.beta.threads.runs.stream(
+            thread_id=thread_id,
+            assistant_id=ASSISTANT_ID,
+            instructions=INSTRUCTIONS,
+            event_handler=event_handler,
+        ) as run:
+            run.until_done()
+    except Exception as e:
+        stream.error(str(e))
+        raise
+    stream.done()
+
+    if store is not None:
+        store.write_through(thread_id, [message, *event_handler.get_final_messages()])
+    return event_handler.full_response
@@ -0,0 +1,270 @@
+# assistant_worker.py
+# Long-running process serving the assistant operations to the extension, so
+# a chat action doesn't pay for a new interpreter, the openai import and a cold
+# HTTPS connection. Speaks JSON-RPC 2.0 over stdio, each message framed as
+#
+#   Content-Length: <bytes>\r\n\r\n<UTF-8 JSON>
+#
+# Requests run concurrently on a thread pool sharing one OpenAI client (and
+# its connection pool). A streamed answer is sent as "event" notifications,
+# the frames of assistant_client.ResponseStream plus the id of the request,
+# before that request's response.
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from assistant_client import create_client
+from context_builder import DEFAULT_BUDGET, DEFAULT_HOPS
+from create_and_save_thread import create_and_store_thread_id
+from get_messages import fetch_many_thread_messages, read_thread_messages
+from message_store import open_store
+from provision_threads import DEFAULT_RATE, provision_threads
+from response_cache import open_cache
+from send_context_to_assistant import send_context
+from send_message import send_message
+from thread_mapping import open_mapping
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+class FramingError(ValueError):
+    pass
+
+
+def read_message(stream, resync=False):
+    """Read one framed message from a binary stream; None at EOF.
+
+    Raises FramingError on a Content-Length it can't use. The body that
+    follows has no known length, so the caller reads on with resync=True,
+    which skips everything up to the next Content-Length header.
+    """
+    length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        if resync:
+            # The header may follow the skipped body on the same line
+            start = line.lower().find(b"content-length:")
+            if start < 0:
+                continue
+            line, resync = line[start:], False
+        line = line.strip()
+        if not line:
+            if length is None:
+                continue
+            break
+        name, _, value = line.decode("ascii", "replace").partition(":")
+        if name.strip().lower() == "content-length":
+            try:
+                length = int(value)
+            except ValueError:
+                length = -1
+            if length < 0:
+                raise FramingError(f"Invalid Content-Length {value.strip()!r}")
+    body = stream.read(length)
+    if len(body) < length:
+        return None
+    return body
+
+
+class Connection:
+    """Writes framed messages; safe to call from several threads."""
+
+    def __init__(self, out):
+        self.out = out
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        body = json.dumps(message, ensure_ascii=False).encode("utf-8")
+        with self.lock:
+            self.out.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+            self.out.flush()
+
+    def notify(self, method, params):
+        self.send({"jsonrpc": "2.0", "method": method, "params": params})
+
+    def respond(self, request_id, result):
+        self.send({"jsonrpc": "2.0", "id": request_id, "result": result})
+
+    def fail(self, request_id, code, message):
+        self.send({"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}})
+
+
+class AssistantWorker:
+    def __init__(self, connection, jobs=8, store=None, cache=None):
+        self.connection = connection
+        self.store = store  # MessageStore serving chat histories, or None
+        self.cache = cache  # ResponseCache for repeated questions, or None
+        self.executor = ThreadPoolExecutor(max_workers=jobs)
+        self.client = None
+        self.client_lock = threading.Lock()
+        self.provisioning = set()  # workspaces with a provision_threads request running
+        self.provisioning_lock = threading.Lock()
+        self.methods = {
+            "send_message": self.send_message,
+            "send_context": self.send_context,
+            "get_messages": self.get_messages,
+            "get_messages_bulk": self.get_messages_bulk,
+            "create_thread": self.create_thread,
+            "provision_threads": self.provision_threads,
+            "find_thread": self.find_thread,
+            "get_thread_mapping": self.get_thread_mapping,
+            "merge_classes": self.merge_classes,
+            "cache_stats": self.cache_stats,
+        }
+
+    def get_client(self):
+        with self.client_lock:
+            if self.client is None:
+                self.client = create_client()
+            return self.client
+
+    def event_sender(self, request_id):
+        return lambda frame: self.connection.notify("event", {"id": request_id, **frame})
+
+    def send_message(self, request_id, params):
+        return send_message(self.get_client(), params["prompt"], params["thread_id"], self.event_sender(request_id),
+                            self.store, self.cache, params.get("workspace_path"), params.get("bypass_cache", False))
+
+    def send_context(self, request_id, params):
+        # "budget": null sends the whole diagram.json
+        return send_context(self.get_client(), params["thread_id"], params.get("workspace_path"),
+                            self.event_sender(request_id), self.store,
+                            params.get("budget", DEFAULT_BUDGET), params.get("hops", DEFAULT_HOPS))
+
+    def get_messages(self, request_id, params):
+        # With "refresh": false the cached messages are returned without a request
+        return read_thread_messages(self.get_client(), params["thread_id"], self.store, params.get("refresh", True))
+
+    def get_messages_bulk(self, request_id, params):
+        # Runs its own event loop and async client in this pool thread
+        return asyncio.run(fetch_many_thread_messages(params["thread_ids"], params.get("concurrency", 8), self.store))
+
+    def cache_stats(self, request_id, params):
+        return self.cache.stats() if self.cache is not None else None
+
+    def create_thread(self, request_id, params):
+        return create_and_store_thread_id(params["classname"], params["filepath"],
+                                          params["workspace_folder"], self.get_client())
+
+    def provision_threads(self, request_id, params):
+        # A second run would append to the same journal and create the same threads again
+        workspace = os.path.abspath(params["workspace_folder"])
+        with self.provisioning_lock:
+            if workspace in self.provisioning:
+                raise RuntimeError(f"Threads are already being created for {workspace}")
+            self.provisioning.add(workspace)
+        try:
+            return provision_threads(params["workspace_folder"], self.get_client(), params.get("concurrency", 4),
+                                     params.get("rate", DEFAULT_RATE))
+        finally:
+            with self.provisioning_lock:
+                self.provisioning.discard(workspace)
+
+    def find_thread(self, request_id, params):
+        # Thread of a codebox, or None when the class isn't recorded for that file
+        return open_mapping(params["workspace_folder"]).thread_for(params["classname"], params["filepath"])
+
+    def get_thread_mapping(self, request_id, params):
+        return open_mapping(params["workspace_folder"]).as_dict()
+
+    def merge_classes(self, request_id, params):
+        # Entries for the classes of a new diagram.json; codebox_threads.json is exported for other readers
+        workspace_folder = params["workspace_folder"]
+        with open(os.path.join(workspace_folder, "diagram.json"), "r", encoding="utf-8") as f:
+            classes = json.load(f).get("classes", {})
+        mapping = open_mapping(workspace_folder)
+        result = mapping.merge_classes({name: details.get("file_path") for name, details in classes.items()})
+        mapping.export_json()
+        return result
+
+    def run(self, handler, request_id, params):
+        try:
+            result = handler(request_id, params)
+        except KeyError as e:
+            self.connection.fail(request_id, INVALID_PARAMS, f"Missing parameter {e}")
+        except Exception as e:
+            self.connection.fail(request_id, SERVER_ERROR, f"{type(e).__name__}: {e}")
+        else:
+            self.connection.respond(request_id, result)
+
+    def handle(self, body):
+        try:
+            message = json.loads(body)
+        except ValueError as e:
+            self.connection.fail(None, PARSE_ERROR, f"Parse error: {e}")
+            return True
+        if not isinstance(message, dict) or "method" not in message:
+            self.connection.fail(None, INVALID_REQUEST, "Invalid request")
+            return True
+
+        method = message["method"]
+        request_id = message.get("id")
+        if method == "shutdown":
+            return False
+        handler = self.methods.get(method)
+        if handler is None:
+            if request_id is not None:
+                self.connection.fail(request_id, METHOD_NOT_FOUND, f"Unknown method {method}")
+            return True
+        params = message.get("params")
+        self.executor.submit(self.run, handler, request_id, params if isinstance(params, dict) else {})
+        return True
+
+    def serve(self, stream):
+        # Build the client (and import its dependencies) before the first request
+        try:
+            self.get_client()
+        except Exception as e:
+            print(f"Could not create the OpenAI client: {e}")
+        try:
+            resync = False
+            while True:
+                try:
+                    body = read_message(stream, resync)
+                except FramingError as e:
+                    self.connection.fail(None, PARSE_ERROR, f"Parse error: {e}")
+                    resync = True
+                    continue
+                resync = False
+                if body is None or not self.handle(body):
+                    break
+        finally:
+            # Let requests in flight finish and send their responses
+            self.executor.shutdown(wait=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve assistant requests as JSON-RPC over stdio.")
+    parser.add_argument("-j", "--jobs", type=int, default=8,
+                        help="Number of requests handled concurrently (default: 8).")
+    parser.add_argument("--store", type=str, default=None,
+                        help="Local message store (default: $ASSISTANT_MESSAGE_STORE or message_store.sqlite3 here).")
+    parser.add_argument("--no-store", action="store_true",
+                        help="Download full histories without the local message store.")
+    parser.add_argument("--response-cache", action="store_true",
+                        help="Answer repeated questions about unchanged code from the response cache.")
+    args = parser.parse_args()
+
+    # stdout carries the protocol, so route diagnostics to stderr
+    out = sys.stdout.buffer
+    sys.stdout = sys.stderr
+    store = None if args.no_store else open_store(args.store)
+    cache = open_cache(args.store) if args.response_cache else None
+    try:
+        AssistantWorker(Connection(out), jobs=max(1, args.jobs), store=store, cache=cache).serve(sys.stdin.buffer)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,674 @@
+# ast_engine.py
+# Single-pass AST extraction behind the extractor scripts. A file is read and
+# parsed once, then one iterative walk drives a visitor per requested output,
+# each streaming its own JSON file and building its own graph. The walk keeps
+# an explicit stack, so deeply nested code doesn't hit RecursionError.
+#
+# Outputs:
+#   basic, vars_consts, detailed            - built from the ast module
+#   basic_astroid, detailed_astroid         - built from astroid (optional)
+#
+# Directories and file lists are processed in one batch, optionally across
+# worker processes, so astroid is imported and bootstrapped once per process.
+import argparse
+import ast
+import contextlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from graphviz import Digraph
+from ast_stream_writer import MODES, BinaryEmitter, JsonEmitter, TypeTable
+from binary_format import EXTENSION as BINARY_EXTENSION, ValueWriter
+from file_discovery import FileDiscovery
+from profiling import NULL_PROFILER, Profiler, add_profile_arguments, finish_profile, profiler_from_args
+
+SKIP = object()  # Returned by a visitor's enter() to leave out the subtree
+
+# output -> (parser, file suffix, title)
+OUTPUTS = {
+    "basic": ("ast", "_basic_ast", "Basic AST"),
+    "vars_consts": ("ast", "_vars_consts_ast", "AST with variables and constants"),
+    "detailed": ("ast", "_detailed_ast", "Detailed AST"),
+    "basic_astroid": ("astroid", "_basic_astroid", "Basic Astroid AST"),
+    "detailed_astroid": ("astroid", "_detailed_astroid", "Detailed Astroid AST"),
+}
+DEFAULT_CACHE_SIZE = 200  # astroid modules kept between files of a batch
+AST_OUTPUTS = tuple(name for name, (parser, _, _) in OUTPUTS.items() if parser == "ast")
+
+
+def walk(root, visitors, children):
+    """Depth-first walk of `root` driving all visitors at once.
+
+    `children(node)` yields (field, child) pairs. A visitor's enter(node,
+    parent_state, field) returns the state handed to leave(node, state) and
+    to the children's enter(), or SKIP to not see the subtree. Returns the
+    number of nodes visited.
+    """
+    states = [visitor.enter(root, None, None) for visitor in visitors]
+    stack = [(root, states, iter(children(root)))]
+    visited = 1
+    while stack:
+        node, states, pending = stack[-1]
+        for field, child in pending:
+            child_states = [state if state is SKIP else visitor.enter(child, state, field)
+                            for visitor, state in zip(visitors, states)]
+            if any(state is not SKIP for state in child_states):
+                stack.append((child, child_states, iter(children(child))))
+                visited += 1
+                break
+        else:
+            stack.pop()
+            for visitor, state in zip(visitors, states):
+                if state is not SKIP:
+                    visitor.leave(node, state)
+    return visited
+
+
+def ast_children(node):
+    # Same order as ast.iter_child_nodes, plus the field each child is in
+    for field, value in ast.iter_fields(node):
+        if isinstance(value, ast.AST):
+            yield field, value
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, ast.AST):
+                    yield field, item
+
+
+def astroid_children(node):
+    for child in node.get_children():
+        yield None, child
+
+
+def write_chunks(write, chunks):
+    # Deferred output is a list of strings and nested lists
+    stack = [iter(chunks)]
+    while stack:
+        for chunk in stack[-1]:
+            if isinstance(chunk, list):
+                stack.append(iter(chunk))
+                break
+            write(chunk)
+        else:
+            stack.pop()
+
+
+# Labels
+
+def is_skipped(node):
+    # __init__ and main are left out of every ast output
+    return isinstance(node, ast.FunctionDef) and node.name in ('__init__', 'main')
+
+
+def basic_label(node):
+    if isinstance(node, ast.ClassDef):
+        return f"Class: {node.name}"
+    elif isinstance(node, ast.FunctionDef):
+        return f"Function: {node.name}"
+    return type(node).__name__
+
+
+def vars_consts_label(node):
+    if isinstance(node, ast.FunctionDef) and node.name not in ('__init__', 'main'):
+        return f"Function: {node.name}"
+    elif isinstance(node, ast.ClassDef):
+        return f"Class: {node.name}"
+    elif isinstance(node, ast.Assign):
+        targets = ', '.join([t.id for t in node.targets if isinstance(t, ast.Name)])
+        return f"Assign: {targets} = ..."
+    elif isinstance(node, ast.Constant):
+        return f"Constant: {node.value}"
+    elif isinstance(node, ast.Name):
+        return f"Variable: {node.id}"
+    return type(node).__name__
+
+
+def get_return_type(func_node):
+    """Helper function to get the return type of a function."""
+    if func_node.returns:
+        if isinstance(func_node.returns, ast.Name):
+            return func_node.returns.id  # Simple type (e.g., `int`, `str`)
+        elif isinstance(func_node.returns, ast.Subscript):
+            return ast.unparse(func_node.returns)  # More complex types like List[int]
+    return "None"
+
+
+def detailed_label(node):
+    """Returns a label for a given AST node with type and key details."""
+    if isinstance(node, ast.FunctionDef) and node.name not in ('__init__', 'main'):
+        return f"Function: {node.name}\nReturns: {get_return_type(node)}"
+    elif isinstance(node, ast.ClassDef):
+        return f"Class: {node.name}"
+    elif isinstance(node, ast.Assign):
+        targets = ', '.join([t.id for t in node.targets if isinstance(t, ast.Name)])
+        return f"Assign: {targets} = ..."
+    elif isinstance(node, ast.arg):
+        return f"Argument: {node.arg}"
+    elif isinstance(node, ast.Constant):
+        return f"Constant: {node.value}"
+    elif isinstance(node, ast.Name):
+        return f"Variable: {node.id}"
+    elif isinstance(node, ast.Call):
+        return f"Call: {node.func.id if isinstance(node.func, ast.Name) else 'Unknown'}()"
+    elif isinstance(node, ast.Import):
+        imports = ', '.join([alias.name for alias in node.names])
+        return f"Import: {imports}"
+    elif isinstance(node, ast.ImportFrom):
+        module = node.module if node.module else ""
+        names = ', '.join([alias.name for alias in node.names])
+        return f"From {module} import {names}"
+    return type(node).__name__
+
+
+def as_text(value):
+    # Return annotations and except-handler names are astroid nodes, keep their source
+    return value.as_string() if hasattr(value, "as_string") else value
+
+
+def astroid_record(node, detailed):
+    record = {
+        "type": type(node).__name__,
+        "name": as_text(getattr(node, 'name', None)),
+        "lineno": getattr(node, 'lineno', None),
+    }
+    if detailed:
+        record["return_type"] = as_text(getattr(node, 'returns', None))
+        # Capture imported packages
+        names = getattr(node, 'names', None)
+        if type(node).__name__ == "ImportFrom":
+            record["module"] = node.modname
+            record["imports"] = [name for name, _ in names]
+        elif type(node).__name__ == "Import":
+            record["imports"] = [name for name, _ in names]
+    return record
+
+
+def astroid_label(record):
+    label = f"{record['type']} ({record['name']})" if record["name"] else record["type"]
+    if record.get("return_type"):
+        label += f" [Return: {record['return_type']}]"
+    if "imports" in record:
+        imports = ', '.join(record["imports"])
+        label += f"\nImports: {imports}"
+    if "module" in record:
+        label += f"\nFrom Module: {record['module']}"
+    return label
+
+
+# Visitors
+
+class NestedOutput:
+    """Top-level layout shared by the nested (pretty/compact) visitors.
+
+    Compact output wraps the tree as {"format": "compact", <key>: ...,
+    "types": [...]}, with node types written as indices into "types".
+    Given a ValueWriter instead of a file, the compact document is written
+    in the binary format.
+    """
+
+    def __init__(self, f, compact, key, graph=None):
+        self.values = f if isinstance(f, ValueWriter) else None
+        self.write = f.write
+        self.indent = None if compact else 4
+        self.emitter = self.make_emitter(self.write)
+        self.types = TypeTable() if compact else None
+        self.graph = graph
+        if compact:
+            self.emitter.begin_object()
+            self.emitter.key("format")
+            self.emitter.value("compact")
+            self.emitter.key(key)
+
+    def make_emitter(self, write, base=0, counts=None):
+        if self.values is not None:
+            return BinaryEmitter(write, self.values, base, counts)
+        return JsonEmitter(write, self.indent, base, counts)
+
+    def type_value(self, node):
+        name = type(node).__name__
+        return self.types(name) if self.types else name
+
+    def close(self):
+        if self.types is not None:
+            self.emitter.key("types")
+            self.emitter.value(self.types.names)
+            self.emitter.end_object()
+
+
+class LabelTreeVisitor(NestedOutput):
+    """[{"type", "label", "children"}] as written by the basic and vars/consts outputs."""
+
+    def __init__(self, f, label, compact=False, graph=None):
+        super().__init__(f, compact, "nodes", graph)
+        self.label = label
+        self.emitter.begin_array()
+
+    def enter(self, node, parent, field):
+        emitter = self.emitter
+        if parent is not None and not parent[1]:
+            # Opened even when every child is skipped
+            emitter.key("children")
+            emitter.begin_array()
+            parent[1] = True
+        if is_skipped(node):
+            return SKIP
+
+        node_id = str(id(node))
+        node_label = self.label(node)
+        if self.graph is not None:
+            self.graph.node(node_id, label=node_label)
+            if parent is not None:
+                self.graph.edge(parent[0], node_id)
+        emitter.begin_object()
+        emitter.key("type")
+        emitter.value(self.type_value(node))
+        emitter.key("label")
+        emitter.value(node_label)
+        return [node_id, False]
+
+    def leave(self, node, state):
+        if state[1]:
+            self.emitter.end_array()
+        self.emitter.end_object()
+
+    def close(self):
+        self.emitter.end_array()
+        super().close()
+
+
+class DetailedNode:
+    __slots__ = ("node_id", "emitter", "deferred", "depth", "fields", "list_fields",
+                 "cursor", "open_list", "singles", "has_singles")
+
+
+class DetailedTreeVisitor(NestedOutput):
+    """[{"type", "label", "fields", "children"}] of the detailed output.
+
+    "fields" holds the scalar fields and the lists of nodes in field order,
+    "children" the single node-valued fields. Children arrive in source
+    order, so a single child is rendered into a buffer at its final depth
+    and spliced in when its parent is left.
+    """
+
+    def __init__(self, f, compact=False, graph=None):
+        super().__init__(f, compact, "nodes", graph)
+        self.emitter.begin_array()
+
+    def enter(self, node, parent, field):
+        if is_skipped(node):
+            return SKIP
+
+        state = DetailedNode()
+        if parent is None:
+            state.emitter, state.deferred = self.emitter, False
+        elif field in parent.list_fields:
+            self.open_list(parent, field)
+            state.emitter, state.deferred = parent.emitter, parent.deferred
+        else:
+            chunks = []
+            emitter = self.make_emitter(chunks.append, parent.depth, [len(parent.singles)])
+            state.emitter, state.deferred = emitter, True
+            parent.singles.append(chunks)
+
+        state.node_id = str(id(node))
+        node_label = detailed_label(node)
+        if self.graph is not None:
+            self.graph.node(state.node_id, label=node_label)
+            if parent is not None:
+                self.graph.edge(parent.node_id, state.node_id)
+
+        state.fields = list(ast.iter_fields(node))
+        state.list_fields = set()
+        state.has_singles = False
+        for name, value in state.fields:
+            if isinstance(value, list):
+                state.list_fields.add(name)
+            elif isinstance(value, ast.AST):
+                state.has_singles = True
+        state.cursor = 0
+        state.open_list = None
+        state.singles = []
+
+        emitter = state.emitter
+        emitter.begin_object()
+        state.depth = emitter.depth
+        emitter.key("type")
+        emitter.value(self.type_value(node))
+        emitter.key("label")
+        emitter.value(node_label)
+        emitter.key("fields")
+        emitter.begin_object()
+        return state
+
+    def write_scalars(self, state, stop=None):
+        # Write the scalar fields up to (and move past) `stop`
+        fields = state.fields
+        while state.cursor < len(fields):
+            name, value = fields[state.cursor]
+            state.cursor += 1
+            if name == stop:
+                return
+            if not isinstance(value, (ast.AST, list)):
+                state.emitter.key(name)
+                state.emitter.value(str(value))
+
+    def open_list(self, state, field):
+        if state.open_list == field:
+            return
+        if state.open_list is not None:
+            state.emitter.end_array()
+        self.write_scalars(state, field)
+        state.emitter.key(field)
+        state.emitter.begin_array()
+        state.open_list = field
+
+    def leave(self, node, state):
+        emitter = state.emitter
+        if state.open_list is not None:
+            emitter.end_array()
+        self.write_scalars(state)
+        emitter.end_object()
+
+        if state.has_singles:
+            emitter.key("children")
+            emitter.begin_array()
+            for chunks in state.singles:
+                if state.deferred:
+                    emitter.write(chunks)
+                else:
+                    write_chunks(emitter.write, chunks)
+            emitter.counts[-1] = len(state.singles)
+            emitter.end_array()
+        emitter.end_object()
+
+    def close(self):
+        self.emitter.end_array()
+        super().close()
+
+
+class AstroidTreeVisitor(NestedOutput):
+    """{"type", "name", "lineno", ["return_type"], "children", ["module", "imports"]}."""
+
+    def __init__(self, f, detailed, compact=False, graph=None):
+        super().__init__(f, compact, "tree", graph)
+        self.detailed = detailed
+
+    def enter(self, node, parent, field):
+        record = astroid_record(node, self.detailed)
+        node_id = str(id(node))
+        if self.graph is not None:
+            self.graph.node(node_id, astroid_label(record))
+            if parent is not None:
+                self.graph.edge(parent[0], node_id)
+
+        emitter = self.emitter
+        emitter.begin_object()
+        for key in ("type", "name", "lineno", "return_type"):
+            if key in record:
+                emitter.key(key)
+                emitter.value(self.type_value(node) if key == "type" else record[key])
+        emitter.key("children")
+        emitter.begin_array()
+        return (node_id, record)
+
+    def leave(self, node, state):
+        record = state[1]
+        self.emitter.end_array()
+        for key in ("module", "imports"):
+            if key in record:
+                self.emitter.key(key)
+                self.emitter.value(record[key])
+        self.emitter.end_object()
+
+
+class NdjsonVisitor:
+    """One JSON object per line and node, in pre-order, linked by id and parent.
+
+    `record(node, field)` returns the node's data, or SKIP; `label(record)`
+    its graph label.
+    """
+
+    def __init__(self, f, record, label, graph=None):
+        self.write = f.write
+        self.record = record
+        self.label = label
+        self.graph = graph
+        self.next_id = 0
+
+    def enter(self, node, parent, field):
+        record = self.record(node, field)
+        if record is SKIP:
+            return SKIP
+        node_id = self.next_id
+        self.next_id += 1
+        self.write(json.dumps({"id": node_id, "parent": parent, **record}, separators=(",", ":")) + "\n")
+        if self.graph is not None:
+            self.graph.node(f"n{node_id}", label=self.label(record))
+            if parent is not None:
+                self.graph.edge(f"n{parent}", f"n{node_id}")
+        return node_id
+
+    def leave(self, node, state):
+        pass
+
+    def close(self):
+        pass
+
+
+def ast_ndjson_record(label):
+    def record(node, field):
+        if is_skipped(node):
+            return SKIP
+        return {"field": field, "type": type(node).__name__, "label": label(node)}
+    return record
+
+
+def detailed_ndjson_record(node, field):
+    if is_skipped(node):
+        return SKIP
+    scalars = {name: str(value) for name, value in ast.iter_fields(node)
+               if not isinstance(value, (ast.AST, list))}
+    return {"field": field, "type": type(node).__name__, "label": detailed_label(node), "fields": scalars}
+
+
+def make_visitor(output, f, mode, graph):
+    compact = mode in ("compact", "binary")
+    if mode == "ndjson":
+        if output in ("basic_astroid", "detailed_astroid"):
+            detailed = output == "detailed_astroid"
+            return NdjsonVisitor(f, lambda node, field: astroid_record(node, detailed), astroid_label, graph)
+        if output == "detailed":
+            return NdjsonVisitor(f, detailed_ndjson_record, lambda record: record["label"], graph)
+        label = basic_label if output == "basic" else vars_consts_label
+        return NdjsonVisitor(f, ast_ndjson_record(label), lambda record: record["label"], graph)
+    if output == "basic":
+        return LabelTreeVisitor(f, basic_label, compact, graph)
+    if output == "vars_consts":
+        return LabelTreeVisitor(f, vars_consts_label, compact, graph)
+    if output == "detailed":
+        return DetailedTreeVisitor(f, compact, graph)
+    return AstroidTreeVisitor(f, output == "detailed_astroid", compact, graph)
+
+
+def extract(file_path, outputs, profiler=NULL_PROFILER, mode="pretty", pdf=True):
+    """Write the requested outputs of one file, parsing it once per parser."""
+    with profiler.phase("read"):
+        with open(file_path, 'r') as f:
+            source = f.read()
+
+    base = os.path.splitext(file_path)[0]
+    extension = {"ndjson": ".ndjson", "binary": BINARY_EXTENSION}.get(mode, ".json")
+    for parser in ("ast", "astroid"):
+        selected = [output for output in outputs if OUTPUTS[output][0] == parser]
+        if not selected:
+            continue
+
+        with profiler.phase("parse"):
+            if parser == "ast":
+                tree, children = ast.parse(source), ast_children
+            else:
+                import astroid
+                tree, children = astroid.parse(source), astroid_children
+
+        graphs = {output: Digraph(comment=OUTPUTS[output][2]) if pdf else None for output in selected}
+        with profiler.phase("traverse"):
+            with contextlib.ExitStack() as stack:
+                visitors = []
+                writers = []
+                for output in selected:
+                    path = base + OUTPUTS[output][1] + extension
+                    if mode == "binary":
+                        f = ValueWriter(stack.enter_context(open(path, 'wb')))
+                        writers.append(f)
+                    else:
+                        f = stack.enter_context(open(path, 'w'))
+                    visitors.append(make_visitor(output, f, mode, graphs[output]))
+                visited = walk(tree, visitors, children)
+                for visitor in visitors:
+                    visitor.close()
+                for writer in writers:
+                    writer.close()
+        profiler.count("nodes_visited", visited)
+
+        for output in selected:
+            _, suffix, title = OUTPUTS[output]
+            print(f"{title} saved to {base + suffix + extension}")
+            if pdf:
+                with profiler.phase("render"):
+                    graphs[output].render(base + suffix + '.pdf', format='pdf', cleanup=(parser == "ast"))
+                print(f"{title} visualization saved to {base + suffix}.pdf")
+
+    if profiler.enabled:
+        profiler.count("files")
+        profiler.count("bytes", len(source.encode("utf-8")))
+        profiler.record_file_from_phases(file_path)
+
+
+def trim_astroid_cache(limit):
+    """Evict the oldest modules beyond `limit` from astroid's module cache.
+
+    The cache is process-wide, so over a long batch it would keep every
+    module pulled in by star imports or inference alive. builtins stays.
+    Returns the number of evicted modules.
+    """
+    import astroid
+    from astroid import context
+    from astroid.inference_tip import clear_inference_tip_cache
+
+    cache = astroid.MANAGER.astroid_cache
+    evicted = [name for name in cache if name != "builtins"][:max(0, len(cache) - limit)]
+    if not evicted:
+        return 0
+    for name in evicted:
+        del cache[name]
+    # Cached inference results may point into the evicted modules
+    clear_inference_tip_cache()
+    context._invalidate_cache()
+    return len(evicted)
+
+
+def extract_task(task, cprofile=None):
+    """Extract one file of a batch; returns (error, evicted modules, profile stats)."""
+    file_path, outputs, mode, pdf, cache_size, profiled = task
+    profiler = Profiler(file_path) if profiled else NULL_PROFILER
+    if cprofile is not None:
+        profiler.cprofile, profiler.cprofile_phase = cprofile, "traverse"
+
+    uses_astroid = any(OUTPUTS[output][0] == "astroid" for output in outputs)
+    errors = (OSError, SyntaxError, ValueError, RecursionError)
+    if uses_astroid:
+        from astroid.exceptions import AstroidError
+        errors += (AstroidError,)
+
+    error = None
+    try:
+        extract(file_path, outputs, profiler, mode=mode, pdf=pdf)
+    except errors as e:
+        error = f"{type(e).__name__}: {' '.join(str(e).split())}"
+    evicted = trim_astroid_cache(cache_size) if uses_astroid and cache_size is not None else 0
+    stats = {"phases": profiler.phases, "counters": profiler.counters} if profiled else None
+    return error, evicted, stats
+
+
+def extract_files(file_paths, outputs, profiler=NULL_PROFILER, mode="pretty", pdf=True,
+                  jobs=1, cache_size=DEFAULT_CACHE_SIZE):
+    """Extract many files, each next to its source. Returns the number of failed files.
+
+    Each process imports astroid once and keeps one AstroidManager, with
+    its builtins and module cache, for all the files it handles.
+    """
+    tasks = [(file_path, outputs, mode, pdf, cache_size, profiler.enabled) for file_path in file_paths]
+    if jobs > 1 and len(tasks) > 1:
+        chunksize = max(1, len(tasks) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(extract_task, tasks, chunksize=chunksize))
+    else:
+        cprofile = profiler.cprofile if profiler.enabled else None
+        results = [extract_task(task, cprofile) for task in tasks]
+
+    failed = 0
+    for file_path, (error, evicted, stats) in zip(file_paths, results):
+        if error is not None:
+            print(f"Skipping {file_path}: {error}")
+            profiler.skip(file_path, error)
+            failed += 1
+        profiler.count("cache_evictions", evicted)
+        if stats is not None:
+            for name, (wall, cpu, calls) in stats["phases"].items():
+                profiler.add_phase(name, wall, cpu, calls)
+            for name, amount in stats["counters"].items():
+                profiler.count(name, amount)
+            profiler.record_file(file_path, {name: entry[0] for name, entry in stats["phases"].items()})
+    return failed
+
+
+def collect_files(paths, profiler=NULL_PROFILER):
+    """Expand directories into their .py files (ignore-aware, see file_discovery.py)."""
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        discovery = FileDiscovery(path)
+        files.extend(discovery.walk())
+        for skipped, reason in discovery.skipped:
+            profiler.skip(skipped, reason)
+    return files
+
+
+def main(name, description, outputs=None):
+    """Command line shared by this module and the extractor scripts."""
+    parser = argparse.ArgumentParser(description=description, fromfile_prefix_chars="@")
+    parser.add_argument("paths", nargs="+", metavar="PATH",
+                        help="Python files or directories to process; @FILE reads paths from FILE.")
+    if outputs is None:
+        parser.add_argument("--outputs", nargs="+", choices=list(OUTPUTS), default=list(AST_OUTPUTS),
+                            help="Outputs to write (default: basic vars_consts detailed).")
+    parser.add_argument("--mode", choices=MODES, default="pretty",
+                        help="JSON layout: pretty (default), compact, ndjson (one node per line), "
+                             f"or binary (the compact document as {BINARY_EXTENSION}, see binary_format.py).")
+    parser.add_argument("--no-pdf", action="store_true", help="Skip building and rendering the PDF graphs.")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of worker processes (default: 1, 0 = all cores).")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE,
+                        help=f"Most astroid modules kept cached between files (default: {DEFAULT_CACHE_SIZE}).")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if args.profile_visit and jobs > 1:
+        print("--profile-visit needs a single process, ignoring --jobs")
+        jobs = 1
+
+    profiler = profiler_from_args(name, args)
+    files = collect_files(args.paths, profiler)
+    failed = extract_files(files, outputs or args.outputs, profiler, mode=args.mode, pdf=not args.no_pdf,
+                           jobs=jobs, cache_size=args.cache_size)
+    finish_profile(profiler, args)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main("ast_engine", "Extract several ASTs of Python files in a single pass.")
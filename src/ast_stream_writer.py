@@ -0,0 +1,169 @@
+# ast_stream_writer.py
+# Incremental JSON output for the AST dumps of ast_engine.py. Nodes are
+# written while the tree is being traversed, so memory stays bounded by the
+# depth of the tree instead of its size.
+#
+# Output modes:
+#   pretty  - the nested layout of json.dump(..., indent=4), byte for byte
+#   compact - the same tree without whitespace; node types are indices into
+#             a "types" table written after the nodes
+#   ndjson  - one JSON object per line and node, in pre-order, each with its
+#             id and the id of its parent
+#   binary  - the compact document as value tokens of binary_format.py,
+#             streamed the same way through BinaryEmitter
+import json
+from json.encoder import encode_basestring_ascii as encode_string
+
+from binary_format import CLOSE, OPEN
+
+MODES = ("pretty", "compact", "ndjson", "binary")
+NEWLINES = {}
+
+
+class JsonEmitter:
+    """Incremental JSON writer laid out exactly like json.dump with the same indent."""
+
+    def __init__(self, write, indent=4, base=0, counts=None):
+        self.write = write
+        self.indent = indent
+        self.key_separator = ": " if indent is not None else ":"
+        # Items written so far in each open container. A base depth and seeded
+        # counts let a subtree be rendered on its own and spliced in later.
+        self.base = base
+        self.counts = list(counts) if counts else []
+        self.after_key = False
+        # depth -> "\n" plus indentation, shared by all emitters with this indent
+        self.newlines = NEWLINES.setdefault(indent, [])
+
+    @property
+    def depth(self):
+        return self.base + len(self.counts)
+
+    def _newline(self, depth):
+        newlines = self.newlines
+        if depth >= len(newlines):
+            newlines.extend("\n" + " " * (self.indent * level) for level in range(len(newlines), depth + 1))
+        return newlines[depth]
+
+    def _item(self):
+        if self.after_key:
+            self.after_key = False
+            return
+        counts = self.counts
+        if not counts:
+            return
+        if self.indent is None:
+            if counts[-1]:
+                self.write(",")
+        elif counts[-1]:
+            self.write("," + self._newline(self.base + len(counts)))
+        else:
+            self.write(self._newline(self.base + len(counts)))
+        counts[-1] += 1
+
+    def _end(self, closing):
+        count = self.counts.pop()
+        if count and self.indent is not None:
+            self.write(self._newline(self.base + len(self.counts)) + closing)
+        else:
+            self.write(closing)
+
+    def begin_object(self):
+        self._item()
+        self.write("{")
+        self.counts.append(0)
+
+    def end_object(self):
+        self._end("}")
+
+    def begin_array(self):
+        self._item()
+        self.write("[")
+        self.counts.append(0)
+
+    def end_array(self):
+        self._end("]")
+
+    def key(self, name):
+        self._item()
+        self.write(encode_string(name) + self.key_separator)
+        self.after_key = True
+
+    def value(self, value):
+        if isinstance(value, str):
+            self._item()
+            self.write(encode_string(value))
+        elif isinstance(value, (list, tuple)):
+            self.begin_array()
+            for item in value:
+                self.value(item)
+            self.end_array()
+        elif isinstance(value, dict):
+            self.begin_object()
+            for name, item in value.items():
+                self.key(name)
+                self.value(item)
+            self.end_object()
+        else:
+            self._item()
+            self.write(json.dumps(value))
+
+
+class TypeTable:
+    """Interns node type names to small integers."""
+
+    def __init__(self):
+        self.index = {}
+        self.names = []
+
+    def __call__(self, name):
+        index = self.index.get(name)
+        if index is None:
+            index = self.index[name] = len(self.names)
+            self.names.append(name)
+        return index
+
+
+class BinaryEmitter:
+    """JsonEmitter's interface writing value tokens of binary_format.py.
+
+    `values` is the ValueWriter owning the string table; keys of an object
+    are collected and written as its shape when the object is closed. Base
+    and counts work as with JsonEmitter, so subtrees can be deferred too.
+    """
+
+    def __init__(self, write, values, base=0, counts=None):
+        self.write = write
+        self.values = values
+        self.base = base
+        self.counts = list(counts) if counts else []
+        self.keys = [None] * len(self.counts)  # keys of each open object, None for arrays
+
+    @property
+    def depth(self):
+        return self.base + len(self.counts)
+
+    def begin_object(self):
+        self.write(OPEN)
+        self.counts.append(0)
+        self.keys.append([])
+
+    def end_object(self):
+        self.counts.pop()
+        self.write(self.values.close_object(self.keys.pop()))
+
+    def begin_array(self):
+        self.write(OPEN)
+        self.counts.append(0)
+        self.keys.append(None)
+
+    def end_array(self):
+        self.counts.pop()
+        self.keys.pop()
+        self.write(CLOSE)
+
+    def key(self, name):
+        self.keys[-1].append(name)
+
+    def value(self, value):
+        self.values.value(value, self.write)
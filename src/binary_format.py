@@ -0,0 +1,475 @@
+# binary_format.py
+# Compact binary encoding of diagram.json and of the AST dumps. All strings
+# (class names, file paths, packages, type names, keys) are stored once in a
+# string table and referenced by index; the relationships of a diagram are
+# integer edge lists (source class, target string).
+#
+# Layout, little endian:
+#   header   - magic b"VSCB", u16 schema version, u8 kind, u8 flags, u32 string count
+#   diagram  - strings, then columns of u32 arrays, see encode_diagram()
+#   value    - u32 token count and the u32 tokens of any JSON value, then
+#              strings and object shapes (see ValueWriter), so the tokens
+#              can be written while the value is still being produced
+#   strings  - u32 byte length of the UTF-8 text of all strings, the text,
+#              then u32 length (in characters) of every string
+#
+# A reader refuses files of a newer schema version.
+import argparse
+import gc
+import io
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+from itertools import accumulate
+
+MAGIC = b"VSCB"
+SCHEMA_VERSION = 1
+EXTENSION = ".vscb"
+HEADER = struct.Struct("<4sHBBI")
+U32 = struct.Struct("<I")
+
+DIAGRAM = 1
+VALUE = 2
+
+RELATIONSHIPS = ("base_classes", "composition", "uses")
+DIAGRAM_KEYS = {"classes", "functions", "imports"}
+
+# Tags of the value tokens, payload << 3 | tag. A container is OPEN, its
+# items, then CLOSE with payload 0 for a list or shape index + 1 for an object.
+NULL, FALSE, TRUE, INT, NUMBER, STRING, OPEN, CLOSE = range(8)
+SMALL_INT = 1 << 27  # zigzag-encoded, still fits the 29 bits of payload
+FLUSH_TOKENS = 1 << 16
+
+
+class FormatError(ValueError):
+    pass
+
+
+class StringTable:
+    def __init__(self):
+        self.index = {}
+        self.strings = []
+
+    def __call__(self, string):
+        index = self.index.get(string)
+        if index is None:
+            index = self.index[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+    def pack(self):
+        text = "".join(self.strings).encode("utf-8")
+        return U32.pack(len(text)) + text + u32_array(len(string) for string in self.strings)
+
+
+def u32_array(values):
+    data = array("I", values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data.tobytes()
+
+
+class Reader:
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def take(self, size):
+        if self.offset + size > len(self.data):
+            raise FormatError("truncated file")
+        chunk = self.data[self.offset:self.offset + size]
+        self.offset += size
+        return chunk
+
+    def u32(self):
+        return U32.unpack(self.take(4))[0]
+
+    def u32_array(self, count=None):
+        if count is None:
+            count = self.u32()
+        data = array("I")
+        data.frombytes(self.take(4 * count))
+        if sys.byteorder == "big":
+            data.byteswap()
+        return data
+
+    def strings(self, count):
+        text = str(self.take(self.u32()), "utf-8")
+        ends = list(accumulate(self.u32_array(count)))
+        return [text[start:end] for start, end in zip([0] + ends, ends)]
+
+
+def pack(kind, strings, body):
+    return HEADER.pack(MAGIC, SCHEMA_VERSION, kind, 0, len(strings.strings)) + strings.pack() + body
+
+
+def unpack(data):
+    """(kind, string count, reader positioned after the header) of an encoded file."""
+    if len(data) < HEADER.size:
+        raise FormatError("not a binary diagram file")
+    magic, version, kind, _, count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise FormatError("not a binary diagram file")
+    if version > SCHEMA_VERSION:
+        raise FormatError(f"schema version {version} is newer than the supported {SCHEMA_VERSION}")
+    reader = Reader(data)
+    reader.offset = HEADER.size
+    return kind, count, reader
+
+
+def is_diagram(document):
+    return isinstance(document, dict) and "classes" in document and set(document) <= DIAGRAM_KEYS
+
+
+def encode_diagram(classes, functions=(), imports=()):
+    """Encode diagram.json: {class_name: details} with details as dicts or ClassInfo objects."""
+    strings = StringTable()
+    names, files, packages, lines, method_counts, attribute_counts = [], [], [], [], [], []
+    method_names, method_lines, attributes = [], [], []
+    edges = {kind: ([], []) for kind in RELATIONSHIPS}
+    for source, (class_name, details) in enumerate(classes.items()):
+        if isinstance(details, dict):
+            methods = [(m["name"], m["line_number"]) for m in details.get("methods", ())]
+            get = details.get
+        else:
+            methods = [(m.name, m.line_number) for m in details.methods]
+            get = details.__getattribute__
+        names.append(strings(class_name))
+        files.append(strings(get("file_path") or ""))
+        packages.append(strings(get("package") or ""))
+        lines.append(get("line_number") or 0)
+        method_counts.append(len(methods))
+        for name, line in methods:
+            method_names.append(strings(name))
+            method_lines.append(line or 0)
+        class_attributes = get("attributes") or ()
+        attribute_counts.append(len(class_attributes))
+        attributes.extend(strings(name) for name in class_attributes)
+        for kind in RELATIONSHIPS:
+            sources, targets = edges[kind]
+            for target in get(kind) or ():
+                sources.append(source)
+                targets.append(strings(target))
+
+    body = [U32.pack(len(names))]
+    body.extend(u32_array(column) for column in (names, files, packages, lines, method_counts, attribute_counts))
+    body.append(U32.pack(len(method_names)) + u32_array(method_names) + u32_array(method_lines))
+    body.append(U32.pack(len(attributes)) + u32_array(attributes))
+    for kind in RELATIONSHIPS:
+        sources, targets = edges[kind]
+        body.append(U32.pack(len(sources)) + u32_array(sources) + u32_array(targets))
+    for names in (functions, imports):
+        body.append(U32.pack(len(names)) + u32_array(map(strings, names)))
+    return pack(DIAGRAM, strings, b"".join(body))
+
+
+def decode_diagram(string_count, reader):
+    strings = reader.strings(string_count)
+    count = reader.u32()
+    names, files, packages, lines, method_counts, attribute_counts = (reader.u32_array(count) for _ in range(6))
+    method_count = reader.u32()
+    method_names, method_lines = reader.u32_array(method_count), reader.u32_array(method_count)
+    attributes = reader.u32_array()
+
+    string = strings.__getitem__
+    method_names = list(map(string, method_names))
+    attributes = list(map(string, attributes))
+    classes = {}
+    rows = []
+    method, attribute = 0, 0
+    for name, file_path, package, line, method_count, attribute_count in zip(
+            map(string, names), map(string, files), map(string, packages), lines, method_counts, attribute_counts):
+        end = method + method_count
+        methods = [{"name": method_name, "line_number": method_line}
+                   for method_name, method_line in zip(method_names[method:end], method_lines[method:end])]
+        method = end
+        end = attribute + attribute_count
+        details = {
+            "file_path": file_path,
+            "package": package,
+            "line_number": line,
+            "methods": methods,
+            "attributes": attributes[attribute:end],
+            "base_classes": [],
+            "composition": [],
+            "uses": [],
+        }
+        attribute = end
+        classes[name] = details
+        rows.append(details)
+    for kind in RELATIONSHIPS:
+        edge_count = reader.u32()
+        for source, target in zip(reader.u32_array(edge_count), reader.u32_array(edge_count)):
+            rows[source][kind].append(strings[target])
+    functions = list(map(string, reader.u32_array()))
+    imports = list(map(string, reader.u32_array()))
+    return {"classes": classes, "functions": functions, "imports": imports}
+
+
+class ValueWriter:
+    """Streams the tokens of a JSON value into a seekable binary file.
+
+    Tokens go out in batches as they come; the string table and the object
+    shapes are written by close(), which then fills in the header.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.strings = StringTable()
+        self.shapes = {}
+        self.tokens = array("I")
+        self.count = 0
+        self.start = f.tell()
+        f.write(bytes(HEADER.size + U32.size))
+
+    def write(self, token):
+        self.tokens.append(token)
+        if len(self.tokens) >= FLUSH_TOKENS:
+            self.flush()
+
+    def flush(self):
+        if sys.byteorder == "big":
+            self.tokens.byteswap()
+        self.f.write(self.tokens.tobytes())
+        self.count += len(self.tokens)
+        self.tokens = array("I")
+
+    def scalar(self, value):
+        if isinstance(value, str):
+            return self.strings(value) << 3 | STRING
+        if value is None:
+            return NULL
+        if value is True:
+            return TRUE
+        if value is False:
+            return FALSE
+        if isinstance(value, int) and -SMALL_INT <= value < SMALL_INT:
+            return (value << 1 if value >= 0 else (-value << 1) - 1) << 3 | INT
+        if isinstance(value, (int, float)):
+            # Rare in the dumps: big integers and floats go through the string table
+            return self.strings(repr(value)) << 3 | NUMBER
+        raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+    def close_object(self, keys):
+        """Token closing an object with these keys."""
+        keys = tuple(keys)
+        shape = self.shapes.get(keys)
+        if shape is None:
+            shape = self.shapes[keys] = len(self.shapes)
+        return (shape + 1) << 3 | CLOSE
+
+    def value(self, value, write=None):
+        """Tokens of a whole value, without recursion."""
+        write = write or self.write
+        stack = [iter((value,))]
+        closers = [None]
+        while stack:
+            for item in stack[-1]:
+                if isinstance(item, dict):
+                    write(OPEN)
+                    stack.append(iter(item.values()))
+                    closers.append(self.close_object(map(str, item)))
+                    break
+                if isinstance(item, (list, tuple)):
+                    write(OPEN)
+                    stack.append(iter(item))
+                    closers.append(CLOSE)
+                    break
+                write(self.scalar(item))
+            else:
+                stack.pop()
+                closer = closers.pop()
+                if closer is not None:
+                    write(closer)
+
+    def close(self):
+        self.flush()
+        shape_table = []
+        for keys in self.shapes:
+            shape_table.append(len(keys))
+            shape_table.extend(self.strings(key) for key in keys)
+        f = self.f
+        f.write(self.strings.pack())
+        f.write(U32.pack(len(self.shapes)) + U32.pack(len(shape_table)) + u32_array(shape_table))
+        end = f.tell()
+        f.seek(self.start)
+        f.write(HEADER.pack(MAGIC, SCHEMA_VERSION, VALUE, 0, len(self.strings.strings)) + U32.pack(self.count))
+        f.seek(end)
+
+
+def encode_value(value):
+    """Encode any JSON value, e.g. an AST dump."""
+    f = io.BytesIO()
+    writer = ValueWriter(f)
+    writer.value(value)
+    writer.close()
+    return f.getvalue()
+
+
+def decode_value(string_count, reader):
+    tokens = reader.u32_array()
+    strings = reader.strings(string_count)
+    shape_count = reader.u32()
+    shape_table = reader.u32_array()
+    shapes = []
+    position = 0
+    for _ in range(shape_count):
+        size = shape_table[position]
+        shapes.append(tuple(strings[key] for key in shape_table[position + 1:position + 1 + size]))
+        position += 1 + size
+
+    result = []
+    stack = [result]
+    try:
+        for token in tokens.tolist():
+            tag = token & 7
+            if tag == STRING:
+                value = strings[token >> 3]
+            elif tag == OPEN:
+                stack.append([])
+                continue
+            elif tag == CLOSE:
+                value = stack.pop()
+                if token >> 3:
+                    keys = shapes[(token >> 3) - 1]
+                    if len(keys) != len(value):
+                        raise FormatError("object doesn't match its shape")
+                    value = dict(zip(keys, value))
+            elif tag == INT:
+                n = token >> 3
+                value = -((n + 1) >> 1) if n & 1 else n >> 1
+            elif tag == NULL:
+                value = None
+            elif tag == TRUE:
+                value = True
+            elif tag == FALSE:
+                value = False
+            else:
+                number = strings[token >> 3]
+                value = int(number) if number.lstrip("-").isdigit() else float(number)
+            stack[-1].append(value)
+    except IndexError:
+        raise FormatError("corrupt file") from None
+    if len(stack) != 1 or len(result) != 1:
+        raise FormatError("truncated or corrupt file")
+    return result[0]
+
+
+def loads(data):
+    """JSON-equivalent document of encoded bytes, of either kind."""
+    kind, strings, reader = unpack(data)
+    if kind not in (DIAGRAM, VALUE):
+        raise FormatError(f"unknown kind {kind}")
+    # Only acyclic containers are built, so collections while building them find nothing
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return decode_diagram(strings, reader) if kind == DIAGRAM else decode_value(strings, reader)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def load(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def encode_document(document):
+    if is_diagram(document):
+        return encode_diagram(document["classes"], document.get("functions", ()), document.get("imports", ()))
+    return encode_value(document)
+
+
+def dump(document, path):
+    """Write diagram.json's document or any other JSON value."""
+    write(path, encode_document(document))
+
+
+def write(path, data):
+    # Replaced at once, so readers never see a half-written file
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def is_binary(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def load_document(path):
+    """diagram.json or an AST dump in either encoding."""
+    if is_binary(path):
+        return load(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def convert(path, to_json=False):
+    """Write the other encoding next to `path`; returns the new file name."""
+    document = load_document(path)
+    base = os.path.splitext(path)[0]
+    if to_json:
+        output = base + ".json"
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=4)
+    else:
+        output = base + EXTENSION
+        dump(document, output)
+    return output
+
+
+def compare(json_path):
+    """Sizes and load times of a JSON file and of its binary encoding."""
+    with open(json_path, "rb") as f:
+        text = f.read()
+    document = json.loads(text)
+    data = encode_document(document)
+    decoded = loads(data)
+    identical = decoded == document
+    del document, decoded
+
+    def best_of(load, source, runs=3):
+        best = None
+        for _ in range(runs):
+            started = time.perf_counter()
+            load(source)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    return {
+        "file": json_path,
+        "json_bytes": len(text),
+        "binary_bytes": len(data),
+        "json_load_ms": round(best_of(json.loads, text) * 1000, 2),
+        "binary_load_ms": round(best_of(loads, data) * 1000, 2),
+        "identical": identical,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert diagram.json and AST dumps to and from the binary format.")
+    parser.add_argument("paths", nargs="+", metavar="PATH", help="JSON or binary files.")
+    parser.add_argument("--to-json", action="store_true", help="Write JSON next to binary files (default: binary).")
+    parser.add_argument("--compare", action="store_true",
+                        help="Only report sizes and load times of JSON files against their binary encoding.")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        if args.compare:
+            print(json.dumps(compare(path)))
+        else:
+            print(f"{path} -> {convert(path, args.to_json)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+# context_builder.py
+# Builds the project context sent to the assistant. Instead of the whole
+# diagram.json, a thread gets its class (looked up in the thread mapping),
+# the classes within a few hops of it over inheritance, composition and uses,
+# and a summary per package, trimmed to a token budget.
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+from collections import deque
+
+from diagram_delta import RELATIONSHIP_FIELDS, diff_fingerprint, fingerprint_classes, value_digest
+from thread_mapping import has_mapping, open_mapping
+
+DEFAULT_BUDGET = 4000  # tokens
+DEFAULT_HOPS = 2
+PACKAGE_NAMES = 25  # Class names listed per package summary
+# Closer relationships rank first among classes at the same distance
+KIND_RANK = {"base_classes": 0, "composition": 1, "uses": 2}
+
+
+def estimate_tokens(text):
+    # About four characters per token for English text and JSON
+    return (len(text) + 3) // 4
+
+
+def dumps(value):
+    return json.dumps(value, ensure_ascii=False)
+
+
+def load_diagram(workspace_path=None):
+    path = os.path.join(workspace_path, "diagram.json") if workspace_path else "diagram.json"
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def focused_class(workspace_path, thread_id):
+    """Class whose codebox uses this thread, from the workspace's thread mapping."""
+    if not thread_id or not has_mapping(workspace_path):
+        return None
+    try:
+        return open_mapping(workspace_path).class_for_thread(thread_id)
+    except sqlite3.Error:
+        return None
+
+
+def neighbours(classes):
+    """Undirected adjacency {class: {neighbour: best KIND_RANK}} between known classes."""
+    graph = {name: {} for name in classes}
+    for name, details in classes.items():
+        for field, _ in RELATIONSHIP_FIELDS:
+            rank = KIND_RANK[field]
+            for target in details.get(field, ()):
+                if target == name or target not in graph:
+                    continue
+                for a, b in ((name, target), (target, name)):
+                    if rank < graph[a].get(b, len(KIND_RANK)):
+                        graph[a][b] = rank
+    return graph
+
+
+def rank_neighbourhood(classes, focus, hops):
+    """Classes within `hops` of focus as (distance, name), most relevant first."""
+    graph = neighbours(classes)
+    distance = {focus: 0}
+    rank = {focus: 0}
+    queue = deque([focus])
+    while queue:
+        name = queue.popleft()
+        if distance[name] == hops:
+            continue
+        for neighbour, kind in graph[name].items():
+            if neighbour not in distance:
+                distance[neighbour] = distance[name] + 1
+                rank[neighbour] = kind
+                queue.append(neighbour)
+            elif distance[neighbour] == distance[name] + 1:
+                rank[neighbour] = min(rank[neighbour], kind)
+    # Same distance: closer relationship kind, then more connections
+    order = sorted(distance, key=lambda n: (distance[n], rank[n], -len(graph[n]), n))
+    return [(distance[name], name) for name in order]
+
+
+def brief_details(details):
+    """Class entry without line numbers, for classes further from the focus."""
+    brief = {"package": details.get("package", "")}
+    brief["methods"] = [m["name"] for m in details.get("methods", ())]
+    for field in ("attributes", "base_classes", "composition", "uses"):
+        if details.get(field):
+            brief[field] = details[field]
+    return brief
+
+
+def package_summaries(classes):
+    packages = {}
+    for name, details in classes.items():
+        packages.setdefault(details.get("package", ""), []).append(name)
+    summaries = {}
+    for package, names in sorted(packages.items()):
+        names.sort()
+        summary = {"classes": len(names), "names": names[:PACKAGE_NAMES]}
+        if len(names) > PACKAGE_NAMES:
+            summary["more"] = len(names) - PACKAGE_NAMES
+        summaries[package or "."] = summary
+    return summaries
+
+
+def build_context(diagram, focus=None, budget=DEFAULT_BUDGET, hops=DEFAULT_HOPS):
+    """Context object for `focus` whose JSON stays within about `budget` tokens.
+
+    Filled in order of relevance: the focused class, package summaries, then
+    neighbours by distance, in full while close and briefly further out.
+    Without a (known) focus the best connected classes are used instead.
+    """
+    classes = diagram.get("classes", {})
+    context = {}
+    used = 0
+
+    def fit(text):
+        nonlocal used
+        # +2 for the separator and quotes around each entry
+        cost = estimate_tokens(text) + 2
+        if used + cost > budget:
+            return False
+        used += cost
+        return True
+
+    if focus in classes:
+        context["focus"] = focus
+        candidates = rank_neighbourhood(classes, focus, hops)[1:]
+    else:
+        graph = neighbours(classes)
+        candidates = [(1, name) for name in sorted(classes, key=lambda n: (-len(graph[n]), n))]
+
+    included = {}
+    if focus in classes:
+        # The focused class goes in even when it alone is over budget
+        details = classes[focus]
+        if not fit(dumps(focus) + dumps(details)):
+            details = brief_details(details)
+            used += estimate_tokens(dumps(focus) + dumps(details)) + 2
+        included[focus] = details
+
+    packages = package_summaries(classes)
+    # Left out when the summaries alone would take half of the budget
+    if estimate_tokens(dumps(packages)) <= budget // 2 and fit(dumps(packages)):
+        context["packages"] = packages
+
+    for distance, name in candidates:
+        details = classes[name] if distance <= 1 else brief_details(classes[name])
+        if fit(dumps(name) + dumps(details)):
+            included[name] = details
+        elif distance <= 1:
+            details = brief_details(details)
+            if fit(dumps(name) + dumps(details)):
+                included[name] = details
+
+    context["classes"] = included
+    omitted = len(classes) - len(included)
+    if omitted:
+        context["omitted_classes"] = omitted
+    return context
+
+
+def context_prompt(context):
+    if "focus" in context:
+        intro = f"This is the context of class {context['focus']} and its neighbourhood in the project, in the form of JSON"
+    else:
+        intro = "This is the project context in the form of JSON"
+    return f"\n\n{intro}:\n`json\n{dumps(context)}\n`"
+
+
+def context_digest(context):
+    text = json.dumps(context, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def context_fingerprint(context):
+    """What diff_context() needs of a sent context, much smaller than the context itself."""
+    return {
+        "classes": fingerprint_classes(context.get("classes", {})),
+        "entries": {key: value_digest(value) for key, value in context.items() if key != "classes"},
+    }
+
+
+def diff_context(sent, new):
+    """Class delta against the fingerprint of the context sent before, plus the other entries that changed."""
+    delta = diff_fingerprint(sent["classes"], new.get("classes", {}))
+    # Only the non-empty parts, to keep the message short
+    relationships = {kind: edges for kind, edges in delta.pop("relationships").items() if edges}
+    delta = {key: value for key, value in delta.items() if value}
+    if relationships:
+        delta["relationships"] = relationships
+    entries = sent["entries"]
+    changed = {key: value for key, value in new.items()
+               if key != "classes" and entries.get(key) != value_digest(value)}
+    removed = [key for key in entries if key not in new]
+    if changed:
+        delta["changed"] = changed
+    if removed:
+        delta["removed_entries"] = removed
+    return delta
+
+
+def diff_prompt(delta):
+    return ("\n\nThe project changed since the context sent earlier in this thread. "
+            f"These are the changes in the form of JSON:\n`json\n{dumps(delta)}\n`")
+
+
+def full_prompt(diagram):
+    return f"\n\nThis is the project context in the form of JSON:\n`json\n{dumps(diagram)}\n`"
+
+
+def measure(diagram, focus, budget, hops):
+    full = estimate_tokens(full_prompt(diagram))
+    context = build_context(diagram, focus, budget, hops)
+    built = estimate_tokens(context_prompt(context))
+    return {
+        "focus": focus,
+        "full_tokens": full,
+        "context_tokens": built,
+        "saved_tokens": full - built,
+        "saved_percent": round(100 * (full - built) / full, 1) if full else 0.0,
+        "classes": len(context["classes"]),
+        "omitted_classes": context.get("omitted_classes", 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the token-budgeted project context for the assistant.")
+    parser.add_argument("workspace", nargs="?", default=None, help="Folder with diagram.json and codebox_threads.json.")
+    parser.add_argument("--class", dest="class_name", type=str, default=None, help="Focused class.")
+    parser.add_argument("--thread", type=str, default=None,
+                        help="Focus the class whose codebox uses this thread ID.")
+    parser.add_argument("--budget", type=int, default=DEFAULT_BUDGET,
+                        help=f"Token budget of the context (default: {DEFAULT_BUDGET}).")
+    parser.add_argument("--hops", type=int, default=DEFAULT_HOPS,
+                        help=f"Relationship hops around the focused class (default: {DEFAULT_HOPS}).")
+    parser.add_argument("--measure", action="store_true",
+                        help="Report the prompt size against the full diagram.json instead of printing the context. "
+                             "Without a focus, every class is measured.")
+    args = parser.parse_args()
+
+    diagram = load_diagram(args.workspace)
+    focus = args.class_name or focused_class(args.workspace, args.thread)
+
+    if not args.measure:
+        print(context_prompt(build_context(diagram, focus, args.budget, args.hops)))
+        return
+
+    if focus:
+        print(json.dumps(measure(diagram, focus, args.budget, args.hops), indent=4))
+        return
+
+    results = [measure(diagram, name, args.budget, args.hops) for name in diagram.get("classes", {})]
+    if not results:
+        results = [measure(diagram, None, args.budget, args.hops)]
+    full = results[0]["full_tokens"]
+    built = [result["context_tokens"] for result in results]
+    print(json.dumps({
+        "classes_measured": len(results),
+        "full_tokens": full,
+        "mean_context_tokens": round(sum(built) / len(built), 1),
+        "max_context_tokens": max(built),
+        "mean_saved_percent": round(sum(result["saved_percent"] for result in results) / len(results), 1),
+    }, indent=4))
+
+
+if __name__ == "__main__":
+    main()
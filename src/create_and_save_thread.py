@@ -1,51 +1,27 @@
-import json
-import os
 import sys
-from openai import OpenAI
-from dotenv import load_dotenv
+from assistant_client import create_client
+from thread_mapping import open_mapping
 
-load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-
-client = OpenAI(
-    organization='org-xL8A4RIl6oUOCBUzdOlNFUJ1',
-    project='proj_ZuIi9ZcuFNiWauexpYg7e14r',
-    api_key=api_key
-)
-
-def create_and_store_thread_id(classname: str, filepath: str, workspace_folder: str):
+def create_and_store_thread_id(classname: str, filepath: str, workspace_folder: str, client=None, mapping=None):
     """
-    Vytvorí nové vlákno pomocou OpenAI API a uloží jeho ID do codebox_threads.json.
+    Vytvorí nové vlákno pomocou OpenAI API a uloží jeho ID do mapovania vlákien pracovného priestoru.
 
     Args:
         classname (str): Názov triedy.
         filepath (str): Cesta k súboru.
         workspace_folder (str): Cesta k pracovnému priestoru.
+        client (OpenAI): Zdieľaný klient; ak chýba, vytvorí sa nový.
+        mapping (ThreadMapping): Mapovanie vlákien; ak chýba, otvorí sa to z workspace_folder.
     """
 
-    codebox_threads_path = os.path.join(workspace_folder, "codebox_threads.json")
-
     # Vytvorenie nového vlákna
+    client = client or create_client()
     new_thread = client.beta.threads.create()
     thread_id = new_thread.id
 
-    try:
-        # Načítanie existujúceho obsahu codebox_threads.json
-        with open(codebox_threads_path, "r") as file:
-            codebox_threads = json.load(file)
-    except FileNotFoundError:
-        # Ak súbor neexistuje, vytvorí prázdny slovník
-        codebox_threads = {}
-
-    # Aktualizácia alebo pridanie záznamu pre danú triedu
-    if classname in codebox_threads and codebox_threads[classname]["filePath"] == filepath:
-        codebox_threads[classname]["thread_id"] = thread_id
-    else:
-        codebox_threads[classname] = {"filePath": filepath, "thread_id": thread_id}
-
-    # Uloženie aktualizovaného obsahu do codebox_threads.json
-    with open(codebox_threads_path, "w") as file:
-        json.dump(codebox_threads, file, indent=4)
+    # Aktualizácia alebo pridanie záznamu pre danú triedu, jedným príkazom
+    mapping = mapping or open_mapping(workspace_folder)
+    mapping.upsert(classname, filepath, thread_id)
 
     return thread_id
 
@@ -59,5 +35,7 @@ if __name__ == "__main__":
     workspace_folder = sys.argv[3]
 
     new_thread_id = create_and_store_thread_id(classname, filepath, workspace_folder)
+    # Pre nástroje, ktoré ešte čítajú codebox_threads.json
+    open_mapping(workspace_folder).export_json()
     
     print(new_thread_id)
\ No newline at end of file
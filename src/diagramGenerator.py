@@ -2,6 +2,64 @@ import os
 import ast
 import argparse
 import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from analysis_cache import CACHE_DIR, AnalysisCache, default_cache_path
+from binary_format import EXTENSION as BINARY_EXTENSION, encode_diagram, write as write_binary
+from file_discovery import DEFAULT_MAX_FILE_SIZE, FileDiscovery
+from profiling import NULL_PROFILER, Profiler
+
+# Bump whenever per-file results change shape or content, invalidating caches
+ANALYZER_VERSION = "3"
+
+@dataclass(slots=True)
+class MethodInfo:
+    name: str
+    line_number: int
+
+@dataclass(slots=True)
+class ClassInfo:
+    # Set-like members are stored as sorted tuples of interned strings
+    file_path: str
+    package: str
+    line_number: int
+    methods: tuple
+    attributes: tuple
+    base_classes: tuple
+    composition: tuple
+    uses: tuple
+
+    def to_dict(self):
+        return {
+            "file_path": self.file_path,
+            "package": self.package,
+            "line_number": self.line_number,
+            "methods": [{"name": m.name, "line_number": m.line_number} for m in self.methods],
+            "attributes": list(self.attributes),
+            "base_classes": list(self.base_classes),
+            "composition": list(self.composition),
+            "uses": list(self.uses),
+        }
+
+    def to_tuple(self):
+        # marshal-friendly form used by the analysis cache
+        return (self.file_path, self.package, self.line_number,
+                tuple((m.name, m.line_number) for m in self.methods),
+                self.attributes, self.base_classes, self.composition, self.uses)
+
+    @classmethod
+    def from_tuple(cls, data):
+        file_path, package, line_number, methods, attributes, base_classes, composition, uses = data
+        return cls(sys.intern(file_path), sys.intern(package), line_number,
+                   tuple(MethodInfo(sys.intern(name), line) for name, line in methods),
+                   interned_tuple(attributes, sort=False), interned_tuple(base_classes, sort=False),
+                   interned_tuple(composition, sort=False), interned_tuple(uses, sort=False))
+
+def interned_tuple(names, sort=True):
+    return tuple(sys.intern(name) for name in (sorted(names) if sort else names))
 
 class ProjectAnalyzer(ast.NodeVisitor):
     def __init__(self):
@@ -12,29 +70,18 @@ class ProjectAnalyzer(ast.NodeVisitor):
         self.current_package = None  # Track the current package/module name
 
     def visit_ClassDef(self, node):
-        class_name = node.name
-        bases = [base.id for base in node.bases if isinstance(base, ast.Name)]
-
-        # Initialize class entry
-        self.classes[class_name] = {
-            "file_path": self.current_file,
-            "package": self.current_package,
-            "line_number": node.lineno,
-            "methods": [],
-            "attributes": set(),
-            "base_classes": bases,
-            "composition": set(),
-            "uses": set()
-        }
+        class_name = sys.intern(node.name)
+        bases = tuple(sys.intern(base.id) for base in node.bases if isinstance(base, ast.Name))
+        methods = []
+        attributes = set()
+        composition = set()
+        uses = set()
 
         # Parse class body
         for item in node.body:
             if isinstance(item, ast.FunctionDef):
                 # Detect methods
-                self.classes[class_name]["methods"].append({
-                    "name": item.name,
-                    "line_number": item.lineno
-                })
+                methods.append(MethodInfo(sys.intern(item.name), item.lineno))
 
                 # Extract attributes from __init__ method
                 if item.name == "__init__":
@@ -43,7 +90,7 @@ class ProjectAnalyzer(ast.NodeVisitor):
                             for target in stmt.targets:
                                 if isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name):
                                     if target.value.id == "self":  # Attribute assignment to self
-                                        self.classes[class_name]["attributes"].add(target.attr)
+                                        attributes.add(target.attr)
 
                 # Inspect method body for 'uses' relationships
                 for stmt in item.body:
@@ -52,143 +99,418 @@ class ProjectAnalyzer(ast.NodeVisitor):
                         if isinstance(stmt.targets[0], ast.Attribute) and isinstance(stmt.targets[0].value, ast.Name):
                             if stmt.targets[0].value.id == "self" and isinstance(stmt.value, ast.Call):
                                 if isinstance(stmt.value.func, ast.Name):
-                                    self.classes[class_name]["composition"].add(stmt.value.func.id)
+                                    composition.add(stmt.value.func.id)
 
                     elif isinstance(stmt, ast.Expr):
                         # Detect usage via method calls or attribute access
                         if isinstance(stmt.value, ast.Call) and isinstance(stmt.value.func, ast.Name):
-                            self.classes[class_name]["uses"].add(stmt.value.func.id)
+                            uses.add(stmt.value.func.id)
                         elif isinstance(stmt.value, ast.Call) and isinstance(stmt.value.func, ast.Attribute):
                             if isinstance(stmt.value.func.value, ast.Name):
-                                self.classes[class_name]["uses"].add(stmt.value.func.value.id)
+                                uses.add(stmt.value.func.value.id)
 
                     # Detect object instantiations
                     if isinstance(stmt, ast.Assign) and isinstance(stmt.value, ast.Call):
                         if isinstance(stmt.value.func, ast.Name):  # Direct call, e.g., Book(...)
-                            self.classes[class_name]["uses"].add(stmt.value.func.id)
+                            uses.add(stmt.value.func.id)
                         elif isinstance(stmt.value.func, ast.Attribute):  # Attribute call, e.g., module.Book(...)
                             if isinstance(stmt.value.func.value, ast.Name):
-                                self.classes[class_name]["uses"].add(stmt.value.func.attr)
+                                uses.add(stmt.value.func.attr)
 
             elif isinstance(item, ast.Assign):
                 # Detect class-level attributes
                 for target in item.targets:
                     if isinstance(target, ast.Name):
-                        self.classes[class_name]["attributes"].add(target.id)
+                        attributes.add(target.id)
+
+        # Freeze into the compact model; nested classes are added after their parent
+        self.classes[class_name] = ClassInfo(
+            file_path=self.current_file,
+            package=self.current_package,
+            line_number=node.lineno,
+            methods=tuple(methods),
+            attributes=interned_tuple(attributes),
+            base_classes=bases,
+            composition=interned_tuple(composition),
+            uses=interned_tuple(uses),
+        )
 
         self.generic_visit(node)
 
     def visit_FunctionDef(self, node):
-        self.functions.append(node.name)
+        self.functions.append(sys.intern(node.name))
 
     def visit_Import(self, node):
         for alias in node.names:
-            self.imports.append(alias.name)
+            self.imports.append(sys.intern(alias.name))
 
     def visit_ImportFrom(self, node):
         if node.module:
-            self.imports.append(node.module)
-
-    def analyze(self, directory):
-        for root, _, files in os.walk(directory):
-            for file in files:
-                if file.endswith(".py"):
-                    file_path = os.path.join(root, file)
-                    self.current_file = file_path  # Set the current file
-                    # Determine the package
-                    relative_path = os.path.relpath(file_path, directory)
-                    package_parts = os.path.dirname(relative_path).split(os.sep)
-                    self.current_package = ".".join(part for part in package_parts if part != "")
-                    try:
-                        with open(file_path, "r", encoding="utf-8") as f:
-                            tree = ast.parse(f.read(), filename=file_path)
-                            self.visit(tree)
-                    except (SyntaxError, UnicodeDecodeError) as e:
-                        print(f"Skipping {file_path}: {e}")
+            self.imports.append(sys.intern(node.module))
 
-    def to_json(self, output_file):
-        # Convert sets to lists and include file paths
-        json_ready_classes = {
-            class_name: {
-                **details,
-                "composition": list(details["composition"]),  # Convert set to list
-                "uses": list(details["uses"]),  # Convert set to list
-                "attributes": list(details["attributes"])  # Convert set to list
-            }
-            for class_name, details in self.classes.items()
-        }
-        
-        data = {
-            "classes": json_ready_classes,
-            "functions": self.functions,
-            "imports": self.imports,
-        }
+    def merge(self, result):
+        # Fold a per-file result from analyze_file() into the project model
+        classes, functions, imports, error = result
+        if error:
+            print(error)
+            return
+        self.classes.update(classes)
+        # Results coming back from worker processes carry their own string copies
+        self.functions.extend(map(sys.intern, functions))
+        self.imports.extend(map(sys.intern, imports))
 
-        with open(output_file, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
+    def analyze(self, directory, jobs=1, cache=None, discovery=None, profiler=NULL_PROFILER, progress=None):
+        with profiler.phase("discover"):
+            tasks = discover_files(directory, discovery, profiler)
+        results = analyze_files(tasks, jobs=jobs, cache=cache, profiler=profiler, progress=progress)
+        with profiler.phase("merge"):
+            for result in results:
+                self.merge(result)
+
+    def to_json(self, output_file):
+        # Replaced at once, so readers never see a half-written file
+        temp_file = f"{output_file}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            self.write_json(f)
+        os.replace(temp_file, output_file)
         print(f"Class structure saved to {output_file}")
 
+    def to_binary(self, output_file):
+        # Same content as to_json, encoded straight from the model
+        write_binary(output_file, encode_diagram(self.classes, self.functions, self.imports))
+        print(f"Binary class structure saved to {output_file}")
+
+    def write_json(self, f):
+        # Streams the model in exactly the layout of json.dump(..., indent=4)
+        # without building a JSON-ready copy of it first
+        dumps = json.dumps
+        write = f.write
+        write('{\n    "classes": {')
+        first = True
+        for class_name, info in self.classes.items():
+            write(",\n        " if not first else "\n        ")
+            first = False
+            write(f'{dumps(class_name)}: {{\n'
+                  f'            "file_path": {dumps(info.file_path)},\n'
+                  f'            "package": {dumps(info.package)},\n'
+                  f'            "line_number": {info.line_number},\n'
+                  f'            "methods": ')
+            if info.methods:
+                write("[\n" + ",\n".join(
+                    f'                {{\n                    "name": {dumps(m.name)},\n'
+                    f'                    "line_number": {m.line_number}\n                }}'
+                    for m in info.methods) + "\n            ]")
+            else:
+                write("[]")
+            for field in ("attributes", "base_classes", "composition", "uses"):
+                write(f',\n            "{field}": ')
+                write_json_list(write, getattr(info, field), 12)
+            write("\n        }")
+        write("\n    }" if not first else "}")
+        write(',\n    "functions": ')
+        write_json_list(write, self.functions, 4)
+        write(',\n    "imports": ')
+        write_json_list(write, self.imports, 4)
+        write("\n}")
+
     def to_plantuml(self, output_file):
         with open(output_file, 'w') as f:
             f.write("@startuml\n")
             
             # Write class definitions
             for class_name, class_info in self.classes.items():
-                f.write(f'package "{class_info["package"]}" {{\n')
+                f.write(f'package "{class_info.package}" {{\n')
                 f.write(f'class "{class_name}" as {class_name} {{\n')
                 f.write("    .. Attributes ..\n")
-                for attribute in class_info["attributes"]:
+                for attribute in class_info.attributes:
                     f.write(f"    {attribute}\n")
                 f.write("    .. Methods ..\n")
-                for method in class_info["methods"]:
-                    f.write(f"    {method['name']}() [line: {method['line_number']}]\n")
+                for method in class_info.methods:
+                    f.write(f"    {method.name}() [line: {method.line_number}]\n")
                 f.write("    .. File Path ..\n")
-                f.write(f"    {class_info['file_path']}\n")
+                f.write(f"    {class_info.file_path}\n")
                 f.write("    .. Line Number ..\n")
-                f.write(f"    {class_info['line_number']}\n")
+                f.write(f"    {class_info.line_number}\n")
                 f.write("}\n")
                 f.write("}\n")
                 
             # Write relationships
             for class_name, class_info in self.classes.items():
-                for use in class_info["uses"]:
-                    f.write(f"{class_info['package']}.{class_name} ..> {use} : uses\n")
-                for comp in class_info["composition"]:
-                    f.write(f"{class_info['package']}.{class_name} --> {comp} : composed of\n")
-                for base in class_info["base_classes"]:
-                    f.write(f"{class_info['package']}.{class_name} <|-- {base}\n")
+                for use in class_info.uses:
+                    f.write(f"{class_info.package}.{class_name} ..> {use} : uses\n")
+                for comp in class_info.composition:
+                    f.write(f"{class_info.package}.{class_name} --> {comp} : composed of\n")
+                for base in class_info.base_classes:
+                    f.write(f"{class_info.package}.{class_name} <|-- {base}\n")
        
 
             f.write("@enduml\n")
         print(f"PlantUML diagram source saved to {output_file}")
 
+def get_package(file_path, directory):
+    relative_path = os.path.relpath(file_path, directory)
+    package_parts = os.path.dirname(relative_path).split(os.sep)
+    return ".".join(part for part in package_parts if part != "")
+
+def write_json_list(write, items, indent):
+    # A list of strings laid out like json.dump(..., indent=4) would
+    if not items:
+        write("[]")
+        return
+    pad = " " * (indent + 4)
+    write("[\n" + ",\n".join(pad + json.dumps(item) for item in items) + "\n" + " " * indent + "]")
+
+def encode_result(result):
+    classes, functions, imports, error = result
+    return {name: info.to_tuple() for name, info in classes.items()}, functions, imports, error
+
+def decode_result(data):
+    classes, functions, imports, error = data
+    return {sys.intern(name): ClassInfo.from_tuple(info) for name, info in classes.items()}, functions, imports, error
+
+def discover_files(directory, discovery=None, profiler=NULL_PROFILER):
+    """Return (file_path, package) tasks for the project's Python files."""
+    if discovery is None:
+        discovery = FileDiscovery(directory)
+    tasks = [(file_path, get_package(file_path, directory)) for file_path in discovery.walk()]
+    for file_path, reason in discovery.skipped:
+        profiler.skip(file_path, reason)
+        if reason.startswith("larger than"):
+            print(f"Skipping {file_path}: {reason}")
+    return tasks
+
+def analyze_source(file_path, package, source, profiler=NULL_PROFILER):
+    """Parse and visit one file's source, returning (classes, functions, imports, error)."""
+    analyzer = CountingAnalyzer() if profiler.enabled else ProjectAnalyzer()
+    analyzer.current_file = file_path
+    analyzer.current_package = package
+    try:
+        with profiler.phase("parse"):
+            tree = ast.parse(source, filename=file_path)
+    except SyntaxError as e:
+        profiler.skip(file_path, "syntax error")
+        return {}, [], [], f"Skipping {file_path}: {e}"
+    with profiler.phase("visit"):
+        analyzer.visit(tree)
+    if profiler.enabled:
+        profiler.count("nodes_visited", analyzer.nodes_visited)
+    return analyzer.classes, analyzer.functions, analyzer.imports, None
+
+def analyze_file(task, profiler=NULL_PROFILER):
+    # Kept at module level so it can be shipped to worker processes
+    file_path, package = task
+    try:
+        with profiler.phase("read"):
+            with open(file_path, "r", encoding="utf-8") as f:
+                source = f.read()
+                profiler.count("bytes", os.fstat(f.fileno()).st_size)
+    except UnicodeDecodeError as e:
+        profiler.skip(file_path, "decode error")
+        return {}, [], [], f"Skipping {file_path}: {e}"
+    return analyze_source(file_path, package, source, profiler)
+
+class CountingAnalyzer(ProjectAnalyzer):
+    # Only used with --profile, so normal runs don't pay for the counter
+    def __init__(self):
+        super().__init__()
+        self.nodes_visited = 0
+
+    def visit(self, node):
+        self.nodes_visited += 1
+        return super().visit(node)
+
+def analyze_file_profiled(task, cprofile=None):
+    """analyze_file() timed by a profiler of its own; returns (result, stats) for the parent's profiler.
+
+    `cprofile`, only usable in the parent process, profiles the visit phase.
+    """
+    profiler = Profiler(task[0])
+    if cprofile is not None:
+        profiler.cprofile, profiler.cprofile_phase = cprofile, "visit"
+    result = analyze_file(task, profiler)
+    return result, {"phases": profiler.phases, "counters": profiler.counters, "skipped": profiler.skipped}
+
+def analyze_files(tasks, jobs=1, cache=None, profiler=NULL_PROFILER, progress=None):
+    """Return per-file results for (file_path, package) tasks, in task order.
+
+    progress(done, total) is called as files are finished, cache hits first.
+    """
+    # Cache hits cost a stat() only; the rest goes to the parser
+    results = [None] * len(tasks)
+    pending = []
+    with profiler.phase("cache_lookup"):
+        for index, (file_path, package) in enumerate(tasks):
+            if cache is not None:
+                results[index] = cache.lookup(file_path, package)
+            if results[index] is None:
+                pending.append(index)
+    profiler.count("files", len(tasks))
+    profiler.count("cache_hits", len(tasks) - len(pending))
+
+    worker = analyze_file_profiled if profiler.enabled else analyze_file
+    pending_tasks = [tasks[index] for index in pending]
+    done = len(tasks) - len(pending)
+    if progress is not None:
+        progress(done, len(tasks))
+    with profiler.phase("analyze"):
+        if jobs > 1 and len(pending_tasks) > 1:
+            # Workers return compact per-file results which are merged in task
+            # order, so the output matches a serial run exactly
+            chunksize = max(1, len(pending_tasks) // (jobs * 8))
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                parsed = executor.map(worker, pending_tasks, chunksize=chunksize)
+                if progress is not None:
+                    parsed = report_progress(parsed, progress, done, len(tasks))
+                parsed = list(parsed)
+        else:
+            if profiler.enabled and profiler.cprofile is not None:
+                worker = partial(analyze_file_profiled, cprofile=profiler.cprofile)
+            parsed = map(worker, pending_tasks)
+            if progress is not None:
+                parsed = report_progress(parsed, progress, done, len(tasks))
+            parsed = list(parsed)
+
+    for index, result in zip(pending, parsed):
+        if profiler.enabled:
+            result, stats = result
+            record_file_stats(profiler, tasks[index][0], result, stats)
+        results[index] = result
+        if cache is not None:
+            cache.store(*tasks[index], result)
+    return results
+
+def report_progress(results, progress, done, total):
+    for result in results:
+        done += 1
+        progress(done, total)
+        yield result
+
+class ProgressPrinter:
+    """--progress: JSON lines {"event": "progress", "done", "total"} on stderr, at most every `interval` s."""
+
+    def __init__(self, interval=0.1):
+        self.interval = interval
+        self.last = 0.0
+
+    def __call__(self, done, total):
+        now = time.monotonic()
+        if done < total and now - self.last < self.interval:
+            return
+        self.last = now
+        sys.stderr.write(json.dumps({"event": "progress", "done": done, "total": total}) + "\n")
+        sys.stderr.flush()
+
+def record_file_stats(profiler, file_path, result, stats):
+    for name, (wall, cpu, calls) in stats["phases"].items():
+        profiler.add_phase(name, wall, cpu, calls)
+    for name, amount in stats["counters"].items():
+        profiler.count(name, amount)
+    profiler.count("classes", len(result[0]))
+    for path, reason in stats["skipped"]:
+        profiler.skip(path, reason)
+    profiler.record_file(file_path, {name: entry[0] for name, entry in stats["phases"].items()})
+
 def main():
     parser = argparse.ArgumentParser(description="Generate a project class diagram.")
     parser.add_argument("project_dir", type=str, help="Path to the Python project directory.")
     parser.add_argument("-o", "--output", type=str, default="diagram", help="Base output file name (default: diagram).")
-    parser.add_argument("-f", "--format", type=str, choices=["graphviz", "plantuml", "both"], default="both",
-                        help="Diagram format (default: both).")
+    parser.add_argument("-f", "--format", type=str, choices=["graphviz", "plantuml", "both", "binary"],
+                        default="both",
+                        help=f"Diagram format (default: both); binary also writes <output>{BINARY_EXTENSION}, "
+                             "diagram.json with interned strings and integer edge lists.")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of worker processes for parsing (default: 1, 0 = all cores).")
+    parser.add_argument("--cache", type=str, default=None,
+                        help=f"Per-file analysis cache file (default: <project_dir>/{CACHE_DIR}/analysis.cache).")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the per-file analysis cache.")
+    parser.add_argument("--include", action="append", default=[], metavar="GLOB",
+                        help="Only analyze files matching this glob (repeatable).")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                        help="Skip files and directories matching this glob (repeatable).")
+    parser.add_argument("--max-file-size", type=int, default=DEFAULT_MAX_FILE_SIZE, metavar="BYTES",
+                        help=f"Skip files larger than this (default: {DEFAULT_MAX_FILE_SIZE}, 0 = no limit).")
+    parser.add_argument("--no-gitignore", action="store_true", help="Do not honour .gitignore files.")
+    parser.add_argument("--no-default-excludes", action="store_true",
+                        help="Also analyze virtualenvs, site-packages, node_modules, build output, etc.")
+    parser.add_argument("--profile", type=str, metavar="REPORT",
+                        help="Write per-phase timings and counters as JSON to this file.")
+    parser.add_argument("--profile-top", type=int, default=10, metavar="N",
+                        help="Number of slowest files listed in the profile report (default: 10).")
+    parser.add_argument("--profile-visit", type=str, metavar="FILE",
+                        help="Dump cProfile stats of the visit phase to this file (needs --jobs 1).")
+    parser.add_argument("--progress", action="store_true",
+                        help="Report files done/total as JSON lines on stderr.")
+    parser.add_argument("--watch", action="store_true",
+                        help="Keep running and write diagram deltas to stdout as JSON lines.")
+    parser.add_argument("--poll-interval", type=float, default=None,
+                        help="In watch mode, poll every N seconds instead of using inotify.")
     args = parser.parse_args()
 
     if not os.path.isdir(args.project_dir):
         print(f"Error: {args.project_dir} is not a valid directory.")
         return
 
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+
+    if args.profile_visit and jobs > 1:
+        print("--profile-visit needs a single process, ignoring --jobs")
+        jobs = 1
+
+    profiler = NULL_PROFILER
+    if args.profile or args.profile_visit:
+        profiler = Profiler("diagramGenerator", slowest=args.profile_top,
+                            cprofile_phase="visit" if args.profile_visit else None)
+
+    cache = None
+    if not args.no_cache:
+        cache = AnalysisCache(args.cache or default_cache_path(args.project_dir), ANALYZER_VERSION,
+                              encode=encode_result, decode=decode_result)
+
+    discovery = FileDiscovery(args.project_dir, include=args.include, exclude=args.exclude,
+                              max_file_size=args.max_file_size or None,
+                              use_gitignore=not args.no_gitignore,
+                              default_excludes=not args.no_default_excludes)
+
+    if args.watch:
+        from diagram_watcher import watch
+        watch(args.project_dir, jobs=jobs, cache=cache, discovery=discovery, poll_interval=args.poll_interval)
+        return
+
     analyzer = ProjectAnalyzer()
-    analyzer.analyze(args.project_dir)
+    analyzer.analyze(args.project_dir, jobs=jobs, cache=cache, discovery=discovery, profiler=profiler,
+                     progress=ProgressPrinter() if args.progress else None)
+
+    if cache is not None:
+        with profiler.phase("cache_save"):
+            cache.save()
+        print(f"Analysis cache: {cache.hits} hits, {cache.misses} misses")
 
     json_output = f"{args.output}.json"
-    analyzer.to_json(json_output)
+    with profiler.phase("to_json"):
+        analyzer.to_json(json_output)
+
+    if args.format == "binary":
+        with profiler.phase("to_binary"):
+            analyzer.to_binary(f"{args.output}{BINARY_EXTENSION}")
 
     plantuml_output = f"{args.output}.puml"
-    analyzer.to_plantuml(plantuml_output)
+    with profiler.phase("to_plantuml"):
+        analyzer.to_plantuml(plantuml_output)
 
     # Render PlantUML diagram if the `plantuml` command is installed
     try:
-        os.system(f"plantuml {plantuml_output}")
+        with profiler.phase("plantuml_render"):
+            os.system(f"plantuml {plantuml_output}")
         print(f"PlantUML diagram rendered as {args.output}.png")
     except Exception as e:
         print(f"Could not render PlantUML diagram: {e}")
 
+    if profiler.enabled:
+        profiler.count("classes_in_diagram", len(analyzer.classes))
+        if args.profile:
+            profiler.write(args.profile)
+        if args.profile_visit:
+            profiler.dump_cprofile(args.profile_visit)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,115 @@
+# diagram_delta.py
+# Structural diffs between two versions of the "classes" section of diagram.json
+import hashlib
+import json
+
+RELATIONSHIP_FIELDS = (
+    ("base_classes", "inherits"),
+    ("composition", "composition"),
+    ("uses", "uses"),
+)
+
+
+def class_edges(class_name, details):
+    """Relationship edges of one JSON-ready class as [source, kind, target] triples."""
+    edges = []
+    for field, kind in RELATIONSHIP_FIELDS:
+        for target in details.get(field, ()):
+            edges.append((class_name, kind, target))
+    return edges
+
+
+def diff_classes(old_classes, new_classes, names=None):
+    """Compute an add/remove/update delta between two JSON-ready class maps.
+
+    When `names` is given only those class names are compared, which lets
+    callers that know what changed skip walking the whole model.
+    """
+    if names is None:
+        names = list(old_classes)
+        names.extend(name for name in new_classes if name not in old_classes)
+
+    added, updated, removed = {}, {}, []
+    old_edges, new_edges = set(), set()
+    for name in names:
+        old = old_classes.get(name)
+        new = new_classes.get(name)
+        if old == new:
+            continue
+        if old is None:
+            added[name] = new
+        elif new is None:
+            removed.append(name)
+        else:
+            updated[name] = new
+        if old is not None:
+            old_edges.update(class_edges(name, old))
+        if new is not None:
+            new_edges.update(class_edges(name, new))
+
+    return {
+        "added": added,
+        "removed": removed,
+        "updated": updated,
+        "relationships": {
+            "added": [list(edge) for edge in sorted(new_edges - old_edges)],
+            "removed": [list(edge) for edge in sorted(old_edges - new_edges)],
+        },
+    }
+
+
+def value_digest(value):
+    text = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def fingerprint_classes(classes):
+    """{class_name: [digest, edges]}: all diff_fingerprint() needs to know of a class map."""
+    # The edges' source is the class itself, so only [kind, target] pairs are kept
+    return {name: [value_digest(details), [[kind, target] for _, kind, target in class_edges(name, details)]]
+            for name, details in classes.items()}
+
+
+def diff_fingerprint(fingerprint, new_classes):
+    """The delta diff_classes() would compute, with only the fingerprint of the old class map."""
+    added, updated, removed = {}, {}, []
+    old_edges, new_edges = set(), set()
+    for name in [*fingerprint, *(name for name in new_classes if name not in fingerprint)]:
+        old = fingerprint.get(name)
+        new = new_classes.get(name)
+        if old is not None and new is not None and old[0] == value_digest(new):
+            continue
+        if old is None:
+            added[name] = new
+        elif new is None:
+            removed.append(name)
+        else:
+            updated[name] = new
+        if old is not None:
+            old_edges.update((name, kind, target) for kind, target in old[1])
+        if new is not None:
+            new_edges.update(class_edges(name, new))
+
+    return {
+        "added": added,
+        "removed": removed,
+        "updated": updated,
+        "relationships": {
+            "added": [list(edge) for edge in sorted(new_edges - old_edges)],
+            "removed": [list(edge) for edge in sorted(old_edges - new_edges)],
+        },
+    }
+
+
+def is_empty(delta):
+    return not (delta["added"] or delta["removed"] or delta["updated"]
+                or delta["relationships"]["added"] or delta["relationships"]["removed"])
+
+
+def apply_delta(classes, delta):
+    """Apply a delta produced by diff_classes() to a JSON-ready class map in place."""
+    for name in delta["removed"]:
+        classes.pop(name, None)
+    classes.update(delta["updated"])
+    classes.update(delta["added"])
+    return classes
@@ -0,0 +1,342 @@
+# diagram_watcher.py
+# Long-running mode of diagramGenerator.py: keeps the per-file analysis in
+# memory, re-analyzes only touched files and writes diagram deltas to stdout
+# as JSON lines.
+import ctypes
+import ctypes.util
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+
+from diagram_delta import diff_classes, is_empty
+from diagramGenerator import analyze_files, analyze_source, discover_files, get_package
+from file_discovery import FileDiscovery
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+RESCAN = object()  # Queued when the watcher lost events and a full rescan is needed
+
+
+def normalize(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+class InotifyWatcher:
+    """Recursive directory watcher on top of Linux inotify (via ctypes)."""
+
+    def __init__(self, directory, changes, discovery):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._libc = libc
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.changes = changes
+        self.discovery = discovery
+        self.dirs = {}  # watch descriptor -> directory
+        self.add_tree(directory)
+
+    def add_tree(self, directory):
+        found = []
+        for root, dirs, files in os.walk(directory):
+            # Same pruning as the analysis itself, so ignored trees cost no watches
+            dirs[:] = [d for d in dirs if self.discovery.exclusion_reason(os.path.join(root, d), True) is None
+                       and not os.path.exists(os.path.join(root, d, "pyvenv.cfg"))]
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(root), WATCH_MASK)
+            if wd >= 0:
+                self.dirs[wd] = root
+            found.extend(os.path.join(root, f) for f in files if f.endswith(".py"))
+        return found
+
+    def run(self):
+        header = struct.Struct("iIII")
+        while True:
+            buffer = os.read(self.fd, 64 * 1024)
+            touched = set()
+            offset = 0
+            while offset < len(buffer):
+                wd, mask, _, length = header.unpack_from(buffer, offset)
+                offset += header.size
+                name = os.fsdecode(buffer[offset:offset + length].rstrip(b"\0"))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    self.changes.put(RESCAN)
+                    continue
+                root = self.dirs.get(wd)
+                if root is None or not name:
+                    continue
+                path = os.path.join(root, name)
+                if mask & IN_ISDIR:
+                    # Files may land in a new directory before it is watched
+                    if mask & (IN_CREATE | IN_MOVED_TO) and self.discovery.exclusion_reason(path, True) is None:
+                        touched.update(self.add_tree(path))
+                    elif mask & IN_MOVED_FROM:
+                        self.changes.put(RESCAN)
+                elif name.endswith(".py"):
+                    touched.add(path)
+            touched = {path for path in touched if self.discovery.is_included(path)}
+            if touched:
+                self.changes.put(touched)
+
+
+class PollingWatcher:
+    """Portable fallback that compares (mtime, size) of all files every interval."""
+
+    def __init__(self, directory, changes, discovery, interval=0.5):
+        self.directory = directory
+        self.changes = changes
+        self.discovery = discovery
+        self.interval = interval
+
+    def _scan(self):
+        state = {}
+        for file_path in self.discovery.walk():
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue
+            state[file_path] = (st.st_mtime_ns, st.st_size)
+        return state
+
+    def run(self):
+        previous = self._scan()
+        while True:
+            time.sleep(self.interval)
+            current = self._scan()
+            touched = {path for path, state in current.items() if previous.get(path) != state}
+            touched.update(path for path in previous if path not in current)
+            previous = current
+            if touched:
+                self.changes.put(touched)
+
+
+class DiagramWatcher:
+    def __init__(self, directory, out, jobs=1, cache=None, discovery=None, debounce=0.01, poll_interval=None):
+        self.directory = directory
+        self.discovery = discovery or FileDiscovery(directory)
+        self.out = out
+        self.jobs = jobs
+        self.cache = cache
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.changes = queue.Queue()
+        self.files = {}  # normalized path -> [order, file_path, package, result]
+        self.owners = {}  # class name -> set of normalized paths defining it
+        self.buffers = {}  # normalized path -> unsaved editor content
+        self.next_order = 0
+        self.version = 0
+
+    def load(self):
+        self.files.clear()
+        self.owners.clear()
+        tasks = discover_files(self.directory, self.discovery)
+        for (file_path, package), result in zip(tasks, analyze_files(tasks, jobs=self.jobs, cache=self.cache)):
+            self._set(normalize(file_path), file_path, package, result)
+        if self.cache is not None:
+            self.cache.save()
+
+    def _set(self, key, file_path, package, result):
+        entry = self.files.get(key)
+        if entry is None:
+            entry = self.files[key] = [self.next_order, file_path, package, None]
+            self.next_order += 1
+        else:
+            self._unown(key, entry[3])
+        entry[3] = result
+        for name in result[0]:
+            self.owners.setdefault(name, set()).add(key)
+
+    def _remove(self, key):
+        entry = self.files.pop(key, None)
+        if entry is not None:
+            self._unown(key, entry[3])
+
+    def _unown(self, key, result):
+        for name in result[0]:
+            owners = self.owners.get(name)
+            if owners is not None:
+                owners.discard(key)
+                if not owners:
+                    del self.owners[name]
+
+    def class_details(self, name):
+        # Like a full run, the file analyzed last wins a class name collision
+        owners = self.owners.get(name)
+        if not owners:
+            return None
+        key = max(owners, key=lambda k: self.files[k][0])
+        return self.files[key][3][0][name].to_dict()
+
+    def classes(self):
+        merged = {}
+        for _, _, _, result in sorted(self.files.values(), key=lambda entry: entry[0]):
+            merged.update(result[0])
+        return {name: details.to_dict() for name, details in merged.items()}
+
+    def update(self, touched):
+        """Re-analyze the given files (normalized path -> path; buffer, disk or gone) and return the delta."""
+        parsed = {}
+        for key, path in touched.items():
+            entry = self.files.get(key)
+            file_path = entry[1] if entry else path
+            package = entry[2] if entry else get_package(file_path, self.directory)
+            source = self.buffers.get(key)
+            if source is None:
+                try:
+                    with open(file_path, "r", encoding="utf-8") as f:
+                        source = f.read()
+                except FileNotFoundError:
+                    parsed[key] = None
+                    continue
+                except (OSError, UnicodeDecodeError) as e:
+                    parsed[key] = (file_path, package, ({}, [], [], f"Skipping {file_path}: {e}"))
+                    continue
+            parsed[key] = (file_path, package, analyze_source(file_path, package, source))
+
+        names = set()
+        for key, item in parsed.items():
+            if key in self.files:
+                names.update(self.files[key][3][0])
+            if item is not None:
+                names.update(item[2][0])
+                if item[2][3]:
+                    print(item[2][3], file=sys.stderr)
+        names = sorted(names)
+
+        before = {name: self.class_details(name) for name in names}
+        for key, item in parsed.items():
+            if item is None:
+                self._remove(key)
+            else:
+                self._set(key, *item)
+        after = {name: self.class_details(name) for name in names}
+        before = {name: details for name, details in before.items() if details is not None}
+        after = {name: details for name, details in after.items() if details is not None}
+        return diff_classes(before, after, names)
+
+    def emit(self, message):
+        self.out.write(json.dumps(message) + "\n")
+        self.out.flush()
+
+    def emit_snapshot(self):
+        self.emit({"command": "diagram_snapshot", "version": self.version, "classes": self.classes()})
+
+    def handle_command(self, message):
+        command = message.get("command")
+        if command in ("update_buffer", "close_buffer"):
+            file_path = message.get("file", "")
+            key = normalize(file_path)
+            if not key.startswith(os.path.join(normalize(self.directory), "")) or not self.discovery.is_included(file_path):
+                return {}
+            if command == "update_buffer":
+                self.buffers[key] = message.get("content", "")
+            else:
+                self.buffers.pop(key, None)
+            return {key: file_path}
+        if command == "snapshot":
+            self.emit_snapshot()
+        return {}
+
+    def _read_commands(self):
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                self.changes.put(json.loads(line))
+            except json.JSONDecodeError as e:
+                print(f"Ignoring malformed command: {e}", file=sys.stderr)
+        self.changes.put(None)
+
+    def _start_watcher(self):
+        watcher = None
+        # The watcher thread gets an instance of its own, FileDiscovery caches
+        # gitignore rules and isn't thread-safe
+        discovery = self.discovery.fresh()
+        if self.poll_interval is None and sys.platform.startswith("linux"):
+            try:
+                watcher = InotifyWatcher(self.directory, self.changes, discovery)
+            except (OSError, AttributeError) as e:
+                print(f"inotify unavailable ({e}), falling back to polling", file=sys.stderr)
+        if watcher is None:
+            watcher = PollingWatcher(self.directory, self.changes, discovery, self.poll_interval or 0.5)
+        threading.Thread(target=watcher.run, daemon=True).start()
+
+    def run(self):
+        self._start_watcher()
+        self.load()
+        self.emit_snapshot()
+        threading.Thread(target=self._read_commands, daemon=True).start()
+
+        while True:
+            batch = [self.changes.get()]
+            # Editors often write a file several times per save; coalesce them
+            deadline = time.monotonic() + self.debounce
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.changes.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            started = time.perf_counter()
+            touched = {}  # normalized path -> path as reported, kept for files not analyzed yet
+            rescan = False
+            for item in batch:
+                if item is None:
+                    return
+                if item is RESCAN:
+                    rescan = True
+                elif isinstance(item, dict):
+                    touched.update(self.handle_command(item))
+                else:
+                    for file_path in item:
+                        key = normalize(file_path)
+                        # A save on disk supersedes the unsaved buffer
+                        self.buffers.pop(key, None)
+                        touched[key] = file_path
+
+            if rescan:
+                old = self.classes()
+                self.load()
+                delta = diff_classes(old, self.classes())
+            elif touched:
+                delta = self.update(touched)
+            else:
+                continue
+
+            if not is_empty(delta):
+                self.version += 1
+                self.emit({
+                    "command": "diagram_delta",
+                    "version": self.version,
+                    "base_version": self.version - 1,
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+                    "delta": delta,
+                })
+
+
+def watch(directory, jobs=1, cache=None, discovery=None, debounce=0.01, poll_interval=None):
+    # stdout carries the delta protocol, so route diagnostics to stderr
+    out = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        DiagramWatcher(directory, out, jobs=jobs, cache=cache, discovery=discovery,
+                       debounce=debounce, poll_interval=poll_interval).run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sys.stdout = out
@@ -2,13 +2,14 @@ import * as vscode from "vscode";
 import WebSocket from "ws";
 import * as path from "path";
 import * as child_process from "child_process";
-import * as fs from "fs";
 import { CopilotViewProvider } from "./panel";
+import { AssistantWorker } from "./assistantWorker";
 import { FineTuningJobEventsPage } from "openai/resources/fine-tuning/index.mjs";
 
 // WebSocket instance
 let ws: WebSocket | null = null;
 let provider: CopilotViewProvider | null = null;
+let assistantWorker: AssistantWorker | null = null;
 
 const SECRET_KEY = "openai-api-key";
 
@@ -18,13 +19,26 @@ export function activate(context: vscode.ExtensionContext) {
 
     startPythonServer();
 
+    // One Python process serves all chat requests, instead of a new one per message
+    const responseCache = vscode.workspace.getConfiguration("codingAssistant").get<boolean>("responseCache", false);
+    assistantWorker = new AssistantWorker(
+        path.join(__dirname, "../src/assistant_worker.py"),
+        path.join(__dirname, '../python/venv/Scripts/python.exe'),
+        responseCache ? ["--response-cache"] : []
+    );
+    assistantWorker.start();
+    context.subscriptions.push(assistantWorker);
+    context.subscriptions.push(
+        vscode.commands.registerCommand("vsc-to-unity-data-transfer.provisionThreads", () => provisionThreads(true))
+    );
+
     // Wait for 3 seconds before attempting WebSocket connection
     setTimeout(() => {
         connectWebSocket(context);
     }, 3000);
     
     setTimeout(() => {
-        provider = new CopilotViewProvider(context.extensionUri);
+        provider = new CopilotViewProvider(context.extensionUri, assistantWorker!);
         context.subscriptions.push(
         vscode.window.registerWebviewViewProvider(
             CopilotViewProvider.viewType,
@@ -80,113 +94,134 @@ function executePythonScriptInVenv(scriptPath: string, args: string[]): Promise<
 }
 
 // Function to run the Python code analyzer
-function runPythonCodeAnalyzer(scriptName: string, ws?: WebSocket) {
+// The analysis runs as a job of the Python server, which reports its progress and completion
+function runPythonCodeAnalyzer(ws?: WebSocket) {
     const workspaceFolders = vscode.workspace.workspaceFolders;
     if (!workspaceFolders || workspaceFolders.length === 0) {
         vscode.window.showErrorMessage("No folder is open. Please open a folder in VS Code.");
         return;
     }
 
+    if (!ws || ws.readyState !== WebSocket.OPEN) {
+        vscode.window.showErrorMessage("WebSocket is not connected.");
+        return;
+    }
+
     const currentFolder = workspaceFolders[0].uri.fsPath;
-    const scriptPath = path.resolve(__dirname, '../src', scriptName);
     const outputBaseName = path.join(currentFolder, 'diagram');
-    const jsonOutputPath = `${outputBaseName}.json`;
-    const args = [currentFolder, '-o', outputBaseName, '-f', 'both'];
 
-    console.log(`Running Python script at ${scriptPath}`);
     console.log(`Analyzing project directory: ${currentFolder}`);
     console.log(`Output will be saved in: ${outputBaseName}.json and ${outputBaseName}.puml`);
 
-    executePythonScriptInVenv(scriptPath, args)
-        .then(() => {
-            vscode.window.showInformationMessage("Python Code Analyzer completed successfully.");
-            
-            if (!ws || ws.readyState !== WebSocket.OPEN) {
-                vscode.window.showErrorMessage("WebSocket is not connected.");
-                return;
-            }
+    ws.send(JSON.stringify({
+        command: "analyze",
+        project: currentFolder,
+        output: outputBaseName,
+        format: "both",
+    }));
+}
 
-            // Read and send the generated JSON file
-            fs.readFile(jsonOutputPath, "utf8", (err, data) => {
-                if (err) {
-                    vscode.window.showErrorMessage(`Error reading JSON file: ${err.message}`);
-                    return;
-                }
+let analysisStatus: vscode.Disposable | null = null;
 
-                const message = JSON.stringify({
-                    command: "send_diagram",
-                    fileName: "diagram.json",
-                    content: data
-                });
+function handleAnalysisProgress(data: any) {
+    analysisStatus?.dispose();
+    analysisStatus = vscode.window.setStatusBarMessage(`$(sync~spin) Analyzing project: ${data.done}/${data.total} files`);
+}
 
-                ws.send(message);
-                vscode.window.showInformationMessage("Diagram JSON sent to the server.");
-            });
+// Everything that needs a fresh diagram.json runs once the analysis job reports it
+async function handleAnalysisComplete(data: any) {
+    const workspaceFolders = vscode.workspace.workspaceFolders;
+    if (!workspaceFolders || path.resolve(data.project) !== path.resolve(workspaceFolders[0].uri.fsPath)) {
+        return;
+    }
+    analysisStatus?.dispose();
+    analysisStatus = null;
 
-        })
-        .catch((error) => {
-            vscode.window.showErrorMessage(`Error while running analyzer: ${error}`);
-            console.error(error);
-        });
+    if (data.status === "cancelled") {
+        // Superseded by a newer run, which reports on its own
+        console.log(`Analysis job ${data.job} cancelled: ${data.error}`);
+        return;
+    }
+    if (data.status !== "done") {
+        vscode.window.showErrorMessage(`Error while running analyzer: ${data.error}`);
+        return;
+    }
+    vscode.window.showInformationMessage("Python Code Analyzer completed successfully.");
 
+    // The server itself sends the new diagram to Unity, as a delta when it can
+    if (!ws || ws.readyState !== WebSocket.OPEN) {
+        vscode.window.showErrorMessage("WebSocket is not connected.");
+        return;
+    }
+
+    await updateCodeboxThreads(data.project);
+    sendChatHistoryOfNonDummyThreads(ws);
+    if (vscode.workspace.getConfiguration("codingAssistant").get<boolean>("provisionThreads", false)) {
+        provisionThreads(false);
+    }
 }
 
-function createCodeboxThreadsJson(diagramJsonPath: string, workspaceFolderPath: string) {
+type CodeboxThreads = { [className: string]: { filePath: string; thread_id: string } };
+
+// Entries for the classes of the new diagram.json: new classes get dummy_thread, existing threads are kept
+async function updateCodeboxThreads(workspaceFolderPath: string) {
     try {
-        // 1. Načítanie diagram.json
-        const diagramJsonContent = fs.readFileSync(diagramJsonPath, "utf8");
-        const diagramData = JSON.parse(diagramJsonContent);
-
-        // 2. Parsovanie JSON
-        if (diagramData && diagramData.classes) {
-            const classes = diagramData.classes;
-            const codeboxThreadsData: { [className: string]: { filePath: string; thread_id: string } } = {};
-
-            // 3. Vytvorenie záznamov pre každú triedu z diagram.json
-            for (const className in classes) {
-                if (classes.hasOwnProperty(className)) {
-                    const classInfo = classes[className];
-                    const filePath = classInfo.file_path;
-
-                    codeboxThreadsData[className] = {
-                        filePath: filePath,
-                        thread_id: "dummy_thread",
-                    };
-                }
-            }
+        if (!assistantWorker) {
+            throw new Error("The assistant worker is not running.");
+        }
+        const result = await assistantWorker.request<{ added: number; moved: number; removed: number }>(
+            "merge_classes", { workspace_folder: workspaceFolderPath }
+        );
+        console.log(`Updated the codebox threads: ${result.added} added, ${result.moved} moved, ${result.removed} removed.`);
+        vscode.window.showInformationMessage("Codebox threads updated successfully.");
+    } catch (error) {
+        vscode.window.showErrorMessage(`Error updating codebox threads: ${error}`);
+        console.error(`Error updating codebox threads: ${error}`);
+    }
+}
 
-            // 4. Načítanie existujúceho codebox_threads.json (ak existuje)
-            const codeboxThreadsJsonPath = path.join(workspaceFolderPath, "codebox_threads.json");
-            let existingCodeboxThreadsData: { [className: string]: { filePath: string; thread_id: string } } = {};
-            if (fs.existsSync(codeboxThreadsJsonPath)) {
-                const existingContent = fs.readFileSync(codeboxThreadsJsonPath, "utf8");
-                existingCodeboxThreadsData = JSON.parse(existingContent);
-            }
+async function getCodeboxThreads(workspacePath: string): Promise<CodeboxThreads> {
+    if (!assistantWorker) {
+        throw new Error("The assistant worker is not running.");
+    }
+    return assistantWorker.request<CodeboxThreads>("get_thread_mapping", { workspace_folder: workspacePath });
+}
 
-            // 5. Zachovanie záznamov, ktoré nemajú dummy_thread a existujú v existujúcom súbore
-            for (const className in existingCodeboxThreadsData) {
-                if (existingCodeboxThreadsData.hasOwnProperty(className)) {
-                    if (existingCodeboxThreadsData[className].thread_id !== "dummy_thread" && codeboxThreadsData[className]) {
-                        codeboxThreadsData[className].thread_id = existingCodeboxThreadsData[className].thread_id;
-                    }
-                }
-            }
+interface ProvisionSummary {
+    missing: number;
+    created: number;
+    resumed: number;
+    failed: { [className: string]: string };
+}
 
-            // 6. Uloženie aktualizovaného súboru s informáciami o všetkých triedach
-            fs.writeFileSync(codeboxThreadsJsonPath, JSON.stringify(codeboxThreadsData, null, 4), "utf8");
+// Creates threads for all classes still on dummy_thread, so opening a codebox doesn't wait for one
+async function provisionThreads(verbose: boolean) {
+    const workspaceFolders = vscode.workspace.workspaceFolders;
+    if (!workspaceFolders || workspaceFolders.length === 0 || !assistantWorker) {
+        vscode.window.showErrorMessage("No folder is open. Please open a folder in VS Code.");
+        return;
+    }
 
-            console.log("Updated codebox_threads.json with class information.");
-            vscode.window.showInformationMessage("codebox_threads.json updated successfully.");
-        } else {
-            vscode.window.showErrorMessage("diagram.json does not contain class information.");
+    try {
+        const summary = await assistantWorker.request<ProvisionSummary>("provision_threads", {
+            workspace_folder: workspaceFolders[0].uri.fsPath,
+        });
+        const failed = Object.keys(summary.failed).length;
+        if (failed > 0) {
+            vscode.window.showWarningMessage(
+                `Created ${summary.created + summary.resumed} assistant threads, ${failed} failed. Run the command again to retry.`
+            );
+        } else if (verbose || summary.missing > 0) {
+            vscode.window.showInformationMessage(`Created ${summary.created + summary.resumed} assistant threads.`);
         }
+        sendCodeboxThreadsViaWebSocket();
     } catch (error) {
-        vscode.window.showErrorMessage(`Error updating codebox_threads.json: ${error}`);
-        console.error(`Error updating codebox_threads.json: ${error}`);
+        vscode.window.showErrorMessage(`Error creating assistant threads: ${error}`);
+        console.error(`Error creating assistant threads: ${error}`);
     }
 }
 
-function sendCodeboxThreadsViaWebSocket() {
+async function sendCodeboxThreadsViaWebSocket() {
     const workspaceFolders = vscode.workspace.workspaceFolders;
     if (!workspaceFolders || workspaceFolders.length === 0) {
         console.error("No workspace folder found.");
@@ -194,23 +229,21 @@ function sendCodeboxThreadsViaWebSocket() {
     }
 
     const workspacePath = workspaceFolders[0].uri.fsPath;
-    const codeboxThreadsJsonPath = path.join(workspacePath, "codebox_threads.json");
 
     try {
-        const codeboxThreadsJsonContent = fs.readFileSync(codeboxThreadsJsonPath, "utf8");
-        const codeboxThreadsData = JSON.parse(codeboxThreadsJsonContent);
+        const codeboxThreadsData = await getCodeboxThreads(workspacePath);
 
         if (ws && ws.readyState === WebSocket.OPEN) {
             ws.send(JSON.stringify({
                 command: "AssignThreadsToCodeboxes",
                 data: codeboxThreadsData,
             }));
-            console.log("Sent codebox_threads.json via WebSocket.");
+            console.log("Sent codebox threads via WebSocket.");
         } else {
             console.error("WebSocket is not open.");
         }
     } catch (error) {
-        console.error(`Error reading or sending codebox_threads.json: ${error}`);
+        console.error(`Error reading or sending codebox threads: ${error}`);
     }
 }
 
@@ -223,30 +256,31 @@ async function sendChatHistoryOfNonDummyThreads(ws: WebSocket) {
     }
 
     const workspacePath = workspaceFolders[0].uri.fsPath;
-    const codeboxThreadsJsonPath = path.join(workspacePath, "codebox_threads.json");
 
     try {
-        const codeboxThreadsJsonContent = fs.readFileSync(codeboxThreadsJsonPath, "utf8");
-        const codeboxThreadsData = JSON.parse(codeboxThreadsJsonContent);
+        const codeboxThreadsData = await getCodeboxThreads(workspacePath);
+
+        const classNames = Object.keys(codeboxThreadsData).filter(
+            (className) => codeboxThreadsData[className].thread_id !== "dummy_thread"
+        );
+        // All threads in one request, fetched concurrently by the worker
+        const histories = await getChatHistories(classNames.map((className) => codeboxThreadsData[className].thread_id));
 
         const chatHistoryData = [];
 
-        for (const className in codeboxThreadsData) {
-            if (codeboxThreadsData.hasOwnProperty(className)) {
-                const threadInfo = codeboxThreadsData[className];
-                if (threadInfo.thread_id !== "dummy_thread") {
-                    try {
-                        const chatHistory = await getChatHistory(threadInfo.thread_id);
-                        chatHistoryData.push({
-                            className: className,
-                            filePath: threadInfo.filePath,
-                            chatHistory: chatHistory, // chatHistory teraz obsahuje len rolu a text
-                        });
-                    } catch (error) {
-                        console.error(`Error fetching chat history for ${className}: ${error}`);
-                        vscode.window.showErrorMessage(`Error fetching chat history for ${className}: ${error}`);
-                    }
-                }
+        for (const className of classNames) {
+            const threadInfo = codeboxThreadsData[className];
+            const chatHistory = histories.threads[threadInfo.thread_id];
+            if (chatHistory) {
+                chatHistoryData.push({
+                    className: className,
+                    filePath: threadInfo.filePath,
+                    chatHistory: chatHistory, // chatHistory teraz obsahuje len rolu a text
+                });
+            } else {
+                const error = histories.errors[threadInfo.thread_id];
+                console.error(`Error fetching chat history for ${className}: ${error}`);
+                vscode.window.showErrorMessage(`Error fetching chat history for ${className}: ${error}`);
             }
         }
 
@@ -276,34 +310,39 @@ interface ExtractedMessage {
     text: string | null;
 }
 
-async function getChatHistory(threadId: string): Promise<ExtractedMessage[]> {
-    const scriptPath = path.join(__dirname, "../src/get_messages.py");
-    try {
-        const chatJsonContent = await executePythonScriptInVenv(scriptPath, [threadId]);
-        console.log(`Raw Python script output for threadId ${threadId}: ${chatJsonContent}`); // Log raw output
+interface ChatHistories {
+    threads: { [threadId: string]: ExtractedMessage[] };
+    errors: { [threadId: string]: string };
+}
 
-        const cleanedJsonContent = chatJsonContent.trim();
+function extractMessages(chatData: ChatMessage[]): ExtractedMessage[] {
+    return chatData.map((item: ChatMessage) => {
+        const content = item.content.find(c => c.type === "text");
+        return {
+            role: item.role,
+            text: content ? content.value : null,
+        };
+    });
+}
 
-        try {
-            const chatData: ChatMessage[] = JSON.parse(cleanedJsonContent);
-            const extractedMessages: ExtractedMessage[] = chatData.map((item: ChatMessage) => {
-                const content = item.content.find(c => c.type === "text");
-                return {
-                    role: item.role,
-                    text: content ? content.value : null,
-                };
-            });
-            return extractedMessages;
-        } catch (jsonError) {
-            console.error(`Error parsing JSON from Python script: ${jsonError}, raw output: ${cleanedJsonContent}`);
-            vscode.window.showErrorMessage(`Error parsing JSON from Python script: ${jsonError}`);
-            return [];
+async function getChatHistories(threadIds: string[]): Promise<ChatHistories> {
+    const histories: ChatHistories = { threads: {}, errors: {} };
+    if (!assistantWorker || threadIds.length === 0) {
+        return histories;
+    }
+    try {
+        const result = await assistantWorker.request<{ threads: { [threadId: string]: ChatMessage[] }; errors: { [threadId: string]: string } }>(
+            "get_messages_bulk", { thread_ids: threadIds, concurrency: 8 }
+        );
+        for (const threadId in result.threads) {
+            histories.threads[threadId] = extractMessages(result.threads[threadId]);
         }
+        histories.errors = result.errors;
     } catch (error) {
-        console.error(`Error executing Python script for chat history: ${error}`);
-        vscode.window.showErrorMessage(`Error executing Python script for chat history: ${error}`);
-        return [];
+        console.error(`Error fetching chat history from the assistant worker: ${error}`);
+        threadIds.forEach((threadId) => histories.errors[threadId] = `${error}`);
     }
+    return histories;
 }
 
 // Helper function to get the class name at the cursor's position
@@ -412,18 +451,9 @@ export function handleRunPythonAnalyzer(ws?: WebSocket) {
             return;
         }
 
-        const currentFolder = workspaceFolders[0].uri.fsPath;
-        const diagramJsonPath = path.join(currentFolder, "diagram.json");
-
         try {
-            runPythonCodeAnalyzer("diagramGenerator.py", ws);
-            setTimeout(() => {
-                createCodeboxThreadsJson(diagramJsonPath, currentFolder);
-            }, 2000);
-            setTimeout(() => {
-                sendChatHistoryOfNonDummyThreads(ws!);
-            }, 2000);
-            
+            // The follow-up steps run on the job's analysis_complete event
+            runPythonCodeAnalyzer(ws);
         } catch (error) {
             vscode.window.showErrorMessage(`Failed to run Python analyzer: ${error}`);
             console.error(error);
@@ -469,6 +499,8 @@ async function connectWebSocket(context: vscode.ExtensionContext) {
         ws.onopen = () => {
             console.log("WebSocket connection opened successfully.");
             vscode.window.showInformationMessage("WebSocket connected to Python server.");
+            // Diagrams are pushed by the server to Unity, not to this client
+            ws!.send(JSON.stringify({ command: "hello", role: "vscode" }));
             // Now that WebSocket is connected, register commands
             registerCommands(context, ws!);
         };
@@ -481,6 +513,10 @@ async function connectWebSocket(context: vscode.ExtensionContext) {
                     handleJumpToClassMessage(data);
                 }else if(data.command === "SwitchToThisCodeboxInAIAssistant") {
                     provider!.handleSwitchToCodebox(data);
+                } else if (data.command === "analysis_progress") {
+                    handleAnalysisProgress(data);
+                } else if (data.command === "analysis_complete") {
+                    handleAnalysisComplete(data);
                 }
             } catch (e) {
                 console.error("Error parsing message: ", e);
@@ -0,0 +1,248 @@
+# file_discovery.py
+# os.scandir based discovery of the Python files to analyze, honouring
+# .gitignore files, built-in excludes (VCS metadata, virtualenvs, build
+# output), user include/exclude globs and a file size cutoff.
+import os
+import re
+
+# Directory names that are never part of the analyzed project
+DEFAULT_EXCLUDE_DIRS = {
+    ".git", ".hg", ".svn", ".tox", ".nox", ".venv", "venv", ".eggs",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache", ".diagram-cache", "__pycache__",
+    "node_modules", "site-packages", "dist-packages", "build", "dist",
+}
+DEFAULT_EXCLUDE_GLOBS = ("*.egg-info",)
+DEFAULT_MAX_FILE_SIZE = 2 * 1024 * 1024
+
+
+def translate_glob(pattern):
+    """Translate a gitignore-style glob into a regex body (no anchors)."""
+    parts = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == n:
+            parts.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*")
+            i += 2
+        elif c == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif c == "?":
+            parts.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = pattern.find("]", i + 2)
+            if end == -1:
+                parts.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                parts.append("[" + body.replace("\\", "\\\\") + "]")
+                i = end + 1
+        elif c == "\\" and i + 1 < n:
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(c))
+            i += 1
+    return "".join(parts)
+
+
+def compile_glob(pattern):
+    """Compile a glob matched against a '/'-separated path relative to a base.
+
+    As in .gitignore, a pattern without a slash (other than a trailing one)
+    matches at any depth; otherwise it is anchored to the base.
+    """
+    if pattern.startswith("/") or "/" in pattern.rstrip("/"):
+        return re.compile("^" + translate_glob(pattern.lstrip("/")) + "$")
+    return re.compile("^(?:.*/)?" + translate_glob(pattern) + "$")
+
+
+def parse_gitignore(text):
+    """Return (regex, negated, directory_only) rules for a .gitignore body."""
+    rules = []
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        # Trailing spaces are ignored unless escaped
+        stripped = line.rstrip(" ")
+        if stripped.endswith("\\") and len(stripped) < len(line):
+            stripped += " "
+        line = stripped
+        negated = line.startswith("!")
+        if negated:
+            line = line[1:]
+        elif line.startswith("\\!") or line.startswith("\\#"):
+            line = line[1:]
+        directory_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        rules.append((compile_glob(line), negated, directory_only))
+    return rules
+
+
+class FileDiscovery:
+    """Finds the .py files of a project, pruning excluded directories early.
+
+    Skipped entries are recorded as (path, reason) pairs in `skipped`.
+    """
+
+    def __init__(self, root, include=(), exclude=(), max_file_size=DEFAULT_MAX_FILE_SIZE,
+                 use_gitignore=True, default_excludes=True):
+        include, exclude = list(include), list(exclude)
+        self._arguments = (root, include, list(exclude), max_file_size, use_gitignore, default_excludes)
+        self.root = os.path.normpath(root)
+        self.include = [compile_glob(pattern) for pattern in include]
+        if default_excludes:
+            exclude.extend(DEFAULT_EXCLUDE_GLOBS)
+        self.exclude = [compile_glob(pattern.rstrip("/")) for pattern in exclude]
+        self.exclude_dirs = DEFAULT_EXCLUDE_DIRS if default_excludes else set()
+        self.detect_venvs = default_excludes
+        self.max_file_size = max_file_size
+        self.use_gitignore = use_gitignore
+        self.skipped = []
+        self._rules = {}  # directory -> gitignore rule stack in effect inside it
+
+    def fresh(self):
+        """A new instance with the same settings and none of the cached state, for another thread."""
+        return FileDiscovery(*self._arguments)
+
+    def _relative(self, path):
+        relative = os.path.relpath(path, self.root)
+        return "" if relative == "." else relative.replace(os.sep, "/")
+
+    def _load_rules(self, directory, parent_rules, names):
+        rules = parent_rules
+        if self.use_gitignore:
+            extra = []
+            if directory == self.root:
+                extra.append(os.path.join(directory, ".git", "info", "exclude"))
+            if ".gitignore" in names:
+                extra.append(os.path.join(directory, ".gitignore"))
+            for ignore_file in extra:
+                try:
+                    with open(ignore_file, "r", encoding="utf-8", errors="replace") as f:
+                        parsed = parse_gitignore(f.read())
+                except OSError:
+                    continue
+                if parsed:
+                    rules = rules + ((directory, parsed),)
+        self._rules[directory] = rules
+        return rules
+
+    def _gitignored(self, rules, path, is_dir):
+        ignored = False
+        for base, base_rules in rules:
+            relative = os.path.relpath(path, base).replace(os.sep, "/")
+            for regex, negated, directory_only in base_rules:
+                if directory_only and not is_dir:
+                    continue
+                if regex.match(relative):
+                    ignored = not negated
+        return ignored
+
+    def exclusion_reason(self, path, is_dir, rules=None):
+        """Why `path` is excluded, or None. `rules` defaults to those of its parent."""
+        name = os.path.basename(path)
+        relative = self._relative(path)
+        if is_dir and name in self.exclude_dirs:
+            return "default exclude"
+        if any(regex.match(relative) for regex in self.exclude):
+            return "excluded by glob"
+        if rules is None:
+            rules = self._rules_for(os.path.dirname(path))
+        if rules and self._gitignored(rules, path, is_dir):
+            return "gitignored"
+        if not is_dir and self.include and not any(regex.match(relative) for regex in self.include):
+            return "not included"
+        return None
+
+    def _rules_for(self, directory):
+        rules = self._rules.get(directory)
+        if rules is None:
+            if self._relative(directory).startswith(".."):
+                return ()
+            parent_rules = () if directory == self.root else self._rules_for(os.path.dirname(directory))
+            try:
+                names = os.listdir(directory) if self.use_gitignore else []
+            except OSError:
+                names = []
+            rules = self._load_rules(directory, parent_rules, names)
+        return rules
+
+    def is_included(self, path):
+        """Check a single file, e.g. one reported by a file watcher."""
+        if not path.endswith(".py"):
+            return False
+        directory = os.path.dirname(path)
+        relative_dir = self._relative(directory)
+        current = self.root
+        for part in relative_dir.split("/") if relative_dir else []:
+            if part == "..":
+                return False
+            current = os.path.join(current, part)
+            if self.exclusion_reason(current, True) is not None:
+                return False
+            if self.detect_venvs and os.path.exists(os.path.join(current, "pyvenv.cfg")):
+                return False
+        return self.exclusion_reason(path, False) is None
+
+    def walk(self):
+        """Return the included .py file paths, sorted within each directory."""
+        self.skipped = []
+        found = []
+        stack = [(self.root, ())]
+        while stack:
+            directory, parent_rules = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError as e:
+                self.skipped.append((directory, f"unreadable: {e.strerror}"))
+                continue
+
+            names = {entry.name for entry in entries}
+            if self.detect_venvs and directory != self.root and "pyvenv.cfg" in names:
+                self.skipped.append((directory, "virtualenv"))
+                continue
+            rules = self._load_rules(directory, parent_rules, names)
+
+            subdirs = []
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    continue
+                if not is_dir and not entry.name.endswith(".py"):
+                    continue
+                reason = self.exclusion_reason(entry.path, is_dir, rules)
+                if reason is not None:
+                    self.skipped.append((entry.path, reason))
+                    continue
+                if is_dir:
+                    subdirs.append(entry.path)
+                    continue
+                if self.max_file_size is not None:
+                    try:
+                        size = entry.stat().st_size
+                    except OSError:
+                        continue
+                    if size > self.max_file_size:
+                        self.skipped.append((entry.path, f"larger than {self.max_file_size} bytes"))
+                        continue
+                found.append(entry.path)
+
+            # Depth first in name order, like a sorted os.walk
+            for subdir in reversed(subdirs):
+                stack.append((subdir, rules))
+        return found
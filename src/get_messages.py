@@ -1,36 +1,121 @@
-from openai import OpenAI
+import argparse
+import asyncio
 import json
-import sys
 import logging
-from dotenv import load_dotenv
-import os
+from assistant_client import create_async_client, create_client
+from message_store import message_record, open_store
 
-load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
+PAGE_SIZE = 100  # Largest page the messages endpoint returns
 
-client = OpenAI(
-    organization='org-xL8A4RIl6oUOCBUzdOlNFUJ1',
-    project='proj_ZuIi9ZcuFNiWauexpYg7e14r',
-    api_key=api_key
-)
+def fetch_thread_messages(client, thread_id):
+    """All messages of the thread, newest first, following the cursor to the last page."""
+    page = client.beta.threads.messages.list(thread_id=thread_id, limit=PAGE_SIZE, order="desc")
+    messages = [message_record(msg) for msg in page.data]
+    while page.has_next_page():
+        page = page.get_next_page()
+        messages.extend(message_record(msg) for msg in page.data)
+    return messages
 
-def get_thread_messages(thread_id):
+async def fetch_thread_messages_async(client, thread_id):
+    page = await client.beta.threads.messages.list(thread_id=thread_id, limit=PAGE_SIZE, order="desc")
+    messages = [message_record(msg) for msg in page.data]
+    while page.has_next_page():
+        page = await page.get_next_page()
+        messages.extend(message_record(msg) for msg in page.data)
+    return messages
+
+def refresh_thread(client, store, thread_id):
+    """Store the messages newer than the last cached one; returns how many."""
+    after = store.last_message_id(thread_id)
+    params = {"after": after} if after else {}
+    page = client.beta.threads.messages.list(thread_id=thread_id, limit=PAGE_SIZE, order="asc", **params)
+    added = store.add_messages(thread_id, page.data)
+    while page.has_next_page():
+        page = page.get_next_page()
+        added += store.add_messages(thread_id, page.data)
+    return added
+
+async def refresh_thread_async(client, store, thread_id):
+    after = store.last_message_id(thread_id)
+    params = {"after": after} if after else {}
+    page = await client.beta.threads.messages.list(thread_id=thread_id, limit=PAGE_SIZE, order="asc", **params)
+    added = store.add_messages(thread_id, page.data)
+    while page.has_next_page():
+        page = await page.get_next_page()
+        added += store.add_messages(thread_id, page.data)
+    return added
+
+def read_thread_messages(client, thread_id, store=None, refresh=True):
+    """Messages of the thread, newest first; served from `store` when given.
+
+    Without `refresh` no request is made and an uncached thread is empty.
+    """
+    if store is None:
+        return fetch_thread_messages(client, thread_id)
+    if refresh:
+        refresh_thread(client, store, thread_id)
+    return store.get_messages(thread_id)
+
+async def fetch_many_thread_messages(thread_ids, concurrency=8, store=None):
+    """Fetch many threads at once with at most `concurrency` requests in flight.
+
+    Returns {"threads": {thread_id: messages}, "errors": {thread_id: message}}.
+    With a store only messages newer than the cached ones are downloaded.
+    """
+    threads = {}
+    errors = {}
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    client = create_async_client()
+
+    async def fetch(thread_id):
+        async with semaphore:
+            try:
+                if store is None:
+                    threads[thread_id] = await fetch_thread_messages_async(client, thread_id)
+                else:
+                    await refresh_thread_async(client, store, thread_id)
+                    threads[thread_id] = store.get_messages(thread_id)
+            except Exception as e:
+                logging.error(f"Error fetching thread messages of {thread_id}: {e}")
+                errors[thread_id] = str(e)
+
+    try:
+        # dict.fromkeys drops duplicate IDs but keeps their order
+        await asyncio.gather(*(fetch(thread_id) for thread_id in dict.fromkeys(thread_ids)))
+    finally:
+        await client.close()
+    return {"threads": threads, "errors": errors}
+
+def get_many_thread_messages(thread_ids, concurrency=8, store=None):
+    return json.dumps(asyncio.run(fetch_many_thread_messages(thread_ids, concurrency, store)))
+
+def get_thread_messages(thread_id, store=None):
     try:
-        response = client.beta.threads.messages.list(thread_id=thread_id, limit=50, order="desc") 
-        messages = []
-        for msg in response.data:
-            content_list = []
-            for content in msg.content:
-                if content.type == "text":
-                    content_list.append({"type": "text", "value": content.text.value})
-            messages.append({"role": msg.role, "content": content_list})
-        return json.dumps(messages)
+        return json.dumps(read_thread_messages(create_client(), thread_id, store))
     except Exception as e:
         logging.error(f"Error fetching thread messages: {e}")
         return json.dumps([])
 
 if __name__ == "__main__":
-    thread_id = sys.argv[1] if len(sys.argv) > 1 else None
+    parser = argparse.ArgumentParser(
+        description="Print the messages of assistant threads as JSON.",
+        fromfile_prefix_chars="@",
+    )
+    parser.add_argument("thread_ids", nargs="*", metavar="THREAD_ID",
+                        help="Thread IDs; @FILE reads them from a file, one per line.")
+    parser.add_argument("--bulk", action="store_true",
+                        help="Fetch all given threads concurrently and print one object keyed by thread ID.")
+    parser.add_argument("-j", "--concurrency", type=int, default=8,
+                        help="Requests in flight in bulk mode (default: 8).")
+    parser.add_argument("--store", type=str, default=None,
+                        help="Local message store (default: $ASSISTANT_MESSAGE_STORE or message_store.sqlite3 here).")
+    parser.add_argument("--no-store", action="store_true",
+                        help="Download full histories without the local message store.")
+    args = parser.parse_args()
 
-    result = get_thread_messages(thread_id)
-    print(result)
\ No newline at end of file
+    store = None if args.no_store else open_store(args.store)
+    if args.bulk:
+        print(get_many_thread_messages(args.thread_ids, args.concurrency, store))
+    else:
+        thread_id = args.thread_ids[0] if args.thread_ids else None
+        print(get_thread_messages(thread_id, store))
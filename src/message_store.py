@@ -0,0 +1,219 @@
+# message_store.py
+# Local copy of assistant thread messages, so chat histories are displayed
+# without downloading them again. A refresh asks the API only for messages
+# after the newest cached one; send_message.py and send_context_to_assistant.py
+# write their messages through.
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA_VERSION = 2
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "message_store.sqlite3")
+
+
+def store_path(path=None):
+    return path or os.getenv("ASSISTANT_MESSAGE_STORE") or DEFAULT_PATH
+
+
+def message_record(msg):
+    content_list = []
+    for content in msg.content:
+        if content.type == "text":
+            content_list.append({"type": "text", "value": content.text.value})
+    return {"role": msg.role, "content": content_list}
+
+
+class MessageStore:
+    """SQLite (WAL) store of thread messages keyed by thread and message ID.
+
+    Rows are inserted oldest first, so seq order is the thread's order.
+    Threads are only ever cached from their first message up to a known last
+    one; when the store grows past max_bytes the least recently read threads
+    are dropped as a whole, which keeps that invariant for the `after` cursor.
+    A thread row may exist just for the fingerprint of the context last sent
+    to it (cached = 0); its size counts toward max_bytes all the same.
+    """
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = store_path(path)
+        self.max_bytes = max_bytes
+        # One connection shared by the worker's threads; the lock serializes it
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+
+    def _create_schema(self):
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            self.db.executescript("DROP TABLE IF EXISTS messages; DROP TABLE IF EXISTS threads; "
+                                  "DROP TABLE IF EXISTS sent_contexts;")
+        self.db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS threads (
+                thread_id TEXT PRIMARY KEY,
+                last_message_id TEXT,
+                size INTEGER NOT NULL DEFAULT 0,
+                last_access REAL NOT NULL,
+                cached INTEGER NOT NULL DEFAULT 1
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                thread_id TEXT NOT NULL,
+                message_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                UNIQUE (thread_id, message_id)
+            );
+            CREATE INDEX IF NOT EXISTS messages_by_thread ON messages (thread_id, seq);
+            CREATE TABLE IF NOT EXISTS sent_contexts (
+                thread_id TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                fingerprint TEXT NOT NULL
+            );
+            PRAGMA user_version = {SCHEMA_VERSION};
+        """)
+
+    def has_thread(self, thread_id):
+        with self.lock:
+            return self.db.execute("SELECT 1 FROM threads WHERE thread_id = ? AND cached",
+                                   (thread_id,)).fetchone() is not None
+
+    def last_message_id(self, thread_id):
+        """Cursor for the next refresh; None when the thread isn't cached yet."""
+        with self.lock:
+            row = self.db.execute("SELECT last_message_id FROM threads WHERE thread_id = ?", (thread_id,)).fetchone()
+        return row[0] if row else None
+
+    def add_messages(self, thread_id, messages):
+        """Append API message objects, oldest first. Also marks the thread as cached."""
+        rows = []
+        for msg in messages:
+            record = message_record(msg)
+            rows.append((thread_id, msg.id, record["role"], json.dumps(record["content"], ensure_ascii=False)))
+
+        added = 0
+        with self.lock:
+            with self.db:
+                self.db.execute("BEGIN IMMEDIATE")
+                self.db.execute(
+                    "INSERT OR IGNORE INTO threads (thread_id, last_access) VALUES (?, ?)",
+                    (thread_id, time.time()))
+                size = 0
+                for row in rows:
+                    # Concurrent refreshes of one thread may both fetch a message
+                    if self.db.execute(
+                            "INSERT OR IGNORE INTO messages (thread_id, message_id, role, content) VALUES (?, ?, ?, ?)",
+                            row).rowcount:
+                        added += 1
+                        size += len(row[3])
+                self.db.execute("UPDATE threads SET cached = 1 WHERE thread_id = ?", (thread_id,))
+                if rows:
+                    self.db.execute(
+                        "UPDATE threads SET last_message_id = ?, size = size + ? WHERE thread_id = ?",
+                        (rows[-1][1], size, thread_id))
+                self._evict(keep=thread_id)
+        return added
+
+    def write_through(self, thread_id, messages):
+        """Append messages just posted to the thread, if the thread is cached.
+
+        An uncached thread is left alone: its first refresh downloads it whole.
+        """
+        try:
+            if self.has_thread(thread_id):
+                self.add_messages(thread_id, messages)
+        except sqlite3.Error as e:
+            logging.warning(f"Could not update message store: {e}")
+
+    def write_through_local(self, thread_id, prompt, response):
+        """Append a question and its answer that never went through the API (a response cache hit).
+
+        The rows get local message IDs and leave last_message_id alone, so
+        refreshes still continue after the newest message of the API thread.
+        """
+        rows = [(thread_id, f"local_{uuid.uuid4().hex}", role, json.dumps([{"type": "text", "value": text}],
+                                                                           ensure_ascii=False))
+                for role, text in (("user", prompt), ("assistant", response))]
+        try:
+            if not self.has_thread(thread_id):
+                return
+            with self.lock:
+                with self.db:
+                    self.db.execute("BEGIN IMMEDIATE")
+                    self.db.executemany(
+                        "INSERT INTO messages (thread_id, message_id, role, content) VALUES (?, ?, ?, ?)", rows)
+                    self.db.execute("UPDATE threads SET size = size + ? WHERE thread_id = ?",
+                                    (sum(len(row[3]) for row in rows), thread_id))
+                    self._evict(keep=thread_id)
+        except sqlite3.Error as e:
+            logging.warning(f"Could not update message store: {e}")
+
+    def get_messages(self, thread_id):
+        """Cached messages, newest first, in the format of get_messages.py."""
+        with self.lock:
+            self.db.execute("UPDATE threads SET last_access = ? WHERE thread_id = ?", (time.time(), thread_id))
+            rows = self.db.execute(
+                "SELECT role, content FROM messages WHERE thread_id = ? ORDER BY seq DESC", (thread_id,)).fetchall()
+        return [{"role": role, "content": json.loads(content)} for role, content in rows]
+
+    def sent_context(self, thread_id):
+        """(digest, fingerprint) of the project context last sent to the thread, or None."""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT digest, fingerprint FROM sent_contexts WHERE thread_id = ?", (thread_id,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def record_context(self, thread_id, digest, fingerprint):
+        """Remember what was sent, as context_fingerprint() of the context, not the context itself."""
+        text = json.dumps(fingerprint, ensure_ascii=False)
+        try:
+            with self.lock:
+                with self.db:
+                    self.db.execute("BEGIN IMMEDIATE")
+                    # A thread row without messages, unless the thread is cached already
+                    self.db.execute(
+                        "INSERT OR IGNORE INTO threads (thread_id, last_access, cached) VALUES (?, ?, 0)",
+                        (thread_id, time.time()))
+                    old = self.db.execute("SELECT LENGTH(fingerprint) FROM sent_contexts WHERE thread_id = ?",
+                                          (thread_id,)).fetchone()
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO sent_contexts (thread_id, digest, fingerprint) VALUES (?, ?, ?)",
+                        (thread_id, digest, text))
+                    self.db.execute("UPDATE threads SET size = size + ? WHERE thread_id = ?",
+                                    (len(text) - (old[0] if old else 0), thread_id))
+                    self._evict(keep=thread_id)
+        except sqlite3.Error as e:
+            logging.warning(f"Could not update message store: {e}")
+
+    def _evict(self, keep):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM threads").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = self.db.execute(
+            "SELECT thread_id, size FROM threads WHERE thread_id != ? ORDER BY last_access", (keep,)).fetchall()
+        for thread_id, size in victims:
+            self.db.execute("DELETE FROM messages WHERE thread_id = ?", (thread_id,))
+            self.db.execute("DELETE FROM sent_contexts WHERE thread_id = ?", (thread_id,))
+            self.db.execute("DELETE FROM threads WHERE thread_id = ?", (thread_id,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def open_store(path=None):
+    """The default store, or None if it can't be opened (the caller then goes without)."""
+    try:
+        return MessageStore(path)
+    except sqlite3.Error as e:
+        logging.warning(f"Could not open message store: {e}")
+        return None
@@ -0,0 +1,159 @@
+# analysis_jobs.py
+# Runs diagramGenerator.py for the hub's clients as jobs, one per project and
+# output. A request waits `debounce` seconds before it starts, and identical
+# requests arriving meanwhile join it. A request for a project whose analysis
+# is already running supersedes it: the running process is stopped and a
+# fresh job starts.
+#
+# Every job publishes analysis_started, analysis_progress (files done/total)
+# and finally analysis_complete with its status and the location of the
+# result, so clients react to events instead of guessing with timers.
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIAGRAM_GENERATOR = os.path.join(SRC_DIR, "diagramGenerator.py")
+DEFAULT_DEBOUNCE = 0.25  # seconds
+FORMATS = ("graphviz", "plantuml", "both", "binary")
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class AnalysisJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, project_dir, output, format="both", jobs=0):
+        self.id = next(self._ids)
+        self.project_dir = project_dir
+        self.output = output
+        self.format = format
+        self.jobs = jobs
+        self.state = PENDING
+        self.requests = 1
+        self.done = 0
+        self.total = None
+        self.error = None
+        self.process = None
+        self.task = None
+        self.started = None
+        self.finished = None
+
+    @property
+    def key(self):
+        return (self.project_dir, self.output)
+
+    def describe(self):
+        info = {"job": self.id, "project": self.project_dir, "state": self.state, "done": self.done,
+                "total": self.total, "requests": self.requests}
+        if self.state == DONE:
+            info["diagram"] = f"{self.output}.json"
+            info["plantuml"] = f"{self.output}.puml"
+            if self.format == "binary":
+                info["binary"] = f"{self.output}.vscb"
+        if self.error:
+            info["error"] = self.error
+        if self.started is not None:
+            info["seconds"] = round((self.finished or time.monotonic()) - self.started, 3)
+        return info
+
+
+class AnalysisJobs:
+    def __init__(self, publish, debounce=DEFAULT_DEBOUNCE, python=sys.executable, script=DIAGRAM_GENERATOR):
+        self.publish = publish  # async publish(event dict), sent to every client
+        self.debounce = debounce
+        self.python = python
+        self.script = script
+        self.current = {}  # (project_dir, output) -> newest AnalysisJob
+        self.counters = {"requested": 0, "deduplicated": 0, "superseded": 0, "completed": 0, "failed": 0}
+
+    async def request(self, project_dir, output=None, format="both", jobs=0):
+        """Job analyzing the project, shared with an identical request that hasn't started yet."""
+        self.counters["requested"] += 1
+        project_dir = os.path.abspath(project_dir)
+        output = os.path.abspath(output or os.path.join(project_dir, "diagram"))
+        current = self.current.get((project_dir, output))
+        if current is not None and current.state == PENDING and (current.format, current.jobs) == (format, jobs):
+            current.requests += 1
+            self.counters["deduplicated"] += 1
+            return current
+        if current is not None and current.state in (PENDING, RUNNING):
+            self.counters["superseded"] += 1
+            await self.cancel(current, "superseded by a newer request")
+
+        job = AnalysisJob(project_dir, output, format, jobs)
+        self.current[job.key] = job
+        job.task = asyncio.create_task(self.run(job))
+        return job
+
+    async def cancel(self, job, reason="cancelled"):
+        if job.state not in (PENDING, RUNNING):
+            return False
+        job.state = CANCELLED
+        job.error = reason
+        if job.process is not None and job.process.returncode is None:
+            job.process.terminate()
+        if job.task is not None and job.task is not asyncio.current_task():
+            job.task.cancel()
+        job.finished = time.monotonic()
+        await self.publish({"command": "analysis_complete", "status": CANCELLED, **job.describe()})
+        return True
+
+    async def cancel_project(self, project_dir):
+        project_dir = os.path.abspath(project_dir)
+        cancelled = [job for key, job in self.current.items() if key[0] == project_dir]
+        return [job.id for job in cancelled if await self.cancel(job)]
+
+    async def run(self, job):
+        try:
+            await asyncio.sleep(self.debounce)
+            job.state = RUNNING
+            job.started = time.monotonic()
+            started_at = time.time()
+            await self.publish({"command": "analysis_started", **job.describe()})
+            command = [self.python, self.script, job.project_dir, "-o", job.output, "-f", job.format,
+                       "-j", str(job.jobs), "--progress"]
+            job.process = await asyncio.create_subprocess_exec(
+                *command, cwd=os.path.dirname(self.script),
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT)
+            last_line = ""
+            async for line in job.process.stdout:
+                text = line.decode("utf-8", "replace").strip()
+                if text.startswith('{"event"'):
+                    event = json.loads(text)
+                    job.done, job.total = event["done"], event["total"]
+                    await self.publish({"command": "analysis_progress", "job": job.id, "project": job.project_dir,
+                                        "done": job.done, "total": job.total})
+                elif text:
+                    last_line = text
+            returncode = await job.process.wait()
+        except asyncio.CancelledError:
+            if job.process is not None and job.process.returncode is None:
+                job.process.terminate()
+            raise
+        except Exception as e:
+            returncode, last_line, started_at = None, f"{type(e).__name__}: {e}", None
+
+        if job.state == CANCELLED:
+            return
+        job.finished = time.monotonic()
+        # diagramGenerator.py also exits with 0 on a bad project directory, so check for a fresh diagram
+        if returncode == 0 and os.path.exists(f"{job.output}.json") and \
+                os.path.getmtime(f"{job.output}.json") >= started_at - 1:
+            job.state = DONE
+            self.counters["completed"] += 1
+        else:
+            job.state = FAILED
+            job.error = last_line or f"exit code {returncode}"
+            self.counters["failed"] += 1
+        await self.publish({"command": "analysis_complete", "status": job.state, **job.describe()})
+
+    def stats(self):
+        return {**self.counters, "jobs": [job.describe() for job in self.current.values()]}
@@ -0,0 +1,94 @@
+# coalescer.py
+# Latest-wins coalescing of high-frequency editor events. The first event of
+# a key (event group, client and optionally some of its fields) opens a
+# window; events of the same key arriving within it replace the pending one,
+# and only the latest is forwarded when the window closes.
+#
+# Commands that must keep their order bypass the coalescer; before such a
+# command is forwarded, the sender's pending events are flushed, so it never
+# overtakes an earlier event of the same client.
+import asyncio
+import time
+
+DEFAULT_WINDOW = 0.016  # seconds
+
+# command -> (group, fields of the message distinguishing keys within the group)
+# display and hide of one codebox share a key, so the last of them wins
+COALESCED = {
+    "get_document_path": ("get_document_path", ()),
+    "get_line_number": ("get_line_number", ()),
+    "display_code_box": ("code_box", ("file", "className")),
+    "hide_code_box": ("code_box", ("file", "className")),
+}
+
+
+class Coalescer:
+    def __init__(self, forward, window=DEFAULT_WINDOW, commands=COALESCED):
+        self.forward = forward  # async forward(client, message)
+        self.window = window
+        self.commands = commands
+        # key -> [client, message, due]; with one window length, insertion order is due order
+        self.pending = {}
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.counters = {"received": 0, "merged": 0, "forwarded": 0, "bypassed": 0}
+
+    def key(self, client, message):
+        group, fields = self.commands[message.command]
+        data = message.data or {}
+        return (client.id, group) + tuple(data.get(field) for field in fields)
+
+    async def submit(self, client, message):
+        self.counters["received"] += 1
+        if self.window <= 0:
+            self.counters["forwarded"] += 1
+            await self.forward(client, message)
+            return
+        key = self.key(client, message)
+        entry = self.pending.get(key)
+        if entry is not None:
+            entry[1] = message
+            self.counters["merged"] += 1
+            return
+        self.pending[key] = [client, message, time.monotonic() + self.window]
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.run())
+        self.wakeup.set()
+
+    async def bypass(self, client, message):
+        """Forward an ordered command after the sender's pending events."""
+        await self.flush(client)
+        self.counters["bypassed"] += 1
+        await self.forward(client, message)
+
+    async def flush(self, client=None):
+        """Forward the pending events of a client (or all) now."""
+        keys = [key for key, entry in self.pending.items() if client is None or entry[0] is client]
+        entries = [self.pending.pop(key) for key in keys]
+        for entry_client, message, _ in entries:
+            self.counters["forwarded"] += 1
+            await self.forward(entry_client, message)
+
+    async def run(self):
+        while True:
+            if not self.pending:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+                continue
+            now = time.monotonic()
+            due = []
+            for key, entry in self.pending.items():
+                if entry[2] > now:
+                    break
+                due.append(key)
+            if not due:
+                await asyncio.sleep(next(iter(self.pending.values()))[2] - now)
+                continue
+            for key in due:
+                entry = self.pending.pop(key, None)
+                if entry is not None:
+                    self.counters["forwarded"] += 1
+                    await self.forward(entry[0], entry[1])
+
+    def stats(self):
+        return {"window_ms": round(self.window * 1000, 3), "pending": len(self.pending), **self.counters}
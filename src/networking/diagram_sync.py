@@ -0,0 +1,135 @@
+# diagram_sync.py
+# Versioned diagram updates for the hub's clients. Every analysis that
+# changes the diagram becomes a new version; a client that subscribed with
+# diagram_subscribe gets only a structural delta (diagram_delta.py) from the
+# version it holds to the current one. A full diagram_snapshot is sent when
+# the client has nothing yet or holds a version the server no longer knows.
+#
+# A client that receives a delta whose base_version isn't the version it
+# holds (e.g. a message dropped from a full queue) subscribes again with its
+# version and is brought up to date from there. Versions are tagged with the
+# server's epoch, so a version held from before a restart isn't mistaken for
+# the one the restarted server counts with the same number.
+import asyncio
+import json
+import os
+import sys
+import uuid
+from collections import OrderedDict
+
+from analysis_jobs import SRC_DIR
+
+if SRC_DIR not in sys.path:
+    sys.path.append(SRC_DIR)
+
+from binary_format import load_document  # noqa: E402
+from diagram_delta import diff_classes, is_empty  # noqa: E402
+
+DEFAULT_HISTORY = 8  # versions kept to send deltas from
+
+
+def compact(message):
+    return json.dumps(message, separators=(",", ":"))
+
+
+class DiagramSync:
+    def __init__(self, hub, history=DEFAULT_HISTORY):
+        self.hub = hub
+        self.history = max(1, history)
+        self.epoch = uuid.uuid4().hex[:12]
+        self.project = None
+        self.version = 0
+        self.document = None  # whole diagram.json of the last analysis, for clients that never subscribed
+        self.versions = OrderedDict()  # version -> classes, the last `history` versions
+        self.messages = {}  # base version (None for the snapshot) -> serialized update to the current version
+        self.subscribers = {}  # client -> version it holds
+        # publish() and update() await between reading the versions and
+        # recording what a client holds, so they take turns
+        self.lock = asyncio.Lock()
+        self.counters = {"versions": 0, "unchanged": 0, "snapshots": 0, "deltas": 0, "legacy": 0,
+                         "snapshot_bytes": 0, "delta_bytes": 0}
+
+    async def publish(self, project, diagram_path):
+        """Take diagram.json of a finished analysis as the next version and update the clients."""
+        project = os.path.abspath(project)
+        document = await asyncio.to_thread(load_document, diagram_path)
+        async with self.lock:
+            if project == self.project and document == self.document:
+                self.counters["unchanged"] += 1
+                return
+            self.document = document
+            classes = document.get("classes", {})
+            delta = None
+            if project != self.project:
+                # Deltas between projects make no sense, everybody starts over with a snapshot
+                self.project = project
+                self.versions.clear()
+            elif self.versions:
+                delta = await asyncio.to_thread(diff_classes, self.versions[self.version], classes)
+                if is_empty(delta):
+                    # Only functions or imports changed, which only the whole document carries
+                    await self.send_legacy()
+                    return
+
+            self.version += 1
+            self.counters["versions"] += 1
+            self.versions[self.version] = classes
+            while len(self.versions) > self.history:
+                self.versions.popitem(last=False)
+            self.messages = {}
+            if delta is not None:
+                # The delta from the previous version is the one most subscribers need
+                self.messages[self.version - 1] = self.delta_message(self.version - 1, self.version, delta)
+
+            await asyncio.gather(*(self.update(client) for client in list(self.subscribers)))
+            await self.send_legacy()
+
+    async def send_legacy(self):
+        # Clients that never subscribed still get the whole diagram.json, as the extension used to send it
+        legacy = [client for client in self.hub.clients if client not in self.subscribers and client.role != "vscode"]
+        if not legacy:
+            return
+        message = compact({"command": "send_diagram", "fileName": "diagram.json", "content": compact(self.document)})
+        self.counters["legacy"] += len(legacy)
+        await asyncio.gather(*(self.hub.send(client, message) for client in legacy))
+
+    async def subscribe(self, client, version=None, epoch=None):
+        """Client holding `version` (None: no diagram) wants to be kept up to date."""
+        async with self.lock:
+            self.subscribers[client] = version if epoch == self.epoch else None
+            await self.update(client)
+
+    def unsubscribe(self, client):
+        self.subscribers.pop(client, None)
+
+    async def update(self, client):
+        # Callers hold self.lock
+        target, messages = self.version, self.messages
+        held = self.subscribers.get(client)
+        if not self.versions or held == target:
+            return
+        if held in self.versions:
+            kind, message = "deltas", messages.get(held)
+            if message is None:
+                delta = await asyncio.to_thread(diff_classes, self.versions[held], self.versions[target])
+                message = messages[held] = self.delta_message(held, target, delta)
+        else:
+            kind, message = "snapshots", messages.get(None)
+            if message is None:
+                message = messages[None] = compact({
+                    "command": "diagram_snapshot", "project": self.project, "epoch": self.epoch,
+                    "version": target,
+                    "classes": self.versions[target]})
+        if await self.hub.send(client, message) and client in self.subscribers:
+            self.subscribers[client] = target
+            self.counters[kind] += 1
+            self.counters[f"{kind[:-1]}_bytes"] += len(message)
+
+    def delta_message(self, base_version, version, delta):
+        return compact({"command": "diagram_delta", "project": self.project, "epoch": self.epoch,
+                        "version": version,
+                        "base_version": base_version, "delta": delta})
+
+    def stats(self):
+        return {"project": self.project, "epoch": self.epoch, "version": self.version,
+                "subscribers": len(self.subscribers), **self.counters}
@@ -0,0 +1,189 @@
+# hub.py
+# WebSocket hub between VS Code and Unity. Each client gets a bounded send
+# queue drained by its own writer task, so a slow client only ever delays
+# itself: with the "drop" policy the oldest queued message is dropped when
+# the queue is full; with "block" the sender waits up to block_timeout for
+# room and the client is then disconnected.
+#
+# Incoming messages go through a Router: handlers are registered per command
+# ("command" of a JSON object, or the prefix of "name:payload" text), and
+# everything without a handler is relayed to the other clients, as before.
+import asyncio
+import itertools
+import json
+
+from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed
+
+DROP = "drop"
+BLOCK = "block"
+POLICIES = (DROP, BLOCK)
+DEFAULT_QUEUE_SIZE = 256
+DEFAULT_BLOCK_TIMEOUT = 5.0  # seconds
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024  # diagram.json of a large project is well over the 1 MiB default
+
+
+class Message:
+    """Received message, parsed once: raw text, command name and JSON payload (or None)."""
+
+    __slots__ = ("raw", "command", "data")
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.command = None
+        self.data = None
+        if isinstance(raw, str):
+            if raw.startswith("{"):
+                try:
+                    self.data = json.loads(raw)
+                except ValueError:
+                    pass
+                if isinstance(self.data, dict):
+                    self.command = self.data.get("command")
+            else:
+                name, separator, _ = raw.partition(":")
+                if separator:
+                    self.command = name
+
+    @property
+    def text(self):
+        """Payload of "name:payload" text."""
+        return self.raw.partition(":")[2]
+
+
+class Client:
+    _ids = itertools.count(1)
+
+    def __init__(self, connection, queue_size=DEFAULT_QUEUE_SIZE, policy=DROP, block_timeout=DEFAULT_BLOCK_TIMEOUT):
+        self.id = next(self._ids)
+        self.connection = connection
+        self.role = None  # "unity", "vscode", ... from a hello message
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.counters = {"received": 0, "sent": 0, "dropped": 0, "max_queued": 0}
+
+    def __repr__(self):
+        return f"client {self.id} ({self.role or 'unknown'}, {self.connection.remote_address})"
+
+    async def put(self, message):
+        """Queue a message; False when the client was cut off instead."""
+        if self.policy == BLOCK:
+            try:
+                await asyncio.wait_for(self.queue.put(message), self.block_timeout)
+            except asyncio.TimeoutError:
+                self.counters["dropped"] += 1
+                print(f"Disconnecting {self}: send queue full for {self.block_timeout}s")
+                # A close handshake can't get through to a client that doesn't read
+                self.connection.transport.abort()
+                return False
+        else:
+            if self.queue.full():
+                self.queue.get_nowait()  # the oldest queued message gives way
+                self.counters["dropped"] += 1
+            self.queue.put_nowait(message)
+        self.counters["max_queued"] = max(self.counters["max_queued"], self.queue.qsize())
+        return True
+
+    async def write(self):
+        """Writer task: send queued messages until the connection closes."""
+        try:
+            while True:
+                message = await self.queue.get()
+                await self.connection.send(message)
+                self.counters["sent"] += 1
+        except ConnectionClosed:
+            pass
+
+    def stats(self):
+        return {"id": self.id, "role": self.role, "address": str(self.connection.remote_address),
+                "queued": self.queue.qsize(), **self.counters}
+
+
+class Router:
+    """Command name -> handler(hub, client, message); unrouted messages go to `default`."""
+
+    def __init__(self, default=None):
+        self.handlers = {}
+        self.default = default
+
+    def route(self, *commands):
+        def register(handler):
+            for command in commands:
+                self.handlers[command] = handler
+            return handler
+        return register
+
+    async def dispatch(self, hub, client, message):
+        handler = self.handlers.get(message.command, self.default)
+        if handler is not None:
+            await handler(hub, client, message)
+
+
+class Hub:
+    def __init__(self, router=None, queue_size=DEFAULT_QUEUE_SIZE, policy=DROP, block_timeout=DEFAULT_BLOCK_TIMEOUT,
+                 verbose=False):
+        self.router = router or Router()
+        if self.router.default is None:
+            self.router.default = relay
+        self.queue_size = queue_size
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.verbose = verbose
+        self.clients = set()
+
+    async def handler(self, connection):
+        client = Client(connection, self.queue_size, self.policy, self.block_timeout)
+        print(f"Client connected: {client}")
+        self.clients.add(client)
+        writer = asyncio.create_task(client.write())
+        try:
+            async for raw in connection:
+                client.counters["received"] += 1
+                message = Message(raw)
+                if self.verbose:
+                    print(f"Received {message.command or 'message'} from {client}: {str(raw)[:200]}")
+                try:
+                    await self.router.dispatch(self, client, message)
+                except Exception as e:
+                    print(f"Error handling {message.command or 'message'} from {client}: {e}")
+        except ConnectionClosed:
+            pass
+        finally:
+            self.clients.discard(client)
+            writer.cancel()
+            await self.disconnected(client)
+            print(f"Client disconnected: {client}")
+
+    async def disconnected(self, client):
+        """Hook for state kept per client."""
+
+    async def send(self, client, message):
+        if not isinstance(message, (str, bytes)):
+            message = json.dumps(message)
+        return await client.put(message)
+
+    async def broadcast(self, message, exclude=None):
+        if not isinstance(message, (str, bytes)):
+            message = json.dumps(message)
+        targets = [client for client in self.clients if client is not exclude]
+        # Concurrently, so a blocking client's wait doesn't add up for the others
+        await asyncio.gather(*(client.put(message) for client in targets))
+
+    def stats(self):
+        return {"policy": self.policy, "queue_size": self.queue_size,
+                "clients": [client.stats() for client in sorted(self.clients, key=lambda c: c.id)]}
+
+    async def serve(self, host="localhost", port=7777, ping_interval=20, ping_timeout=20, deflate=True,
+                    max_size=DEFAULT_MAX_SIZE, ready=None):
+        # permessage-deflate mostly pays off on diagram payloads, which are repetitive JSON
+        async with serve(self.handler, host, port, ping_interval=ping_interval, ping_timeout=ping_timeout,
+                         compression="deflate" if deflate else None, max_size=max_size) as server:
+            if ready is not None:
+                ready.set_result(server)
+            await server.serve_forever()
+
+
+async def relay(hub, client, message):
+    """Forward the message unchanged to every other client."""
+    await hub.broadcast(message.raw, exclude=client)
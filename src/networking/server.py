@@ -1,42 +1,129 @@
+# server.py
+# WebSocket server relaying commands between VS Code and Unity, started by the
+# extension on ws://localhost:7777. The hub (hub.py) gives every client its
+# own bounded send queue, so a slow client never stalls the others, and
+# bursts of editor events are coalesced (coalescer.py) before they are relayed.
+# The analyzer runs here as jobs (analysis_jobs.py) that report their progress
+# and completion to all clients, and new diagrams go out as versioned deltas
+# to the clients that subscribed (diagram_sync.py).
+import argparse
 import asyncio
-import websockets
-import json
-
-connected_clients = set()
-
-async def handler(websocket):
-    client_ip = websocket.remote_address
-    print(f"Client connected: {client_ip}")
-    connected_clients.add(websocket)
-
-    print(f"Client connected: {client_ip}")
-    try:
-        async for message in websocket:
-            print(f"Received message from {client_ip}: {message}")
-            await broadcast(message, websocket)
-    except websockets.exceptions.ConnectionClosed:
-        print(f"Client {client_ip} disconnected")
-    except Exception as e:
-        print(f"Error in handler: {e}")
-    finally:
-        connected_clients.remove(websocket)
-
-
-async def broadcast(message, sender_websocket):
-    for client in connected_clients:
-        if client != sender_websocket and client.open:
+
+from analysis_jobs import DEFAULT_DEBOUNCE, FORMATS, AnalysisJobs
+from coalescer import COALESCED, DEFAULT_WINDOW, Coalescer
+from diagram_sync import DiagramSync
+from hub import BLOCK, DEFAULT_BLOCK_TIMEOUT, DEFAULT_QUEUE_SIZE, DROP, POLICIES, Hub, Router, relay
+
+
+class BridgeHub(Hub):
+    def __init__(self, router, coalesce_window=DEFAULT_WINDOW, debounce=DEFAULT_DEBOUNCE, **options):
+        super().__init__(router, **options)
+        self.coalescer = Coalescer(lambda client, message: relay(self, client, message), coalesce_window)
+        self.analysis = AnalysisJobs(self.analysis_event, debounce)
+        self.diagrams = DiagramSync(self)
+
+    async def analysis_event(self, event):
+        if event["command"] == "analysis_complete" and event["status"] == "done":
+            # The diagram is out before anyone hears the analysis is complete
             try:
-                await client.send(message)
-            except websockets.exceptions.ConnectionClosed:
-                pass  # Client disconnected, ignore
-            except Exception as e:
-                print(f"Error broadcasting message: {e}")
+                # The binary encoding, when the job wrote one, loads faster
+                await self.diagrams.publish(event["project"], event.get("binary") or event["diagram"])
+            except (OSError, ValueError) as e:
+                print(f"Error publishing the diagram of {event['project']}: {e}")
+        await self.broadcast(event)
+
+    async def disconnected(self, client):
+        self.diagrams.unsubscribe(client)
+        # The last events of a client that left are still delivered
+        await self.coalescer.flush(client)
+
+    def stats(self):
+        return {**super().stats(), "coalescer": self.coalescer.stats(), "analysis": self.analysis.stats(),
+                "diagrams": self.diagrams.stats()}
+
+
+async def ordered(hub, client, message):
+    await hub.coalescer.bypass(client, message)
+
+
+router = Router(default=ordered)
+
+
+@router.route(*COALESCED)
+async def coalesced(hub, client, message):
+    await hub.coalescer.submit(client, message)
+
+
+@router.route("hello")
+async def hello(hub, client, message):
+    # {"command": "hello", "role": "unity"} names the client in logs and stats
+    client.role = (message.data or {}).get("role") or message.text or None
+    print(f"Client identified: {client}")
+
+
+@router.route("analyze")
+async def analyze(hub, client, message):
+    # {"command": "analyze", "project": dir, "output"?: base name, "format"?: ..., "jobs"?: n, "request_id"?: ...}
+    data = message.data or {}
+    reply = {"command": "analysis_queued", "request_id": data.get("request_id")}
+    if not data.get("project") or data.get("format", "both") not in FORMATS:
+        await hub.send(client, {**reply, "error": "analyze needs a project directory and a known format"})
+        return
+    job = await hub.analysis.request(data["project"], data.get("output"), data.get("format", "both"),
+                                     int(data.get("jobs", 0)))
+    await hub.send(client, {**reply, **job.describe()})
+
+
+@router.route("cancel_analysis")
+async def cancel_analysis(hub, client, message):
+    data = message.data or {}
+    cancelled = await hub.analysis.cancel_project(data.get("project") or "") if data.get("project") else []
+    await hub.send(client, {"command": "analysis_cancel_result", "cancelled": cancelled})
+
+
+@router.route("diagram_subscribe")
+async def diagram_subscribe(hub, client, message):
+    # {"command": "diagram_subscribe", "epoch"?: ..., "version"?: n} with the diagram version the client holds;
+    # also sent again when a delta's base_version doesn't match it
+    data = message.data or {}
+    await hub.diagrams.subscribe(client, data.get("version"), data.get("epoch"))
+
+
+@router.route("hub_stats")
+async def hub_stats(hub, client, message):
+    await hub.send(client, {"command": "hub_stats", "data": hub.stats()})
+
 
 async def main():
+    parser = argparse.ArgumentParser(description="WebSocket hub between VS Code and Unity.")
+    parser.add_argument("--host", type=str, default="localhost")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f"Messages queued per client (default: {DEFAULT_QUEUE_SIZE}).")
+    parser.add_argument("--policy", choices=POLICIES, default=DROP,
+                        help=f"When a client's queue is full: '{DROP}' the oldest message, or '{BLOCK}' the sender "
+                             "until there is room (default: drop).")
+    parser.add_argument("--block-timeout", type=float, default=DEFAULT_BLOCK_TIMEOUT,
+                        help=f"Seconds a blocked sender waits before the slow client is disconnected "
+                             f"(default: {DEFAULT_BLOCK_TIMEOUT:g}).")
+    parser.add_argument("--ping-interval", type=float, default=20,
+                        help="Seconds between pings; 0 disables them (default: 20).")
+    parser.add_argument("--ping-timeout", type=float, default=20,
+                        help="Seconds without a pong before a client is dropped (default: 20).")
+    parser.add_argument("--coalesce-window", type=float, default=DEFAULT_WINDOW * 1000,
+                        help="Milliseconds within which only the latest selection or codebox event per client "
+                             f"is relayed; 0 relays all (default: {DEFAULT_WINDOW * 1000:g}).")
+    parser.add_argument("--no-deflate", action="store_true", help="Disable permessage-deflate compression.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log every received message.")
+    args = parser.parse_args()
+
+    hub = BridgeHub(router, args.coalesce_window / 1000, queue_size=max(1, args.queue_size), policy=args.policy,
+                    block_timeout=args.block_timeout, verbose=args.verbose)
     print("Starting WebSocket server...")
-    server = await websockets.serve(handler, "localhost", 7777)
-    print("WebSocket server started on ws://localhost:7777")
-    await server.wait_closed()
+    ready = asyncio.get_running_loop().create_future()
+    ready.add_done_callback(lambda _: print(f"WebSocket server started on ws://{args.host}:{args.port}"))
+    await hub.serve(args.host, args.port, args.ping_interval or None, args.ping_timeout or None,
+                    not args.no_deflate, ready=ready)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
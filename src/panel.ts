@@ -1,7 +1,5 @@
 import * as vscode from "vscode";
-import * as path from "path";
-import * as child_process from "child_process";
-import * as fs from "fs";
+import { AssistantWorker, StreamEvent } from "./assistantWorker";
 
 export class CopilotViewProvider implements vscode.WebviewViewProvider {
     public static readonly viewType = "myCopilotView";
@@ -10,7 +8,7 @@ export class CopilotViewProvider implements vscode.WebviewViewProvider {
     private currentThreadId: string | null = null;
 
 
-    constructor(private readonly _extensionUri: vscode.Uri) {}
+    constructor(private readonly _extensionUri: vscode.Uri, private readonly worker: AssistantWorker) {}
 
     public resolveWebviewView(webviewView: vscode.WebviewView): void {
         this._view = webviewView;
@@ -33,7 +31,7 @@ export class CopilotViewProvider implements vscode.WebviewViewProvider {
 
     public async handleSwitchToCodebox(message: any) {
         if (this._view) {
-            const foundThreadId = this.findThreadId(message.className, message.filePath);
+            const foundThreadId = await this.findThreadId(message.className, message.filePath);
 
             if (foundThreadId === this.currentThreadId) {
                 return;
@@ -41,7 +39,7 @@ export class CopilotViewProvider implements vscode.WebviewViewProvider {
 
             this._view.webview.postMessage({ command: "clearChatLog" });
 
-            this.currentThreadId = this.findThreadId(message.className, message.filePath);
+            this.currentThreadId = foundThreadId;
             let formattedMessage = `
                 <div style="text-align: center;">
                     <h2 style="color: #007acc;">${message.className}</h2>
@@ -53,7 +51,7 @@ export class CopilotViewProvider implements vscode.WebviewViewProvider {
                 formattedMessage += `<p style="font-style: italic;">Thread ID not found. Using the default Thread ID: ${this.defaultThreadId}</p>`;
             } else if (this.currentThreadId === "dummy_thread") {
                 await this.createNewThread(message.className, message.filePath);
-                this.currentThreadId = this.findThreadId(message.className, message.filePath); // Aktualizácia currentThreadId
+                this.currentThreadId = await this.findThreadId(message.className, message.filePath); // Aktualizácia currentThreadId
                 formattedMessage += `<p>Thread for ${message.className} with thread ID: ${this.currentThreadId} created.</p>`;
             } else {
                 formattedMessage += `<p>Thread ID: ${this.currentThreadId}</p>`;
@@ -76,38 +74,32 @@ export class CopilotViewProvider implements vscode.WebviewViewProvider {
         }
     }
 
-    private findThreadId(className: string, filePath: string): string | null {
+    // Indexed lookup in the workspace's thread mapping, served by the worker
+    private async findThreadId(className: string, filePath: string): Promise<string | null> {
         const workspaceFolders = vscode.workspace.workspaceFolders;
         if (!workspaceFolders || workspaceFolders.length === 0) {
             return null;
         }
 
-        const currentFolder = workspaceFolders[0].uri.fsPath;
-        const codeboxThreadsJsonPath = path.join(currentFolder, "codebox_threads.json");
-
         try {
-            const codeboxThreadsJsonContent = fs.readFileSync(codeboxThreadsJsonPath, "utf8");
-            const codeboxThreadsData = JSON.parse(codeboxThreadsJsonContent);
-
-            if (codeboxThreadsData && codeboxThreadsData[className] && codeboxThreadsData[className].filePath === filePath) {
-                return codeboxThreadsData[className].thread_id;
-            }
-
-            return null;
+            return await this.worker.request<string | null>("find_thread", {
+                workspace_folder: workspaceFolders[0].uri.fsPath,
+                classname: className,
+                filepath: filePath,
+            });
         } catch (error) {
-            console.error(`Error reading codebox_threads.json: ${error}`);
+            console.error(`Error looking up the thread of ${className}: ${error}`);
             return null;
         }
     }
 
     private async createNewThread(className: string, filePath: string) {
       try {
-          const scriptPath = path.join(this._extensionUri.fsPath, "src", "create_and_save_thread.py");
           const workspacePath = vscode.workspace.workspaceFolders?.[0].uri.fsPath || "";
-          const args = [className, filePath, workspacePath];
-          console.log("Python script args:", args);
-          const newThreadId = await this.executePythonScriptInVenv(scriptPath, args);
-          this.currentThreadId = newThreadId.trim(); // Uloženie ID vlákna do currentThreadId
+          const params = { classname: className, filepath: filePath, workspace_folder: workspacePath };
+          console.log("Assistant worker params:", params);
+          const newThreadId = await this.worker.request<string>("create_thread", params);
+          this.currentThreadId = newThreadId; // Uloženie ID vlákna do currentThreadId
           console.log("New thread ID:", this.currentThreadId);
       } catch (error) {
           console.error("Error creating new thread:", error);
@@ -116,92 +108,50 @@ export class CopilotViewProvider implements vscode.WebviewViewProvider {
 
     private async sendPromptToPython(prompt: string) {
       try {
-          const scriptPath = path.join(this._extensionUri.fsPath, "src", "send_message.py");
-          const args = [prompt, this.currentThreadId || ""];
-          console.log("Python script args:", args);
-          const result = await this.executePythonScriptInVenv(scriptPath, args);
-          if (this._view) {
-              this._view.webview.postMessage({
-                  command: "receiveResponse",
-                  response: result,
-              });
-          }
+          const workspacePath = vscode.workspace.workspaceFolders?.[0].uri.fsPath || "";
+          // The workspace lets the worker key cached answers on the thread's class source
+          const params = { prompt, thread_id: this.currentThreadId || "", workspace_path: workspacePath };
+          console.log("Assistant worker params:", params);
+          await this.worker.request("send_message", params, (event) => this.postEvent(event));
       } catch (error) {
-          if (this._view) {
-              this._view.webview.postMessage({
-                  command: "receiveResponse",
-                  response: `Error: ${error}`,
-              });
-          }
+          this.postResponse(`Error: ${error}`);
       }
     }
 
     private async sendContextToPython() {
       try {
-          const scriptPath = path.join(this._extensionUri.fsPath, "src", "send_context_to_assistant.py");
           const workspacePath = vscode.workspace.workspaceFolders?.[0].uri.fsPath || "";
-          const args = [this.currentThreadId || "", workspacePath];
-          console.log("Python script args:", args);
-          const result = await this.executePythonScriptInVenv(scriptPath, args);
-          if (this._view) {
-              this._view.webview.postMessage({
-                  command: "receiveResponse",
-                  response: result,
-              });
-          }
+          const params = { thread_id: this.currentThreadId || "", workspace_path: workspacePath };
+          console.log("Assistant worker params:", params);
+          await this.worker.request("send_context", params, (event) => this.postEvent(event));
       } catch (error) {
-          if (this._view) {
-              this._view.webview.postMessage({
-                  command: "receiveResponse",
-                  response: `Error: ${error}`,
-              });
+          this.postResponse(`Error: ${error}`);
+      }
+    }
+
+    // One frame of a streamed answer; errors are shown when the request fails
+    private postEvent(event: StreamEvent) {
+      if (event.type === "delta" && event.text) {
+          this.postResponse(event.text);
+      } else if (event.type === "tool_call") {
+          if (event.input !== undefined) {
+              this.postResponse(event.input);
+          } else if (event.output !== undefined) {
+              this.postResponse(`\n\noutput >\n\n${event.output}\n`);
+          } else {
+              this.postResponse(`\n${event.tool}\n\n`);
           }
       }
     }
 
-    private executePythonScriptInVenv(scriptPath: string, args: string[]): Promise<string> {
-      return new Promise((resolve, reject) => {
-          let pythonCommand = path.join(__dirname, '../python/venv/Scripts/python.exe');
-
-          const pyProcess = child_process.spawn(pythonCommand, [scriptPath, ...args]);
-          let output = "";
-  
-          pyProcess.stdout.on("data", (data: Buffer) => {
-              output += data.toString();
-              if (this._view) {
-                  this._view.webview.postMessage({
-                      command: "receiveResponse",
-                      response: data.toString(),
-                  });
-              }
-          });
-  
-          pyProcess.stderr.on("data", (data: Buffer) => {
-              const error = data.toString();
-              if (this._view) {
-                  this._view.webview.postMessage({
-                      command: "receiveResponse",
-                      response: `Error: ${error}`,
-                  });
-              }
-              reject(error); // Reject the promise on error
-          });
-  
-          pyProcess.on("close", (code) => {
-              if (scriptPath.endsWith("send_message.py")) {
-                return;
-              }
-              if (code !== 0) {
-                  reject(`Python script exited with code ${code}`);
-              } else {
-                  resolve(output); // Resolve the promise with the output
-              }
-          });
-  
-          pyProcess.on("error", (err) => {
-              reject(`Failed to start Python script: ${err.message}`);
+    // Answer text, appended to the response being displayed
+    private postResponse(response: string) {
+      if (this._view) {
+          this._view.webview.postMessage({
+              command: "receiveResponse",
+              response: response,
           });
-      });
+      }
     }
 
     private async loadChatHistory() {
@@ -209,18 +159,20 @@ export class CopilotViewProvider implements vscode.WebviewViewProvider {
         if (!this.currentThreadId) {
             this.currentThreadId = this.defaultThreadId;
         }
+          const threadId = this.currentThreadId;
           try {
-              const scriptPath = path.join(this._extensionUri.fsPath, "src", "get_messages.py");
-              const args = [this.currentThreadId];
-              const result = await this.executePythonScriptInVenv(scriptPath, args);
-
-              if (result) {
-                  try {
-                      const messages = JSON.parse(result);
-                      this.displayChatHistory(messages);
-                  } catch (error) {
-                      console.error("Error parsing chat history:", error);
-                  }
+              // Show the locally stored history at once, then whatever the refresh adds
+              const cached = await this.worker.request<any[]>("get_messages", { thread_id: threadId, refresh: false });
+              // The user may have switched codebox while the history was read
+              if (threadId !== this.currentThreadId) {
+                  return;
+              }
+              if (cached.length > 0) {
+                  this.displayChatHistory(cached);
+              }
+              const messages = await this.worker.request<any[]>("get_messages", { thread_id: threadId });
+              if (threadId === this.currentThreadId && (cached.length === 0 || messages.length !== cached.length)) {
+                  this.displayChatHistory(messages);
               }
           } catch (error) {
               console.error("Error loading chat history:", error);
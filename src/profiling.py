@@ -0,0 +1,132 @@
+# profiling.py
+# Per-phase timing and counters shared by diagramGenerator.py and the AST
+# extractor scripts (--profile).
+import contextlib
+import cProfile
+import heapq
+import json
+import time
+
+
+class Profiler:
+    """Collects wall/CPU time per phase, counters, skipped files and file timings."""
+
+    enabled = True
+
+    def __init__(self, name, slowest=10, cprofile_phase=None):
+        self.name = name
+        self.slowest = slowest
+        self.cprofile_phase = cprofile_phase
+        self.cprofile = cProfile.Profile() if cprofile_phase else None
+        self.phases = {}  # phase -> [wall seconds, cpu seconds, calls]
+        self.counters = {}
+        self.skipped = []  # (path, reason)
+        self.file_times = []  # (seconds, path, {phase: seconds})
+        self.started = time.perf_counter()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        profile = self.cprofile if name == self.cprofile_phase else None
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            self.add_phase(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def add_phase(self, name, wall, cpu, calls=1):
+        # Also used for phases timed in worker processes
+        entry = self.phases.setdefault(name, [0.0, 0.0, 0])
+        entry[0] += wall
+        entry[1] += cpu
+        entry[2] += calls
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def skip(self, path, reason):
+        self.skipped.append((path, reason))
+        self.count("skipped_files")
+
+    def record_file(self, path, phases):
+        self.file_times.append((sum(phases.values()), path, phases))
+
+    def record_file_from_phases(self, path):
+        # For single-file scripts, where the phase totals belong to one file
+        self.record_file(path, {name: entry[0] for name, entry in self.phases.items()})
+
+    def report(self):
+        slowest = heapq.nlargest(self.slowest, self.file_times, key=lambda item: item[0])
+        return {
+            "script": self.name,
+            "wall_seconds": time.perf_counter() - self.started,
+            "phases": {
+                name: {"wall_seconds": wall, "cpu_seconds": cpu, "calls": calls}
+                for name, (wall, cpu, calls) in self.phases.items()
+            },
+            "counters": self.counters,
+            "skipped": [{"path": path, "reason": reason} for path, reason in self.skipped],
+            "slowest_files": [
+                {"path": path, "seconds": seconds, "phases": phases}
+                for seconds, path, phases in slowest
+            ],
+        }
+
+    def write(self, output_file):
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=4)
+        print(f"Profile report saved to {output_file}")
+
+    def dump_cprofile(self, output_file):
+        self.cprofile.dump_stats(output_file)
+        print(f"cProfile stats of the {self.cprofile_phase} phase saved to {output_file}")
+
+
+class NullProfiler:
+    """Stand-in used when --profile is not given; every call is a no-op."""
+
+    enabled = False
+
+    def phase(self, name):
+        return contextlib.nullcontext()
+
+    def add_phase(self, name, wall, cpu, calls=1):
+        pass
+
+    def count(self, name, amount=1):
+        pass
+
+    def skip(self, path, reason):
+        pass
+
+    def record_file(self, path, phases):
+        pass
+
+    def record_file_from_phases(self, path):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def add_profile_arguments(parser):
+    parser.add_argument("--profile", type=str, metavar="REPORT",
+                        help="Write per-phase timings and counters as JSON to this file.")
+    parser.add_argument("--profile-visit", type=str, metavar="FILE",
+                        help="Dump cProfile stats of the AST traversal to this file.")
+
+
+def profiler_from_args(name, args):
+    if not (args.profile or args.profile_visit):
+        return NULL_PROFILER
+    return Profiler(name, cprofile_phase="traverse" if args.profile_visit else None)
+
+
+def finish_profile(profiler, args):
+    if args.profile:
+        profiler.write(args.profile)
+    if args.profile_visit:
+        profiler.dump_cprofile(args.profile_visit)
@@ -0,0 +1,231 @@
+# provision_threads.py
+# Creates assistant threads for every class of diagram.json that has none in
+# the thread mapping yet (missing or "dummy_thread"), so opening a codebox
+# doesn't wait for thread creation.
+#
+# Threads are created concurrently behind a token bucket. A 429 halves the
+# rate and pauses the bucket for the Retry-After time; successes raise the
+# rate back step by step. Every created thread is appended to a journal next
+# to codebox_threads.json, so an interrupted run resumes without creating
+# the same threads again. The mapping itself is updated once, at the end, in
+# one transaction, and only where an entry is still the one read at the
+# start: a thread created meanwhile for the codebox, or a class removed by a
+# new analysis, wins over the provisioned thread.
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+
+from assistant_client import create_client
+from thread_mapping import DUMMY_THREAD, open_mapping
+
+JOURNAL_NAME = "codebox_threads.provision.jsonl"
+DEFAULT_RATE = 5.0  # threads created per second
+DEFAULT_ATTEMPTS = 6
+
+
+class TokenBucket:
+    """Rate limiter shared by the creating threads, with adaptive rate."""
+
+    def __init__(self, rate, burst=None, min_rate=0.2):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.paused_until:
+                    self._refill(now)
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    wait = self.paused_until - now
+            time.sleep(wait)
+
+    def throttle(self, retry_after):
+        """Rate limited: halve the rate, drop the burst and pause for retry_after seconds."""
+        with self.lock:
+            now = time.monotonic()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            self.updated = max(now, self.paused_until)
+            self.paused_until = max(self.paused_until, now + retry_after)
+
+    def succeeded(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+def retry_after(error, attempt):
+    """Seconds to wait after a rate limit or server error; Retry-After when given."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        value = response.headers.get("retry-after")
+        try:
+            if value is not None:
+                return min(60.0, max(0.0, float(value)))
+        except ValueError:
+            pass
+    return min(30.0, 0.5 * 2 ** attempt)
+
+
+def load_json(path, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def read_journal(path):
+    """{class_name: (filePath, thread_id)} of threads created by an interrupted run."""
+    created = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # the last line of a killed run may be cut short
+                created[entry["class"]] = (entry["filePath"], entry["thread_id"])
+    except FileNotFoundError:
+        pass
+    return created
+
+
+def classes_without_thread(diagram, codebox_threads):
+    """{class_name: file_path} of the classes whose codebox has no real thread."""
+    missing = {}
+    for class_name, details in diagram.get("classes", {}).items():
+        entry = codebox_threads.get(class_name)
+        if (entry is None or entry.get("thread_id") in (None, "", DUMMY_THREAD)
+                or entry.get("filePath") != details.get("file_path")):
+            missing[class_name] = details.get("file_path")
+    return missing
+
+
+def provision_threads(workspace_folder, client=None, jobs=4, rate=DEFAULT_RATE, burst=None,
+                      attempts=DEFAULT_ATTEMPTS, mapping=None):
+    """Create threads for all classes without one and record them in the thread mapping.
+
+    Returns a summary with the numbers of created and resumed threads and the
+    error of every class that failed; failed classes keep their dummy thread.
+    Threads whose class got another thread or was removed during the run are
+    counted as superseded and not recorded.
+    """
+    start = time.perf_counter()
+    diagram = load_json(os.path.join(workspace_folder, "diagram.json"), {})
+    mapping = mapping or open_mapping(workspace_folder)
+    codebox_threads = mapping.as_dict()
+    missing = classes_without_thread(diagram, codebox_threads)
+
+    journal_path = os.path.join(workspace_folder, JOURNAL_NAME)
+    created = {name: entry for name, entry in read_journal(journal_path).items()
+               if name in missing and entry[0] == missing[name]}
+    resumed = len(created)
+    todo = [name for name in missing if name not in created]
+
+    # Retries are done here, against the shared bucket, not by the client
+    client = (client or create_client()).with_options(max_retries=0)
+    bucket = TokenBucket(rate, burst)
+    journal_lock = threading.Lock()
+    failed = {}
+    counters = {"rate_limited": 0, "retries": 0}
+
+    def create(class_name):
+        error = None
+        for attempt in range(max(1, attempts)):
+            bucket.acquire()
+            try:
+                thread_id = client.beta.threads.create().id
+            except openai.RateLimitError as e:
+                bucket.throttle(retry_after(e, attempt))
+                error = e
+                with journal_lock:
+                    counters["rate_limited"] += 1
+            except (openai.InternalServerError, openai.APIConnectionError) as e:
+                time.sleep(retry_after(e, attempt))
+                error = e
+            except Exception as e:
+                failed[class_name] = f"{type(e).__name__}: {e}"
+                return
+            else:
+                bucket.succeeded()
+                with journal_lock:
+                    created[class_name] = (missing[class_name], thread_id)
+                    journal.write(json.dumps({"class": class_name, "filePath": missing[class_name],
+                                              "thread_id": thread_id}) + "\n")
+                    journal.flush()
+                return
+            with journal_lock:
+                counters["retries"] += 1
+        failed[class_name] = f"{type(error).__name__}: {error}"
+
+    with open(journal_path, "a", encoding="utf-8") as journal:
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            list(executor.map(create, todo))
+
+    written = []
+    if created:
+        expected = {name: (codebox_threads[name]["filePath"], codebox_threads[name]["thread_id"])
+                    for name in created if name in codebox_threads}
+        written = mapping.replace_many(created, expected)
+        mapping.export_json()
+    # Kept when something failed, so a rerun knows what is already done
+    if not failed:
+        os.remove(journal_path)
+
+    return {
+        "classes": len(diagram.get("classes", {})),
+        "missing": len(missing),
+        "created": len(created) - resumed,
+        "resumed": resumed,
+        "superseded": len(created) - len(written),
+        "failed": failed,
+        "rate_limited": counters["rate_limited"],
+        "retries": counters["retries"],
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create assistant threads for all classes of diagram.json without one.")
+    parser.add_argument("workspace_folder", help="Folder with diagram.json and codebox_threads.json.")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="Threads created concurrently (default: 4).")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help=f"Most threads created per second (default: {DEFAULT_RATE}).")
+    parser.add_argument("--burst", type=float, default=None, help="Bucket size (default: one second of --rate).")
+    parser.add_argument("--attempts", type=int, default=DEFAULT_ATTEMPTS,
+                        help=f"Attempts per thread on rate limits and server errors (default: {DEFAULT_ATTEMPTS}).")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the classes without a thread.")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        diagram = load_json(os.path.join(args.workspace_folder, "diagram.json"), {})
+        missing = classes_without_thread(diagram, open_mapping(args.workspace_folder).as_dict())
+        print(json.dumps(sorted(missing), indent=4))
+        return
+
+    print(json.dumps(provision_threads(args.workspace_folder, jobs=args.jobs, rate=args.rate, burst=args.burst,
+                                       attempts=args.attempts), indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# response_cache.py
+# Opt-in cache of assistant answers, for questions asked again about code
+# that hasn't changed. Entries are keyed by assistant, normalized prompt and a
+# digest of the thread's class source, expire after a TTL and are evicted
+# least recently used first. A hit is replayed through the same frame stream
+# as a live answer and written to the message store, but never reaches the
+# thread on the API, so the assistant doesn't see that exchange later.
+import argparse
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from assistant_client import ASSISTANT_ID, ResponseStream
+from context_builder import focused_class
+from message_store import store_path
+from thread_mapping import open_mapping
+
+DEFAULT_TTL = 24 * 60 * 60  # seconds
+DEFAULT_MAX_ENTRIES = 500
+
+
+def normalize_prompt(prompt):
+    return " ".join(prompt.split()).casefold()
+
+
+def class_source_digest(workspace_path, thread_id):
+    """Digest of the source file of the thread's class; None when it's unknown."""
+    focus = focused_class(workspace_path, thread_id)
+    if focus is None:
+        return None
+    try:
+        # The mapping already has the class's file, no need to parse diagram.json
+        entry = open_mapping(workspace_path).get(focus)
+        if entry is None or not entry["filePath"]:
+            return None
+        with open(entry["filePath"], "rb") as f:
+            source = f.read()
+    except (OSError, sqlite3.Error):
+        return None
+    digest = hashlib.blake2b(focus.encode("utf-8"), digest_size=16)
+    digest.update(source)
+    return digest.hexdigest()
+
+
+def replay(frames, send):
+    """Send cached frames through a ResponseStream, as a live answer would be."""
+    stream = ResponseStream(send)
+    for frame in frames:
+        if frame["type"] == "delta":
+            stream.delta(frame["text"])
+        else:
+            fields = {key: value for key, value in frame.items() if key not in ("type", "tool")}
+            stream.tool_call(frame["tool"], **fields)
+    stream.done()
+
+
+class ResponseCache:
+    """SQLite table of answers, in the database of the message store."""
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = store_path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                frames TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS response_cache_stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        """)
+
+    def key(self, prompt, context_digest, assistant_id=ASSISTANT_ID):
+        if context_digest is None:
+            return None
+        text = "\0".join((assistant_id, normalize_prompt(prompt), context_digest))
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _count(self, name, amount=1):
+        self.db.execute(
+            "INSERT INTO response_cache_stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, amount))
+
+    def get(self, key):
+        """(frames, response) cached for the key, or None when missing or expired."""
+        now = time.time()
+        with self.lock:
+            row = self.db.execute("SELECT frames, response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[2] > self.ttl:
+                if row is not None:
+                    self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._count("expired")
+                self._count("misses")
+                return None
+            self.db.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            self._count("hits")
+        return json.loads(row[0]), row[1]
+
+    def put(self, key, frames, response):
+        now = time.time()
+        with self.lock:
+            with self.db:
+                self.db.execute("BEGIN IMMEDIATE")
+                self.db.execute(
+                    "INSERT OR REPLACE INTO responses (key, frames, response, created, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (key, json.dumps(frames, ensure_ascii=False), response, now, now))
+                self._count("stores")
+                self.db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+                evicted = self.db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)).rowcount
+                if evicted:
+                    self._count("evictions", evicted)
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.db.execute("SELECT name, value FROM response_cache_stats"))
+            entries, size = self.db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(frames)), 0) FROM responses").fetchone()
+        lookups = counters.get("hits", 0) + counters.get("misses", 0)
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "hit_rate": round(counters.get("hits", 0) / lookups, 3) if lookups else 0.0,
+            "stores": counters.get("stores", 0),
+            "expired": counters.get("expired", 0),
+            "evictions": counters.get("evictions", 0),
+        }
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM responses")
+            self.db.execute("DELETE FROM response_cache_stats")
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def open_cache(path=None):
+    try:
+        return ResponseCache(path)
+    except sqlite3.Error as e:
+        logging.warning(f"Could not open response cache: {e}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the assistant response cache.")
+    parser.add_argument("--store", type=str, default=None,
+                        help="Local store (default: $ASSISTANT_MESSAGE_STORE or message_store.sqlite3 here).")
+    parser.add_argument("--clear", action="store_true", help="Remove all cached answers and reset the counters.")
+    args = parser.parse_args()
+
+    cache = ResponseCache(args.store)
+    if args.clear:
+        cache.clear()
+    print(json.dumps(cache.stats(), indent=4))
+
+
+if __name__ == "__main__":
+    main()
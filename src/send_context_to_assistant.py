@@ -1,96 +1,89 @@
-from openai import OpenAI
+import argparse
 import json
 import sys
-from typing_extensions import override
-from openai import AssistantEventHandler
-from dotenv import load_dotenv
 import os
 import logging
+from assistant_client import create_client, print_frame, print_ndjson, stream_run
+from context_builder import (DEFAULT_BUDGET, DEFAULT_HOPS, build_context, context_digest, context_fingerprint,
+                             context_prompt, diff_context, diff_prompt, focused_class, load_diagram)
+from message_store import open_store
+
+def load_context(workspace_path=None, thread_id=None, budget=DEFAULT_BUDGET, hops=DEFAULT_HOPS):
+    """Context of the thread's class within `budget` tokens; the whole diagram.json if budget is None."""
+    if workspace_path:
+        diagram_file_path = os.path.join(workspace_path, "diagram.json")
+    else:
+        diagram_file_path = "diagram.json"
 
-load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
-
-sys.stdout.reconfigure(encoding='utf-8')
-
-class EventHandler(AssistantEventHandler):
-    def __init__(self, prompt):
-        super().__init__()
-        self.full_response = ""
-        self.prompt = prompt
-
-    @override
-    def on_text_created(self, text) -> None:
-        print(f"\n", end="", flush=True)
-
-    @override
-    def on_text_delta(self, delta, snapshot):
-        print(delta.value, end="", flush=True)
-        self.full_response += delta.value
-
-    def on_tool_call_created(self, tool_call):
-        print(f"\n{tool_call.type}\n", flush=True)
-
-    def on_tool_call_delta(self, delta, snapshot):
-        if delta.type == 'code_interpreter':
-            if delta.code_interpreter.input:
-                print(delta.code_interpreter.input, end="", flush=True)
-            if delta.code_interpreter.outputs:
-                print(f"\n\noutput >", flush=True)
-                for output in delta.code_interpreter.outputs:
-                    if output.type == "logs":
-                        print(f"\n{output.logs}", flush=True)
-
-client = OpenAI(
-    organization='org-xL8A4RIl6oUOCBUzdOlNFUJ1',
-    project='proj_ZuIi9ZcuFNiWauexpYg7e14r',
-    api_key=api_key
-)
-
-def send_context_to_assistant(thread_id, workspace_path=None):
     try:
-        assistant_id = "asst_9UCU9sdFMl9VAnHl4SBPuUA0"
-        user_prompt = ""
-        diagram_json = None
-
-        if workspace_path:
-            diagram_file_path = os.path.join(workspace_path, "diagram.json")
-        else:
-            diagram_file_path = "diagram.json"
+        diagram_json = load_diagram(workspace_path)
+        if budget is None:
+            return diagram_json
+        focus = focused_class(workspace_path, thread_id)
+        return build_context(diagram_json, focus, budget, hops)
+    except FileNotFoundError:
+        logging.warning(f"diagram.json not found in {diagram_file_path}")
+    except json.JSONDecodeError:
+        logging.error(f"Error decoding diagram.json in {diagram_file_path}")
+    except Exception as e:
+        logging.error(f"Error reading diagram.json: {e}")
+    return None
+
+def build_context_prompt(workspace_path=None, thread_id=None, budget=DEFAULT_BUDGET, hops=DEFAULT_HOPS):
+    context = load_context(workspace_path, thread_id, budget, hops)
+    return context_prompt(context) if context is not None else ""
+
+def send_context(client, thread_id, workspace_path=None, send=print_frame, store=None,
+                 budget=DEFAULT_BUDGET, hops=DEFAULT_HOPS):
+    """Send the project context to the thread, unless it already has this exact context.
+
+    With a store, a fingerprint of the context last sent to each thread is
+    remembered; when only part of it changed, just the changes are sent.
+    """
+    context = load_context(workspace_path, thread_id, budget, hops)
+    if context is None:
+        return ""
 
-        try:
-            with open(diagram_file_path, 'r', encoding='utf-8') as f:
-                diagram_json = json.load(f)
-                user_prompt += f"\n\nThis is the project context in the form of JSON:\n`json\n{json.dumps(diagram_json, ensure_ascii=False)}\n`"
-        except FileNotFoundError:
-            logging.warning(f"diagram.json not found in {diagram_file_path}")
-        except json.JSONDecodeError:
-            logging.error(f"Error decoding diagram.json in {diagram_file_path}")
-        except Exception as e:
-            logging.error(f"Error reading diagram.json: {e}")
+    digest = context_digest(context)
+    previous = store.sent_context(thread_id) if store is not None else None
+    if previous is not None and previous[0] == digest:
+        return ""
 
-        client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=user_prompt
-        )
+    prompt = context_prompt(context)
+    if previous is not None:
+        changes = diff_prompt(diff_context(previous[1], context))
+        if len(changes) < len(prompt):
+            prompt = changes
 
-        event_handler = EventHandler(user_prompt)
+    response = stream_run(client, thread_id, prompt, send, store)
+    if store is not None:
+        store.record_context(thread_id, digest, context_fingerprint(context))
+    return response
 
-        with client.beta.threads.runs.stream(
-            thread_id=thread_id,
-            assistant_id=assistant_id,
-            instructions="Please address the user as friend.",
-            event_handler=event_handler,
-        ) as stream:
-            stream.until_done()
+def send_context_to_assistant(thread_id, workspace_path=None, budget=DEFAULT_BUDGET, hops=DEFAULT_HOPS, send=print_frame):
+    try:
+        send_context(create_client(), thread_id, workspace_path, send, open_store(), budget, hops)
         return ""
 
     except Exception as e:
         return f"Error: {e}"
 
 if __name__ == "__main__":
-    thread_id = sys.argv[1] if len(sys.argv) > 1 else None
-    workspace_path = sys.argv[2] if len(sys.argv) > 2 else None
-
-    result = send_context_to_assistant(thread_id, workspace_path)
-    print(result)
\ No newline at end of file
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description="Send the project context to an assistant thread.")
+    parser.add_argument("thread_id", nargs="?", default=None)
+    parser.add_argument("workspace_path", nargs="?", default=None)
+    parser.add_argument("--budget", type=int, default=DEFAULT_BUDGET,
+                        help=f"Token budget of the context (default: {DEFAULT_BUDGET}).")
+    parser.add_argument("--hops", type=int, default=DEFAULT_HOPS,
+                        help=f"Relationship hops around the thread's class (default: {DEFAULT_HOPS}).")
+    parser.add_argument("--full", action="store_true", help="Send the whole diagram.json.")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="Stream the answer as NDJSON frames (delta, tool_call, done, error) instead of text.")
+    args = parser.parse_args()
+
+    result = send_context_to_assistant(args.thread_id, args.workspace_path,
+                                       None if args.full else args.budget, args.hops,
+                                       print_ndjson if args.ndjson else print_frame)
+    print(result)
@@ -1,77 +1,67 @@
-from openai import OpenAI
-import json
+import argparse
 import sys
-from typing_extensions import override
-from openai import AssistantEventHandler
-from dotenv import load_dotenv
-import os
-import logging
+from assistant_client import create_client, print_frame, print_ndjson, stream_run
+from message_store import open_store
+from response_cache import class_source_digest, open_cache, replay
 
-load_dotenv()
-api_key = os.getenv("OPENAI_API_KEY")
+def send_message(client, prompt, thread_id, send=print_frame, store=None,
+                 cache=None, workspace_path=None, bypass_cache=False):
+    """Stream the answer to `prompt`; with a ResponseCache, repeated questions are answered locally.
 
-sys.stdout.reconfigure(encoding='utf-8')
+    Answers are only cached for threads of a known class, whose source is part
+    of the key. `bypass_cache` skips the lookup but still stores the answer.
+    A replayed answer is recorded in `store` only; the API thread never gets it.
+    """
+    key = None
+    if cache is not None:
+        key = cache.key(prompt, class_source_digest(workspace_path, thread_id))
+    if key is not None and not bypass_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            frames, response = cached
+            replay(frames, send)
+            if store is not None:
+                store.write_through_local(thread_id, prompt, response)
+            return response
 
-class EventHandler(AssistantEventHandler):
-    def __init__(self, prompt):
-        super().__init__()
-        self.full_response = ""
-        self.prompt = prompt
+    if key is None:
+        return stream_run(client, thread_id, prompt, send, store)
 
-    @override
-    def on_text_created(self, text) -> None:
-        print(f"\n", end="", flush=True)
+    frames = []
 
-    @override
-    def on_text_delta(self, delta, snapshot):
-        print(delta.value, end="", flush=True)
-        self.full_response += delta.value
+    def record(frame):
+        if frame["type"] in ("delta", "tool_call"):
+            frames.append({name: value for name, value in frame.items() if name != "seq"})
+        send(frame)
 
-    def on_tool_call_created(self, tool_call):
-        print(f"\n{tool_call.type}\n", flush=True)
+    response = stream_run(client, thread_id, prompt, record, store)
+    cache.put(key, frames, response)
+    return response
 
-    def on_tool_call_delta(self, delta, snapshot):
-        if delta.type == 'code_interpreter':
-            if delta.code_interpreter.input:
-                print(delta.code_interpreter.input, end="", flush=True)
-            if delta.code_interpreter.outputs:
-                print(f"\n\noutput >", flush=True)
-                for output in delta.code_interpreter.outputs:
-                    if output.type == "logs":
-                        print(f"\n{output.logs}", flush=True)
-
-client = OpenAI(
-    organization='org-xL8A4RIl6oUOCBUzdOlNFUJ1',
-    project='proj_ZuIi9ZcuFNiWauexpYg7e14r',
-    api_key=api_key
-)
-
-def send_message_to_assistant(prompt, thread_id):
+def send_message_to_assistant(prompt, thread_id, send=print_frame, use_cache=False, workspace_path=None, bypass_cache=False):
     try:
-        assistant_id = "asst_9UCU9sdFMl9VAnHl4SBPuUA0"
-
-        client.beta.threads.messages.create(
-            thread_id=thread_id,
-            role="user",
-            content=prompt
-        )
-
-        event_handler = EventHandler(prompt)
-
-        with client.beta.threads.runs.stream(
-            thread_id=thread_id,
-            assistant_id=assistant_id,
-            instructions="Please address the user as friend.",
-            event_handler=event_handler,
-        ) as stream:
-            stream.until_done()
-            return
+        cache = open_cache() if use_cache else None
+        send_message(create_client(), prompt, thread_id, send, open_store(), cache, workspace_path, bypass_cache)
+        return
 
     except Exception as e:
         return f"Error: {e}"
 
 if __name__ == "__main__":
-    prompt = sys.argv[1] if len(sys.argv) > 1 else ""
-    thread_id = sys.argv[2] if len(sys.argv) > 2 else None
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    parser = argparse.ArgumentParser(description="Send a message to an assistant thread and stream the answer.")
+    parser.add_argument("prompt", nargs="?", default="")
+    parser.add_argument("thread_id", nargs="?", default=None)
+    parser.add_argument("--ndjson", action="store_true",
+                        help="Stream the answer as NDJSON frames (delta, tool_call, done, error) instead of text.")
+    parser.add_argument("--cache", action="store_true",
+                        help="Answer repeated questions about unchanged code from the response cache.")
+    parser.add_argument("--bypass-cache", action="store_true",
+                        help="With --cache, ask the assistant anyway and refresh the cached answer.")
+    parser.add_argument("--workspace", type=str, default=None,
+                        help="Folder with diagram.json and codebox_threads.json, to find the thread's class.")
+    args = parser.parse_args()
 
-    result = send_message_to_assistant(prompt, thread_id)
\ No newline at end of file
+    result = send_message_to_assistant(args.prompt, args.thread_id, print_ndjson if args.ndjson else print_frame,
+                                       args.cache, args.workspace, args.bypass_cache)
@@ -0,0 +1,226 @@
+# thread_mapping.py
+# Which assistant thread belongs to which codebox: class name -> (file path,
+# thread ID), kept per workspace in codebox_threads.sqlite3. Upserts are
+# single statements, so concurrent writers don't lose each other's updates,
+# and lookups by class, file or thread go through indexes instead of parsing
+# the whole mapping.
+#
+# codebox_threads.json stays as an export for compatibility: it is imported
+# into an empty database and rewritten after bulk changes (or with --export).
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+SCHEMA_VERSION = 1
+DB_NAME = "codebox_threads.sqlite3"
+JSON_NAME = "codebox_threads.json"
+DUMMY_THREAD = "dummy_thread"
+
+_open_mappings = {}
+_open_lock = threading.Lock()
+
+
+class ThreadMapping:
+    """SQLite (WAL) table of codebox threads of one workspace."""
+
+    def __init__(self, workspace_folder, path=None):
+        self.workspace_folder = workspace_folder or ""
+        self.path = path or os.path.join(self.workspace_folder, DB_NAME)
+        self.json_path = os.path.join(self.workspace_folder, JSON_NAME)
+        # One connection shared by the worker's threads; the lock serializes it
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, timeout=10, check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS codebox_threads (
+                class_name TEXT PRIMARY KEY,
+                file_path TEXT NOT NULL,
+                thread_id TEXT NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS codebox_threads_by_file ON codebox_threads (file_path);
+            CREATE INDEX IF NOT EXISTS codebox_threads_by_thread ON codebox_threads (thread_id);
+            PRAGMA user_version = {SCHEMA_VERSION};
+        """)
+        self._import_json()
+
+    def _import_json(self):
+        """Take over codebox_threads.json when the database is still empty."""
+        try:
+            with open(self.json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        rows = [(name, entry.get("filePath") or "", entry.get("thread_id") or DUMMY_THREAD, now)
+                for name, entry in data.items() if isinstance(entry, dict)]
+        with self.lock:
+            with self.db:
+                self.db.execute("BEGIN IMMEDIATE")
+                if self.db.execute("SELECT 1 FROM codebox_threads LIMIT 1").fetchone() is None:
+                    self.db.executemany("INSERT INTO codebox_threads VALUES (?, ?, ?, ?)", rows)
+
+    def get(self, class_name):
+        """{"filePath", "thread_id"} of the class, or None."""
+        with self.lock:
+            row = self.db.execute("SELECT file_path, thread_id FROM codebox_threads WHERE class_name = ?",
+                                  (class_name,)).fetchone()
+        return {"filePath": row[0], "thread_id": row[1]} if row else None
+
+    def thread_for(self, class_name, file_path):
+        """Thread of the class when it is recorded for this file; None otherwise."""
+        with self.lock:
+            row = self.db.execute("SELECT thread_id FROM codebox_threads WHERE class_name = ? AND file_path = ?",
+                                  (class_name, file_path)).fetchone()
+        return row[0] if row else None
+
+    def classes_in_file(self, file_path):
+        with self.lock:
+            return dict(self.db.execute("SELECT class_name, thread_id FROM codebox_threads WHERE file_path = ?",
+                                        (file_path,)))
+
+    def class_for_thread(self, thread_id):
+        if not thread_id or thread_id == DUMMY_THREAD:
+            return None
+        with self.lock:
+            row = self.db.execute("SELECT class_name FROM codebox_threads WHERE thread_id = ? LIMIT 1",
+                                  (thread_id,)).fetchone()
+        return row[0] if row else None
+
+    def upsert(self, class_name, file_path, thread_id):
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO codebox_threads VALUES (?, ?, ?, ?) ON CONFLICT(class_name) DO UPDATE SET "
+                "file_path = excluded.file_path, thread_id = excluded.thread_id, updated = excluded.updated",
+                (class_name, file_path, thread_id, time.time()))
+
+    def upsert_many(self, entries):
+        """Set {class_name: (file_path, thread_id)} in one transaction."""
+        now = time.time()
+        with self.lock:
+            with self.db:
+                self.db.execute("BEGIN IMMEDIATE")
+                self.db.executemany(
+                    "INSERT INTO codebox_threads VALUES (?, ?, ?, ?) ON CONFLICT(class_name) DO UPDATE SET "
+                    "file_path = excluded.file_path, thread_id = excluded.thread_id, updated = excluded.updated",
+                    [(name, file_path, thread_id, now) for name, (file_path, thread_id) in entries.items()])
+
+    def replace_many(self, entries, expected):
+        """Like upsert_many(), but only where the entry is still expected[class_name].
+
+        `expected` maps class names to the (file_path, thread_id) read earlier,
+        or None for a class that had no entry. Entries changed or removed in
+        the meantime are left alone. Returns the names that were written.
+        """
+        now = time.time()
+        written = []
+        with self.lock:
+            with self.db:
+                self.db.execute("BEGIN IMMEDIATE")
+                for name, (file_path, thread_id) in entries.items():
+                    before = expected.get(name)
+                    if before is None:
+                        count = self.db.execute("INSERT OR IGNORE INTO codebox_threads VALUES (?, ?, ?, ?)",
+                                                (name, file_path, thread_id, now)).rowcount
+                    else:
+                        count = self.db.execute(
+                            "UPDATE codebox_threads SET file_path = ?, thread_id = ?, updated = ? "
+                            "WHERE class_name = ? AND file_path = ? AND thread_id = ?",
+                            (file_path, thread_id, now, name, *before)).rowcount
+                    if count:
+                        written.append(name)
+        return written
+
+    def merge_classes(self, classes):
+        """Make the mapping cover exactly {class_name: file_path} of a new analysis.
+
+        New classes get a dummy thread, moved classes keep their thread under
+        the new path and classes no longer in the project are removed.
+        """
+        now = time.time()
+        with self.lock:
+            with self.db:
+                self.db.execute("BEGIN IMMEDIATE")
+                self.db.execute("CREATE TEMP TABLE IF NOT EXISTS analysis (class_name TEXT PRIMARY KEY, file_path TEXT)")
+                self.db.execute("DELETE FROM analysis")
+                self.db.executemany("INSERT INTO analysis VALUES (?, ?)",
+                                    [(name, file_path or "") for name, file_path in classes.items()])
+                removed = self.db.execute(
+                    "DELETE FROM codebox_threads WHERE class_name NOT IN (SELECT class_name FROM analysis)").rowcount
+                moved = self.db.execute(
+                    "UPDATE codebox_threads SET file_path = (SELECT file_path FROM analysis a "
+                    "WHERE a.class_name = codebox_threads.class_name), updated = ? WHERE file_path != "
+                    "(SELECT file_path FROM analysis a WHERE a.class_name = codebox_threads.class_name)",
+                    (now,)).rowcount
+                added = self.db.execute(
+                    "INSERT OR IGNORE INTO codebox_threads SELECT class_name, file_path, ?, ? FROM analysis",
+                    (DUMMY_THREAD, now)).rowcount
+                self.db.execute("DELETE FROM analysis")
+        return {"added": added, "moved": moved, "removed": removed}
+
+    def as_dict(self):
+        with self.lock:
+            rows = self.db.execute("SELECT class_name, file_path, thread_id FROM codebox_threads ORDER BY class_name")
+            return {name: {"filePath": file_path, "thread_id": thread_id} for name, file_path, thread_id in rows}
+
+    def export_json(self, path=None):
+        """Rewrite codebox_threads.json (atomically) from the database."""
+        path = path or self.json_path
+        # Several processes export the same file, each through a temporary file of its own
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(os.path.abspath(path)),
+                                         prefix=f"{os.path.basename(path)}.", suffix=".tmp", delete=False) as f:
+            try:
+                json.dump(self.as_dict(), f, indent=4)
+            except BaseException:
+                f.close()
+                os.remove(f.name)
+                raise
+        os.chmod(f.name, 0o644)  # NamedTemporaryFile creates it private
+        os.replace(f.name, path)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def has_mapping(workspace_folder):
+    folder = workspace_folder or ""
+    return os.path.exists(os.path.join(folder, DB_NAME)) or os.path.exists(os.path.join(folder, JSON_NAME))
+
+
+def open_mapping(workspace_folder):
+    """Mapping of the workspace, shared by all callers in this process."""
+    key = os.path.abspath(workspace_folder or "")
+    with _open_lock:
+        mapping = _open_mappings.get(key)
+        if mapping is None:
+            mapping = _open_mappings[key] = ThreadMapping(workspace_folder)
+        return mapping
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or export the codebox thread mapping of a workspace.")
+    parser.add_argument("workspace_folder", help="Folder with codebox_threads.sqlite3 (or codebox_threads.json).")
+    parser.add_argument("--class", dest="class_name", type=str, default=None, help="Print the entry of this class.")
+    parser.add_argument("--file", type=str, default=None, help="Print the classes of this file and their threads.")
+    parser.add_argument("--export", action="store_true", help="Rewrite codebox_threads.json from the database.")
+    args = parser.parse_args()
+
+    mapping = open_mapping(args.workspace_folder)
+    if args.export:
+        mapping.export_json()
+    if args.class_name:
+        print(json.dumps(mapping.get(args.class_name), indent=4))
+    elif args.file:
+        print(json.dumps(mapping.classes_in_file(args.file), indent=4))
+    elif not args.export:
+        print(json.dumps(mapping.as_dict(), indent=4))
+
+
+if __name__ == "__main__":
+    main()